@@ -1,15 +1,32 @@
 import os
+import sys
+import stat
+import json
 import time
+import argparse
+import hashlib
+import contextlib
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
-import chromadb
-import fitz  # PyMuPDF
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from collections import deque
 from urllib.parse import urljoin, urlparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
+from bisect import bisect_right
 import colorama
 from colorama import Fore, Style
+from frontier import CrawlFrontier
+from url_list import UrlListResults
+from http_cache import HttpCache
+from page_parser import parse_page, PARSER_BACKENDS, DEFAULT_PARSER
+from write_buffer import WriteBuffer
+from manifest import IngestManifest, hash_file
+from embed_cache import CachedEmbedder
+from keyword_index import KeywordIndex
+from shards import open_collection
+from embeddings import LocalEmbedder, EMBEDDING_BACKENDS, check_collection_model, record_collection_model
+from chunker import StreamingChunker, tiktoken_length
+from metrics import metrics
+# chromadb, PyMuPDF (fitz), requests, the crawler (aiohttp) and the near-duplicate filter (numpy) are imported
+# by the functions that need them, so --help and jobs that don't use them start without loading them
 
 # Color Definitions for colorama
 HEADING = Fore.YELLOW
@@ -22,144 +39,675 @@ RESET = Style.RESET_ALL
 CHROMA_PATH = "SecDB"
 COLLECTION_NAME = "SecData"
 URL_LIST_FILE = "urls.txt"
+URL_RESULTS_FILE = "urls.results.tsv"   # Per-URL status of the last URL list run, failures are retried by the next one
 LOCAL_DATA_FOLDER = "loc_data"
+CRAWL_CONCURRENCY = 8   # Max pages fetched at once by the crawler
+CRAWL_PER_HOST = 4      # Max pages fetched at once from a single host
+CRAWL_DELAY = 0.1       # Politeness delay (seconds) between requests to the same host
+URL_LIST_CONCURRENCY = 32          # Max pages fetched at once from a URL list (per-host limit and delay still apply)
+CRAWL_USE_SITEMAPS = True           # Seed crawls with the pages listed in robots.txt sitemaps / sitemap.xml
+CRAWL_RESPECT_ROBOTS = True         # Don't queue URLs that robots.txt disallows
+CRAWL_SCORER = "default"            # Crawl order: "default" = scheduler.UrlScorer() (path patterns, depth, sitemap lastmod), None = breadth-first, or your own scorer
+HTML_PARSER = DEFAULT_PARSER        # "html.parser" (pure Python) or "lxml" (fast, splits malformed paragraphs differently), see page_parser
+INGEST_WORKERS = 1      # Processes used to extract/chunk local files (0 = all cores)
+WRITE_BATCH_CHUNKS = 512            # Chunks buffered before a write to Chroma
+WRITE_BATCH_BYTES = 4 * 1024 * 1024 # Bytes of text buffered before a write to Chroma
+CHUNK_SIZE = 1000                   # Characters per chunk (tokens when CHUNK_TOKEN_ENCODING is set)
+CHUNK_OVERLAP = 200
+CHUNK_TOKEN_ENCODING = None         # e.g. "cl100k_base" to size chunks in tokens (needs tiktoken)
+SYNC_BATCH_SIZE = 256               # Chunks per add/update call while syncing one source
+TEXT_READ_CHARS = 1024 * 1024       # Characters read at a time from .txt files
+STREAM_FILE_BYTES = 64 * 1024 * 1024 # Files this large skip the process pool and are streamed by the writer
+EMBED_BACKEND = "chroma-default"   # See embeddings.EMBEDDING_BACKENDS, must match the collection's embedding function
+EMBED_MODEL = None                  # None = the backend's default model
+EMBED_BATCH_SIZE = 64               # Chunks per embedding forward pass
+EMBED_THREADS = 0                   # Intra-op threads for the embedding model (0 = all cores)
+EMBED_CACHE_PATH = "embed_cache.sqlite3"
+EMBED_CACHE_MAX_BYTES = 1024 * 1024 * 1024          # Cache size before least recently used vectors are evicted
+METRICS_FILE = None                 # e.g. "ingest_metrics.json" or "ingest_metrics.prom" (Prometheus text format)
+WATCH_DEBOUNCE = 1.0                # Watch mode: seconds a file has to be left alone before it is ingested
+WATCH_POLL_INTERVAL = 2.0           # Watch mode: seconds between folder scans where inotify isn't available
+WATCH_QUEUE_SIZE = 256              # Watch mode: changed files waiting to be ingested before the watcher waits
+DEDUP_THRESHOLD = 0.8               # Similarity (0-1) above which a chunk duplicating another source's chunk isn't stored
 
 
 # MAIN PROCESSING & DATA EXTRACTION
 
-def process_and_add_text(text: str, collection, source_metadata: dict):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_text(text)
-    if not chunks: return 0
-    ids_list = []
-    metadatas_list = []
-    source_name = Path(source_metadata.get("source_file") or source_metadata.get("source_url", "unknown")).name
+def source_filter(source_metadata: dict):
+    #The metadata filter that selects every chunk of one source (file path or URL)
+    if source_metadata.get("source_file"):
+        return {"source_file": source_metadata["source_file"]}
+    return {"source_url": source_metadata.get("source_url", "unknown")}
+
+def make_chunk_id(source_key: str, chunk: str, seen: dict):
+    #Content-addressed ID: hash of the full source path/URL plus hash of the chunk text.
+    #Stable across re-ingests, so unchanged chunks keep their ID and their embedding
+    chunk_hash = hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:32]
+    occurrence = seen.get(chunk_hash, 0)
+    seen[chunk_hash] = occurrence + 1
+    chunk_id = f"{source_key}-{chunk_hash}"
+    # The same text can appear more than once in one source
+    return chunk_id if occurrence == 0 else f"{chunk_id}-{occurrence}"
+
+def build_chunk_records(chunks, source_metadata: dict):
+    #Yields (chunk text, chunk ID, metadata) for each chunk of one source.
+    #chunks can be plain strings or (text, extra metadata) pairs, e.g. page numbers
+    source_value = next(iter(source_filter(source_metadata).values()))
+    source_key = hashlib.sha256(source_value.encode("utf-8")).hexdigest()[:16]
+    seen = {}
     for i, chunk in enumerate(chunks):
-        chunk_id = f"source_{source_name}_chunk_{i+1}"
-        ids_list.append(chunk_id)
+        extra_metadata = None
+        if not isinstance(chunk, str):
+            chunk, extra_metadata = chunk
         chunk_metadata = source_metadata.copy()
         chunk_metadata['chunk_number'] = i + 1
-        metadatas_list.append(chunk_metadata)
-    collection.add(documents=chunks, ids=ids_list, metadatas=metadatas_list)
-    return len(chunks)
+        if extra_metadata:
+            chunk_metadata.update(extra_metadata)
+        yield chunk, make_chunk_id(source_key, chunk, seen), chunk_metadata
+
+_chunk_length_function = None
+
+def chunk_length_function():
+    #None means chunks are measured in characters. The tokenizer is only loaded once per process
+    global _chunk_length_function
+    if CHUNK_TOKEN_ENCODING and _chunk_length_function is None:
+        _chunk_length_function = tiktoken_length(CHUNK_TOKEN_ENCODING)
+    return _chunk_length_function
+
+def new_chunker():
+    return StreamingChunker(CHUNK_SIZE, CHUNK_OVERLAP, length_function=chunk_length_function())
+
+def iter_split(fragments, chunker=None):
+    #Streams text fragments through a chunker (a new one by default) and yields the finished chunks
+    chunker = chunker or new_chunker()
+    for fragment in fragments:
+        with metrics.stage("split", len(fragment)) as timer:
+            ready = chunker.feed(fragment)
+            timer.chunks = len(ready)
+        yield from ready
+    with metrics.stage("split") as timer:
+        ready = chunker.finish()
+        timer.chunks = len(ready)
+    yield from ready
+
+def with_offsets(chunks):
+    #(chunk text, {"chunk_start", "chunk_end"}) pairs: character offsets of each chunk in its source text
+    for chunk in chunks:
+        yield chunk.text, {"chunk_start": chunk.start, "chunk_end": chunk.end}
+
+def split_into_chunks(text: str, source_metadata: dict):
+    #Splits text into chunks and builds the matching IDs and metadata. Returns (chunks, ids, metadatas)
+    records = list(build_chunk_records(with_offsets(iter_split([text])), source_metadata))
+    return [r[0] for r in records], [r[1] for r in records], [r[2] for r in records]
+
+def sync_source_chunks(collection, source_metadata: dict, records):
+    #Delta update for one source: adds only new chunks, refreshes metadata on the rest without
+    #re-embedding them and deletes chunks that are gone. records is streamed, so a huge document
+    #never has to be held in memory. Returns (added, removed, kept)
+    with metrics.stage("chroma_read") as timer:
+        existing = collection.get(where=source_filter(source_metadata), include=["metadatas"])
+        timer.chunks = len(existing['ids'])
+    existing_metadata = dict(zip(existing['ids'], existing['metadatas']))
+
+    new_ids = set()
+    added = kept = 0
+    add_docs, add_ids, add_metas = [], [], []
+    update_ids, update_metas = [], []
+    for chunk, chunk_id, metadata in records:
+        new_ids.add(chunk_id)
+        if chunk_id not in existing_metadata:
+            add_docs.append(chunk)
+            add_ids.append(chunk_id)
+            add_metas.append(metadata)
+            added += 1
+        else:
+            kept += 1
+            if existing_metadata[chunk_id] != metadata:
+                update_ids.append(chunk_id)
+                update_metas.append(metadata)
+        if len(add_ids) >= SYNC_BATCH_SIZE:
+            collection.add(documents=add_docs, ids=add_ids, metadatas=add_metas)
+            add_docs, add_ids, add_metas = [], [], []
+        if len(update_ids) >= SYNC_BATCH_SIZE:
+            collection.update(ids=update_ids, metadatas=update_metas)
+            update_ids, update_metas = [], []
+    if update_ids:
+        collection.update(ids=update_ids, metadatas=update_metas)
+    if add_ids:
+        collection.add(documents=add_docs, ids=add_ids, metadatas=add_metas)
+
+    stale_ids = [chunk_id for chunk_id in existing_metadata if chunk_id not in new_ids]
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+    return added, len(stale_ids), kept
+
+def process_and_add_text(text: str, collection, source_metadata: dict):
+    #Returns the number of chunks that had to be added (and embedded)
+    chunks, ids_list, metadatas_list = split_into_chunks(text, source_metadata)
+    if not chunks: return 0
+    added, _, _ = sync_source_chunks(collection, source_metadata, zip(chunks, ids_list, metadatas_list))
+    return added
+
+def iter_pdf_pages(filepath: Path):
+    #Yields (page number, page text) one page at a time
+    import fitz  # PyMuPDF
+    with fitz.open(filepath) as doc:
+        for page_number, page in enumerate(doc, start=1):
+            with metrics.stage("pdf_extract") as timer:
+                page_text = page.get_text()
+                timer.bytes = len(page_text)
+            yield page_number, page_text
+
+def iter_pdf_chunks(filepath: Path):
+    #Streams a PDF through the chunker page by page, so memory stays flat however long the document is.
+    #Overlap carries across page boundaries. Yields (chunk text, {"chunk_start", "chunk_end", "page_start", "page_end"})
+    chunker = new_chunker()
+    page_offsets = []   # Character offset where each page starts in the (never built) full text
+    page_numbers = []
+    offset = 0
+
+    def with_pages(chunks):
+        for chunk in chunks:
+            first = bisect_right(page_offsets, chunk.start) - 1
+            last = bisect_right(page_offsets, chunk.end - 1) - 1
+            yield chunk.text, {"chunk_start": chunk.start, "chunk_end": chunk.end,
+                               "page_start": page_numbers[first], "page_end": page_numbers[last]}
+
+    def page_texts():
+        nonlocal offset
+        for page_number, page_text in iter_pdf_pages(filepath):
+            if not page_text:
+                continue
+            page_offsets.append(offset)
+            page_numbers.append(page_number)
+            offset += len(page_text)
+            yield page_text
+
+    # Chunks of a page are yielded before the next page is read, so page_offsets always covers them
+    yield from with_pages(iter_split(page_texts(), chunker))
+
+def iter_text_file(filepath: Path):
+    #Reads a text file in blocks (with the same newline handling as read_text), so multi-GB
+    #log dumps and feeds are never loaded whole
+    with open(filepath, encoding='utf-8') as f:
+        while True:
+            with metrics.stage("text_read") as timer:
+                block = f.read(TEXT_READ_CHARS)
+                timer.bytes = len(block)
+            if not block:
+                break
+            yield block
 
 def get_text_from_file(filepath: Path):
-    if filepath.suffix == ".txt": return filepath.read_text(encoding='utf-8')
+    if filepath.suffix == ".txt": return "".join(iter_text_file(filepath))
     elif filepath.suffix == ".pdf":
-        text = ""
-        with fitz.open(filepath) as doc:
-            for page in doc: text += page.get_text()
-        return text
+        return "".join(page_text for _, page_text in iter_pdf_pages(filepath))
     return None
 
 #LOCAL FILE PROCESSING
-def process_local_folder(collection):
-    #Pass extracted text to the central processor.
-    local_path = Path(LOCAL_DATA_FOLDER)
+def iter_file_records(filepath: Path, file_mod_time: float):
+    #Chunk records (text, ID, metadata) for one local file. PDFs are streamed page by page,
+    #text files block by block; both give the same chunks as splitting the whole text at once
+    metadata = {"source_file": str(filepath), "file_last_modified": file_mod_time}
+    if filepath.suffix == ".pdf":
+        chunks = iter_pdf_chunks(filepath)
+    else:
+        chunks = with_offsets(iter_split(iter_text_file(filepath)))
+    return build_chunk_records(chunks, metadata)
+
+def extract_and_chunk_file(filepath: Path, file_mod_time: float):
+    #Extraction and splitting for one file. Runs inside the worker processes, so it never touches the database.
+    #Returns (records, stage metrics of this file) so the parent can add them to its own
+    metrics.reset()
+    return list(iter_file_records(filepath, file_mod_time)), metrics.snapshot()
+
+def process_local_folder(collection, workers: int = INGEST_WORKERS, folder: str = None):
+    #Pass extracted text to the central processor. folder defaults to LOCAL_DATA_FOLDER.
+    #With workers > 1 extraction and chunking run in a process pool and this process is the only writer.
+    #Returns the files that failed (they are retried by the next run)
+    folder = folder or LOCAL_DATA_FOLDER
+    local_path = Path(folder)
     if not local_path.exists():
-        print(f"\n{WARNING}Error: The local data folder- {LOCAL_DATA_FOLDER} -was not found{RESET}")
-        return
+        print(f"\n{WARNING}Error: The local data folder- {folder} -was not found{RESET}")
+        return []
+
+    print(f"\n{INFO}Scanning for files in {folder}...{RESET}")
+    # Only regular files: a directory can match the pattern too (e.g. notes.txt/)
+    supported_files = [f for f in chain(local_path.glob("*.pdf"), local_path.glob("*.txt")) if f.is_file()]
+
+    # The manifest is loaded once per run, unchanged files are skipped without asking Chroma
+    with IngestManifest(CHROMA_PATH) as manifest:
+        return process_files(collection, supported_files, manifest, workers)
 
-    print(f"\n{INFO}Scanning for files in {LOCAL_DATA_FOLDER}...{RESET}")
-    supported_files = list(local_path.glob("*.pdf")) + list(local_path.glob("*.txt"))
+def process_files(collection, filepaths, manifest, workers: int = INGEST_WORKERS):
+    #Adds or updates the given local files. Files that are unchanged since the manifest recorded them are skipped.
+    #Returns the files that failed
+    files_to_process = []
+    failed = []
+    for filepath in filepaths:
+        try:
+            file_stat = filepath.stat()
+        except FileNotFoundError:
+            # Removed since it was listed
+            continue
+        except OSError as e:
+            print(f"  {WARNING}! Failed to read {filepath.name}: {e}{RESET}")
+            failed.append(filepath)
+            continue
+        if not stat.S_ISREG(file_stat.st_mode):
+            # A directory or other special file (e.g. one handed over by the watcher)
+            continue
+        file_mod_time, file_size = file_stat.st_mtime, file_stat.st_size
+        if manifest.is_unchanged(filepath, file_size, file_mod_time):
+            print(f" {INFO} - Skipping {filepath.name}, no changes detected{RESET}")
+            continue
 
-    for filepath in supported_files:
-        file_mod_time = filepath.stat().st_mtime
-        existing_docs = collection.get(where={"source_file": str(filepath)})
-        if existing_docs['ids']:
-            stored_mod_time = existing_docs['metadatas'][0].get('file_last_modified', 0)
-            if file_mod_time <= stored_mod_time:
-                print(f" {INFO} - Skipping {filepath.name}, no changes detected{RESET}")
+        try:
+            content_hash = hash_file(filepath)
+        except OSError as e:
+            # Deleted or made unreadable since the stat: like an extraction error, reported and retried next run
+            print(f"  {WARNING}! Failed to read {filepath.name}: {e}{RESET}")
+            failed.append(filepath)
+            continue
+        entry = manifest.get(filepath)
+        if entry is not None:
+            if entry.content_hash == content_hash:
+                # Touched but identical, only the manifest needs the new mtime
+                manifest.record(filepath, file_size, file_mod_time, content_hash)
+                print(f" {INFO} - Skipping {filepath.name}, contents unchanged{RESET}")
                 continue
-            else:
+            print(f"  {INFO} Detected changes in {filepath.name}. Updating entries{RESET}")
+        else:
+            # Not in the manifest yet, fall back to the metadata stored with the chunks (databases built before the manifest)
+            existing_docs = collection.get(where={"source_file": str(filepath)}, limit=1, include=["metadatas"])
+            if existing_docs['ids']:
+                stored_mod_time = existing_docs['metadatas'][0].get('file_last_modified', 0)
+                if file_mod_time <= stored_mod_time:
+                    manifest.record(filepath, file_size, file_mod_time, content_hash)
+                    print(f" {INFO} - Skipping {filepath.name}, no changes detected{RESET}")
+                    continue
                 print(f"  {INFO} Detected changes in {filepath.name}. Updating entries{RESET}")
-                collection.delete(where={"source_file": str(filepath)})
+        files_to_process.append((filepath, file_mod_time, file_size, content_hash))
+
+    try:
+        return failed + ingest_files(collection, files_to_process, manifest, workers)
+    finally:
+        # Only mark files as ingested once their chunks have left the write buffer
+        flush = getattr(collection, "flush", None)
+        if flush is not None:
+            flush()
+        manifest.commit()
 
+def remove_files(collection, filepaths, manifest):
+    #Deletes the chunks of local files that are gone and forgets them in the manifest
+    for filepath in filepaths:
+        collection.delete(where={"source_file": str(filepath)})
+        manifest.remove(filepath)
+        print(f"  ✔ {SUCCESS}Removed the chunks of {filepath.name}{RESET}")
+    flush = getattr(collection, "flush", None)
+    if flush is not None:
+        flush()
+    manifest.commit()
+
+def watch_local_folder(collection, workers: int = INGEST_WORKERS, folder: str = None, poll: bool = False,
+                       metrics_file: str = METRICS_FILE):
+    #Watch mode, until Ctrl-C: after a catch-up pass over the folder, files are added as they are created or changed
+    #and the chunks of files that are deleted or moved away are removed. Bursts of events are debounced and only
+    #the affected files go through a bounded queue to this thread, the only writer (see watcher.py).
+    #Files deleted while nothing was watching are kept, like process_local_folder does
+    from watcher import FolderWatcher
+    folder = folder or LOCAL_DATA_FOLDER
+    if not os.path.isdir(folder):
+        print(f"\n{WARNING}Error: The local data folder- {folder} -was not found{RESET}")
+        return
+
+    # Watching starts before the catch-up pass, so changes made during it aren't missed
+    with FolderWatcher(folder, debounce=WATCH_DEBOUNCE, poll_interval=WATCH_POLL_INTERVAL, queue_size=WATCH_QUEUE_SIZE,
+                       poll=poll) as watcher:
+        process_local_folder(collection, workers, folder)
+        finish_operation(collection, metrics_file=metrics_file)
+        print(f"\n{HEADING}Watching {folder} for changes ({watcher.backend}). Press Ctrl-C to stop{RESET}")
+        with IngestManifest(CHROMA_PATH) as manifest:
+            for batch in watcher.batches():
+                start_time = time.time()
+                filepaths = [Path(path) for path, _ in batch]
+                # A file that fails (e.g. handed over after max_delay while still being written) is skipped and
+                # tried again on its next change; an error in the rest of the batch doesn't stop watching either
+                try:
+                    remove_files(collection, [filepath for filepath in filepaths if not filepath.exists()], manifest)
+                    process_files(collection, [filepath for filepath in filepaths if filepath.exists()], manifest,
+                                  workers)
+                    finish_operation(collection, metrics_file=metrics_file)
+                except Exception as e:
+                    print(f"{WARNING}[!] Could not handle {len(batch)} changed files: {e}{RESET}")
+                    continue
+                elapsed = time.time() - start_time
+                print(f"{INFO}  {len(batch)} changed files handled in {elapsed:.2f}s, "
+                      f"{max(age for _, age in batch) + elapsed:.2f}s after the first change{RESET}")
+    if watcher.error is not None:
+        print(f"{WARNING}[!] Watching {folder} failed: {watcher.error}{RESET}")
+
+def ingest_files(collection, files_to_process, manifest, workers: int = INGEST_WORKERS):
+    #A file that can't be read or parsed (corrupt PDF, not UTF-8, still being written...) is reported and skipped,
+    #whichever path it takes, and isn't recorded in the manifest. Returns the files that failed
+    failed = []
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(files_to_process)) or 1
+
+    # Worker results come back as whole lists, so very large files are streamed here instead
+    if workers == 1:
+        pooled_files, streamed_files = [], files_to_process
+    else:
+        pooled_files = [f for f in files_to_process if f[2] < STREAM_FILE_BYTES]
+        streamed_files = [f for f in files_to_process if f[2] >= STREAM_FILE_BYTES]
+
+    for filepath, file_mod_time, file_size, content_hash in streamed_files:
         print(f" {INFO} + Processing '{filepath.name}'...")
-        text = get_text_from_file(filepath)
-        if not text:
-            print(f"  {WARNING}! Could not extract text from {filepath.name}{RESET}")
+        try:
+            add_file_chunks(collection, filepath, iter_file_records(filepath, file_mod_time))
+        except Exception as e:
+            print(f"  {WARNING}! Failed to process {filepath.name}: {e}{RESET}")
+            failed.append(filepath)
             continue
-        
-        # Prepare metadata and call the central processor
-        metadata = {"source_file": str(filepath), "file_last_modified": file_mod_time}
-        num_chunks = process_and_add_text(text, collection, metadata)
-        print(f"  ✔ {SUCCESS}Successfully added {num_chunks} chunks from {filepath.name}{RESET}")
+        manifest.record(filepath, file_size, file_mod_time, content_hash)
+    if not pooled_files:
+        return failed
 
+    print(f" {INFO} + Processing {len(pooled_files)} files with {workers} worker processes...{RESET}")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(extract_and_chunk_file, filepath, file_mod_time): (filepath, file_mod_time, file_size, content_hash)
+            for filepath, file_mod_time, file_size, content_hash in pooled_files
+        }
+        for future in as_completed(futures):
+            filepath, file_mod_time, file_size, content_hash = futures[future]
+            try:
+                result, worker_metrics = future.result()
+                metrics.merge(worker_metrics)
+                add_file_chunks(collection, filepath, result)
+            except Exception as e:
+                print(f"  {WARNING}! Failed to process {filepath.name}: {e}{RESET}")
+                failed.append(filepath)
+                continue
+            manifest.record(filepath, file_size, file_mod_time, content_hash)
+    return failed
+
+def add_file_chunks(collection, filepath: Path, records):
+    #Single writer: syncs the chunk records produced for one file into the database
+    records = iter(records)
+    first_record = next(records, None)
+    if first_record is None:
+        print(f"  {WARNING}! Could not extract text from {filepath.name}{RESET}")
+        # Don't leave chunks from an older version of the file behind
+        collection.delete(where={"source_file": str(filepath)})
+        return
+    added, removed, kept = sync_source_chunks(collection, first_record[2], chain([first_record], records))
+    if removed or kept:
+        print(f"  ✔ {SUCCESS}Updated {filepath.name}: {added} chunks added, {removed} removed, {kept} unchanged{RESET}")
+    else:
+        print(f"  ✔ {SUCCESS}Successfully added {added} chunks from {filepath.name}{RESET}")
 
 #-----------
 #WEB SCRAPER
-def scrape_page_and_get_links(url: str, collection):
-    #Scrapes a single URL
+def process_page_content(url: str, content: bytes, collection, html_parser: str = HTML_PARSER):
+    #Parses a fetched page, adds its text to the database and returns the links found on it
+    with metrics.stage("html_parse", len(content)):
+        paragraphs, hrefs = parse_page(content, html_parser)
+
+    #Add text to database
+    paragraphs = [text.strip() for text in paragraphs if text.strip()]
+    full_text = "\n\n".join(paragraphs)
+    if full_text:
+        metadata = {"source_url": url}
+        num_chunks = process_and_add_text(full_text, collection, metadata)
+        print(f"  ✔ {SUCCESS}Added {num_chunks} chunks{RESET}")
+
+    #Find valid links on the page
+    links = set()
+    for link in set(hrefs):
+        # Join relative links (e.g., '/about') with the base URL
+        absolute_link = urljoin(url, link)
+        # Remove anchors and query parameters
+        parsed_link = urlparse(absolute_link)
+        clean_link = parsed_link._replace(query="", fragment="").geturl()
+        links.add(clean_link)
+    return list(links)
+
+def scrape_page_and_get_links(url: str, collection, http_cache=None, html_parser: str = HTML_PARSER):
+    #Scrapes a single URL. With an http_cache, a page that hasn't changed since it was added is skipped.
+    #Returns the page's links, None if it couldn't be fetched
+    import requests
     print(f"\n-> {INFO} Scraping: {url}")
     try:
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        #Add text to database
-        paragraphs = [p.get_text().strip() for p in soup.find_all('p') if p.get_text().strip()]
-        full_text = "\n\n".join(paragraphs)
-        if full_text:
-            metadata = {"source_url": url}
-            num_chunks = process_and_add_text(full_text, collection, metadata)
-            print(f"  ✔ {SUCCESS}Added {num_chunks} chunks{RESET}")
-        
-        #Find valid links on the page
-        links = set()
-        for a_tag in soup.find_all('a', href=True):
-            link = a_tag['href']
-            # Join relative links (e.g., '/about') with the base URL
-            absolute_link = urljoin(url, link)
-            # Remove anchors and query parameters
-            parsed_link = urlparse(absolute_link)
-            clean_link = parsed_link._replace(query="", fragment="").geturl()
-            links.add(clean_link)
-        return list(links)
+        headers = http_cache.conditional_headers(url) if http_cache is not None else {}
+        with metrics.stage("fetch") as timer:
+            response = requests.get(url, timeout=15, headers=headers)
+            timer.bytes = len(response.content)
+            response.raise_for_status()
+        if http_cache is not None:
+            links = http_cache.unchanged_links(url, response.status_code, response.content, response.headers)
+            if links is not None:
+                print(f"  = {INFO}Unchanged since last crawl, skipped{RESET}")
+                return links
+        links = process_page_content(url, response.content, collection, html_parser)
+        if http_cache is not None:
+            http_cache.record(url, response.headers, response.content, links)
+        return links
 
     except requests.exceptions.RequestException as e:
         print(f"{WARNING} ! Error during request: {e}{RESET}")
-        return []
+        return None
+
+def ingest_url_list(list_path: str, collection, http_cache=None, html_parser: str = HTML_PARSER,
+                    concurrency: int = URL_LIST_CONCURRENCY):
+    #Adds every URL of a list file (no link following). The file is streamed, URLs are normalized and
+    #deduplicated, and the outcome of each one goes to URL_RESULTS_FILE; URLs added by an earlier run are skipped
+    from crawler import AsyncCrawler
+    crawler = AsyncCrawler(
+        lambda url, content: process_page_content(url, content, collection, html_parser),
+        concurrency=concurrency, per_host=CRAWL_PER_HOST, delay=CRAWL_DELAY,
+        checkpoint=getattr(collection, "flush", None), http_cache=http_cache,
+    )
+    # Without the HTTP cache (--refetch) everything is fetched again, including URLs earlier runs added
+    results = UrlListResults(URL_RESULTS_FILE, fresh=http_cache is None)
+    crawler.ingest_list(results.read(list_path), results)
+    print(f"\n{SUCCESS}--- URL list finished ---{RESET}")
+    results.report()
 
 #---------
 #RECURSIVE CRAWLER LOGIC
-def recursive_scrape(start_url: str, max_links: int, collection):
-    #Crawls a site, respects a link limit.
-    
-    base_domain = urlparse(start_url).netloc
-    links_to_visit = deque([start_url])
-    visited_links = set()
-    scrape_count = 0
-    
+def recursive_scrape(start_url: str, max_links: int, collection, concurrency: int = CRAWL_CONCURRENCY,
+                     per_host: int = CRAWL_PER_HOST, delay: float = CRAWL_DELAY, resume: bool = False, http_cache=None,
+                     html_parser: str = HTML_PARSER):
+    #Crawls a site concurrently, respects a link limit.
+    #The frontier is saved next to the database, so an interrupted crawl can be resumed with resume=True
     if not start_url: return
-       
-    while links_to_visit and scrape_count < max_links:
-        current_url = links_to_visit.popleft()
-        if current_url in visited_links:
-            continue
-
-        # Check if the link is on the same domain before scraping
-        if urlparse(current_url).netloc != base_domain:
-            continue
 
-        visited_links.add(current_url)
-        scrape_count += 1
+    from crawler import AsyncCrawler
+    scorer = CRAWL_SCORER
+    if scorer == "default":
+        from scheduler import UrlScorer
+        scorer = UrlScorer()
+    crawler = AsyncCrawler(
+        lambda url, content: process_page_content(url, content, collection, html_parser),
+        concurrency=concurrency, per_host=per_host, delay=delay,
+        # Pending chunks are written before every frontier save, so saved progress is never ahead of the database
+        checkpoint=getattr(collection, "flush", None), http_cache=http_cache,
+        scorer=scorer, use_sitemaps=CRAWL_USE_SITEMAPS, respect_robots=CRAWL_RESPECT_ROBOTS,
+    )
+    with CrawlFrontier(CHROMA_PATH) as frontier:
+        scrape_count = crawler.crawl(start_url, max_links, frontier, resume)
+        progress = frontier.saved_progress(start_url)
 
-        new_links = scrape_page_and_get_links(current_url, collection)
-        
-        for link in new_links:
-            if link not in visited_links:
-                links_to_visit.append(link)
-    
     print(f"\n{SUCCESS}--- Recursive scrape finished. Visited {scrape_count} pages. ---")
+    if progress:
+        print(f"{INFO}    {progress[1]} links are still queued. Crawl {start_url} again and choose to resume to continue{RESET}")
+
+#----------
+#NON-INTERACTIVE JOBS
+JOB_TYPES = ["folder", "url", "crawl", "urls"]
+
+def is_valid_url(url):
+    try:
+        result = urlparse(url)
+    except (ValueError, AttributeError):
+        return False
+    return all([result.scheme, result.netloc])
+
+def check_job(job):
+    #Raises ValueError if job isn't a runnable ingestion job. Jobs are dicts with a "type" and:
+    #  folder: "path" (default LOCAL_DATA_FOLDER), "workers"
+    #  url:    "url" (one page, no link following)
+    #  crawl:  "url", "max_links" (default 10, 0 = no limit), "resume" (continue a saved crawl of this URL)
+    #  urls:   "path" (default URL_LIST_FILE), "concurrency"
+    if not isinstance(job, dict) or job.get("type") not in JOB_TYPES:
+        raise ValueError(f"Not a job: {json.dumps(job)}. Jobs need a type: {', '.join(JOB_TYPES)}")
+    if job["type"] in ("url", "crawl") and not is_valid_url(job.get("url")):
+        raise ValueError(f"Not a valid URL in {json.dumps(job)}")
+    if job["type"] == "folder" and not os.path.isdir(job.get("path", LOCAL_DATA_FOLDER)):
+        raise ValueError(f"The folder {job.get('path', LOCAL_DATA_FOLDER)} was not found")
+    if job["type"] == "urls" and not os.path.isfile(job.get("path", URL_LIST_FILE)):
+        raise ValueError(f"The file {job.get('path', URL_LIST_FILE)} was not found")
+
+def load_jobs(path: str):
+    #Reads and checks a JSON job file: a list of jobs, or {"jobs": [...]}
+    with open(path, encoding="utf-8") as f:
+        jobs = json.load(f)
+    if isinstance(jobs, dict):
+        jobs = jobs.get("jobs")
+    if not isinstance(jobs, list):
+        raise ValueError(f"{path} has no job list")
+    for job in jobs:
+        check_job(job)
+    return jobs
+
+def run_job(job: dict, collection, http_cache=None, html_parser: str = HTML_PARSER, workers: int = INGEST_WORKERS):
+    if job["type"] == "folder":
+        failed = process_local_folder(collection, job.get("workers", workers), job.get("path", LOCAL_DATA_FOLDER))
+        if failed:
+            # The other files are in; the job still counts as failed so the exit code shows it
+            raise RuntimeError(f"{len(failed)} files could not be ingested: {', '.join(f.name for f in failed)}")
+    elif job["type"] == "url":
+        if scrape_page_and_get_links(job["url"], collection, http_cache, html_parser) is None:
+            raise RuntimeError(f"{job['url']} could not be fetched")
+    elif job["type"] == "crawl":
+        recursive_scrape(job["url"], job.get("max_links", 10) or float('inf'), collection,
+                         resume=job.get("resume", False), http_cache=http_cache, html_parser=html_parser)
+    elif job["type"] == "urls":
+        ingest_url_list(job.get("path", URL_LIST_FILE), collection, http_cache, html_parser,
+                        job.get("concurrency", URL_LIST_CONCURRENCY))
+
+def run_jobs(jobs, workers: int = INGEST_WORKERS, html_parser: str = HTML_PARSER, metrics_file: str = METRICS_FILE,
+             **session_options):
+    #Runs checked jobs one after another in one process, so the database, caches and model are loaded once.
+    #A failing job is reported and the next one runs. Returns the number of jobs that failed or didn't run (Ctrl-C)
+    succeeded = 0
+    with ingest_session(metrics_file=metrics_file, **session_options) as (collection, http_cache):
+        for number, job in enumerate(jobs, start=1):
+            print(f"\n{HEADING}--- Job {number}/{len(jobs)}: {json.dumps(job)} ---{RESET}")
+            start_time = time.time()
+            try:
+                run_job(job, collection, http_cache, html_parser, workers)
+                succeeded += 1
+            except Exception as e:
+                print(f"{WARNING}[!] Job {number} failed: {e}{RESET}")
+            finish_operation(collection, http_cache, metrics_file)
+            print(f"\nFinished job {number} in {time.time() - start_time:.2f} seconds.")
+    return len(jobs) - succeeded
 
 #----------
 #MAIN INTERACTIVE SCRIPT
 
-def main():
+@contextlib.contextmanager
+def ingest_session(embed_backend: str = EMBED_BACKEND, embed_model: str = EMBED_MODEL,
+                   embed_batch_size: int = EMBED_BATCH_SIZE, embed_threads: int = EMBED_THREADS, refetch: bool = False,
+                   dedup: bool = True, keyword_index: bool = True, metrics_file: str = METRICS_FILE):
+    #Opens the database and the write pipeline and yields (collection, http_cache). Leaving the block, or Ctrl-C
+    #inside it, writes everything still pending, commits the indexes and caches and prints their reports
+    import chromadb
+    from retrieval import mark_written
     client = chromadb.PersistentClient(path=CHROMA_PATH)
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
+    # The shard collections when create_db.py shards has split the database (see shards.py), one collection otherwise
+    collection = open_collection(client, CHROMA_PATH, COLLECTION_NAME)
 
+    # Vectors are computed here in large batches (cache misses only) and handed to Chroma with each write
+    local_embedder = LocalEmbedder(embed_backend, embed_model, embed_batch_size, embed_threads)
+    try:
+        # Vectors of another model would silently land in a different vector space
+        check_collection_model(collection, local_embedder.model)
+    except ValueError as e:
+        print(f"{WARNING}[!] {e}{RESET}")
+        sys.exit(1)
+    record_collection_model(collection, local_embedder.model)
+    embedder = CachedEmbedder(local_embedder, local_embedder.model_id, EMBED_CACHE_PATH, EMBED_CACHE_MAX_BYTES)
+    # Conditional requests for pages that were added before (refetch downloads and re-adds everything)
+    http_cache = None if refetch else HttpCache(CHROMA_PATH)
+
+    # All writes go through the buffer; leaving the block flushes whatever is still pending
+    # Every write touches SecDB/last_write, so a running retrieval service drops its cached results
+    with WriteBuffer(collection, WRITE_BATCH_CHUNKS, WRITE_BATCH_BYTES, client.get_max_batch_size(), embedder,
+                     lambda: mark_written(CHROMA_PATH)) as buffer:
+        # Stored chunks are also indexed for BM25 keyword search (same chunk IDs), see retrieval.py
+        keywords = KeywordIndex(buffer, CHROMA_PATH, lambda: mark_written(CHROMA_PATH)) if keyword_index else None
+        deduplicator = None
+        if dedup:
+            from dedup import ChunkDeduplicator
+            # Near-duplicates of chunks already stored for another source are dropped before they reach the buffer
+            deduplicator = ChunkDeduplicator(keywords or buffer, CHROMA_PATH, DEDUP_THRESHOLD)
+        try:
+            if keywords is not None:
+                indexed = keywords.index_existing()
+                if indexed:
+                    print(f"{INFO}Indexed {indexed} existing chunks for keyword search{RESET}")
+            if deduplicator is not None:
+                indexed = deduplicator.index_existing()
+                if indexed:
+                    print(f"{INFO}Indexed {indexed} existing chunks for near-duplicate detection{RESET}")
+            yield deduplicator or keywords or buffer, http_cache
+        except KeyboardInterrupt:
+            print(f"\n{WARNING}[!] Interrupted. Saving pending chunks before exit...{RESET}")
+    if deduplicator is not None:
+        # The buffer has been flushed, now the index that refers to its chunks can be committed
+        deduplicator.flush()
+        deduplicator.report()
+        deduplicator.close()
+    if keywords is not None:
+        keywords.flush()
+        keywords.report()
+        keywords.close()
+    buffer.report()
+    embedder.report()
+    embedder.close()
+    if http_cache is not None:
+        # Only after the flush above, so a page is never marked as added before its chunks are stored
+        http_cache.commit()
+        http_cache.report()
+        http_cache.close()
+    metrics.report()
+    if metrics_file:
+        metrics.write(metrics_file)
+        print(f"{INFO}Metrics written to {metrics_file}{RESET}")
+
+def finish_operation(collection, http_cache=None, metrics_file: str = METRICS_FILE):
+    #After every menu option or job: writes pending chunks, then commits the HTTP cache that refers to them
+    collection.flush()
+    if http_cache is not None:
+        http_cache.commit()
+    if metrics_file:
+        # Rewritten after every operation, so a metrics collector sees progress during long sessions
+        metrics.write(metrics_file)
+
+def main(workers: int = INGEST_WORKERS, embed_backend: str = EMBED_BACKEND, embed_model: str = EMBED_MODEL,
+         embed_batch_size: int = EMBED_BATCH_SIZE, embed_threads: int = EMBED_THREADS, refetch: bool = False,
+         html_parser: str = HTML_PARSER, dedup: bool = True, metrics_file: str = METRICS_FILE,
+         keyword_index: bool = True):
+    with ingest_session(embed_backend, embed_model, embed_batch_size, embed_threads, refetch, dedup, keyword_index,
+                        metrics_file) as (collection, http_cache):
+        interactive_menu(collection, workers, http_cache, html_parser, metrics_file)
+
+def interactive_menu(collection, workers: int = INGEST_WORKERS, http_cache=None, html_parser: str = HTML_PARSER,
+                     metrics_file: str = METRICS_FILE):
     while True:
         print(f"\n{HEADING}---IMPORT DATA FOR RAG DATABASE---{RESET}")
         print(f"{INFO}Please choose an option:{RESET}")
@@ -185,7 +733,7 @@ def main():
         
         # --- Process Valid Choices ---
         if choice == '1':
-            process_local_folder(collection)
+            process_local_folder(collection, workers)
         
         elif choice == '2':
             while True:
@@ -195,7 +743,7 @@ def main():
                     result = urlparse(url)
                     if all([result.scheme, result.netloc]):
                         print("{INFO}  URL is valid. Proceeding with scrape...")
-                        scrape_page_and_get_links(url, collection)
+                        scrape_page_and_get_links(url, collection, http_cache, html_parser)
                         break 
                     else:
                         print(f"{WARNING} That's not a valid URL. Please input a URL.{RESET}")
@@ -220,6 +768,13 @@ def main():
             if start_url.lower() == 'back':
                 continue
 
+            resume = False
+            with CrawlFrontier(CHROMA_PATH) as frontier:
+                progress = frontier.saved_progress(start_url)
+            if progress:
+                print(f"\n{INFO}    An unfinished crawl of this URL visited {progress[0]} pages and has {progress[1]} links queued{RESET}")
+                resume = input(f"{INFO}    Resume it? (yes/no): {RESET}").lower().strip() in ['yes', 'y']
+
             print(f"\n{HEADING} ---Choose a limit for the crawler:{RESET}")
             print("     [1]Default of 10 Links")
             print("     [2]Set Your Own Number")
@@ -247,18 +802,92 @@ def main():
                 print(f"{WARNING}[!] Invalid limit choice. Aborting crawl{RESET}")
                 continue
             
-            recursive_scrape(start_url, max_links, collection)
+            recursive_scrape(start_url, max_links, collection, resume=resume, http_cache=http_cache, html_parser=html_parser)
 
         elif choice == '4':
             if not os.path.exists(URL_LIST_FILE):
                 print(f"\n{WARNING} Error: The file {URL_LIST_FILE} was not found{RESET}")
                 continue 
-            with open(URL_LIST_FILE, 'r') as f:
-                urls = [line.strip() for line in f if line.strip()]
-            for url in urls: scrape_page_and_get_links(url, collection)
+            ingest_url_list(URL_LIST_FILE, collection, http_cache, html_parser)
 
+        finish_operation(collection, http_cache, metrics_file)
         end_time = time.time()
         print(f"\nFinished operation in {end_time - start_time:.2f} seconds.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Add data to the RAG database: interactively, or with a command (for cron and job schedulers)",
+        epilog="Options go before the command, e.g. add_data.py --no-dedup folder reports/")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help="processes used to extract and chunk local files (0 = all cores)")
+    parser.add_argument("--embed-backend", choices=sorted(EMBEDDING_BACKENDS), default=EMBED_BACKEND,
+                        help="embedding backend, must match the collection's embedding function")
+    parser.add_argument("--embed-model", default=EMBED_MODEL, help="embedding model (default: the backend's default)")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE, help="chunks per embedding forward pass")
+    parser.add_argument("--embed-threads", type=int, default=EMBED_THREADS,
+                        help="intra-op threads for the embedding model (0 = all cores)")
+    parser.add_argument("--html-parser", choices=sorted(PARSER_BACKENDS), default=HTML_PARSER,
+                        help="HTML parser for web pages (lxml is much faster, but splits malformed paragraphs differently, see page_parser)")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="store every chunk, even near-duplicates of chunks from other sources")
+    parser.add_argument("--no-keyword-index", action="store_true",
+                        help="don't add new chunks to the BM25 keyword index used by retrieval.py")
+    parser.add_argument("--refetch", action="store_true",
+                        help="ignore the HTTP cache: download and re-add pages even if they haven't changed")
+    parser.add_argument("--metrics", default=METRICS_FILE, metavar="PATH",
+                        help="write per-stage metrics to PATH: JSON for .json, otherwise Prometheus text format")
+    commands = parser.add_subparsers(dest="command", metavar="command",
+                                     help="run without a command for the interactive menu")
+    folder_parser = commands.add_parser("folder", help="add the PDF and text files of a folder")
+    folder_parser.add_argument("path", nargs="?", default=LOCAL_DATA_FOLDER)
+    url_parser = commands.add_parser("url", help="add single web pages (no link following)")
+    url_parser.add_argument("urls", nargs="+", metavar="url")
+    crawl_parser = commands.add_parser("crawl", help="follow links from a starting URL")
+    crawl_parser.add_argument("url")
+    crawl_parser.add_argument("--max-links", type=int, default=10, help="pages to visit (0 = no limit)")
+    crawl_parser.add_argument("--resume", action="store_true", help="continue an unfinished crawl of this URL")
+    urls_parser = commands.add_parser("urls", help="add every URL of a list file")
+    urls_parser.add_argument("path", nargs="?", default=URL_LIST_FILE)
+    urls_parser.add_argument("--concurrency", type=int, default=URL_LIST_CONCURRENCY)
+    watch_parser = commands.add_parser("watch", help="add files of a folder as they appear or change, until Ctrl-C")
+    watch_parser.add_argument("path", nargs="?", default=LOCAL_DATA_FOLDER)
+    watch_parser.add_argument("--poll", action="store_true", help="scan the folder instead of using inotify")
+    jobs_parser = commands.add_parser("jobs", help="run the jobs of a JSON job file in one process")
+    jobs_parser.add_argument("path", help='e.g. [{"type": "folder", "path": "loc_data"}, '
+                                          '{"type": "crawl", "url": "https://...", "max_links": 50}]')
+    args = parser.parse_args()
+
+    session_options = dict(embed_backend=args.embed_backend, embed_model=args.embed_model,
+                           embed_batch_size=args.embed_batch_size, embed_threads=args.embed_threads,
+                           refetch=args.refetch, dedup=not args.no_dedup, keyword_index=not args.no_keyword_index)
+    if args.command is None:
+        main(workers=args.workers, html_parser=args.html_parser, metrics_file=args.metrics, **session_options)
+        sys.exit(0)
+    if args.command == "watch":
+        if not os.path.isdir(args.path):
+            print(f"{WARNING}[!] The folder {args.path} was not found{RESET}")
+            sys.exit(2)
+        with ingest_session(metrics_file=args.metrics, **session_options) as (collection, http_cache):
+            watch_local_folder(collection, args.workers, args.path, args.poll, args.metrics)
+        sys.exit(0)
+
+    # Jobs are checked before anything is opened, so a typo fails fast instead of after hours of ingestion
+    try:
+        if args.command == "jobs":
+            jobs = load_jobs(args.path)
+        elif args.command == "folder":
+            jobs = [{"type": "folder", "path": args.path}]
+        elif args.command == "url":
+            jobs = [{"type": "url", "url": url} for url in args.urls]
+        elif args.command == "crawl":
+            jobs = [{"type": "crawl", "url": args.url, "max_links": args.max_links, "resume": args.resume}]
+        else:
+            jobs = [{"type": "urls", "path": args.path, "concurrency": args.concurrency}]
+        for job in jobs:
+            check_job(job)
+    except (OSError, ValueError) as e:
+        print(f"{WARNING}[!] {e}{RESET}")
+        sys.exit(2)
+    failed = run_jobs(jobs, workers=args.workers, html_parser=args.html_parser, metrics_file=args.metrics,
+                      **session_options)
+    sys.exit(1 if failed else 0)
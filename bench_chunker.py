@@ -0,0 +1,106 @@
+import sys
+import time
+import random
+import argparse
+from colorama import Fore, Style
+from chunker import split_text, iter_chunks, tiktoken_length, CHUNK_SIZE, CHUNK_OVERLAP
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Benchmark Configuration ---
+DEFAULT_MB = 8      # Size of each synthetic corpus
+WORDS = ("exploit vulnerability remote code execution buffer overflow privilege escalation patch advisory "
+         "malware ransomware phishing credential lateral movement persistence beacon payload CVE-2024-3094 "
+         "CWE-787 kernel driver firmware authentication bypass injection sanitization mitigation").split()
+
+
+def synthetic_corpora(megabytes: int, seed: int = 1):
+    #Three shapes of text that stress different splitter levels
+    rng = random.Random(seed)
+    target = megabytes * 1024 * 1024
+
+    def build(make_part, joiner):
+        parts, size = [], 0
+        while size < target:
+            part = make_part()
+            parts.append(part)
+            size += len(part) + len(joiner)
+        return joiner.join(parts)
+
+    sentence = lambda: " ".join(rng.choices(WORDS, k=rng.randint(5, 30))) + "."
+    return {
+        # Scraped web pages: <p> paragraphs joined with blank lines, many longer than a chunk
+        "web paragraphs": build(lambda: " ".join(rng.choices(WORDS, k=rng.randint(20, 600))), "\n\n"),
+        # Extracted PDF text: short lines, blank lines between paragraphs
+        "pdf prose": build(lambda: "\n".join(sentence() for _ in range(rng.randint(1, 8))), "\n\n"),
+        # Log dumps: one record per line, no blank lines
+        "log lines": build(lambda: f"{rng.randint(0, 10**9)} " + " ".join(rng.choices(WORDS, k=rng.randint(3, 15))), "\n"),
+    }
+
+
+def langchain_splitter(length_function):
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        return None
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+                                          length_function=length_function or len)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunker throughput and equivalence against LangChain")
+    parser.add_argument("files", nargs="*", help="text files to use instead of the synthetic corpora")
+    parser.add_argument("--mb", type=int, default=DEFAULT_MB, help="size of each synthetic corpus in MB")
+    parser.add_argument("--tokens", metavar="ENCODING", default=None,
+                        help="measure chunks in tokens with this tiktoken encoding (e.g. cl100k_base)")
+    args = parser.parse_args()
+
+    if args.files:
+        corpora = {path: open(path, encoding="utf-8").read() for path in args.files}
+    else:
+        corpora = synthetic_corpora(args.mb)
+    length_function = tiktoken_length(args.tokens) if args.tokens else None
+    reference = langchain_splitter(length_function)
+    if reference is None:
+        print(f"{WARNING}LangChain is not installed, only the chunker is timed{RESET}")
+
+    print(f"\n{HEADING}Chunker benchmark: chunk_size={CHUNK_SIZE}, overlap={CHUNK_OVERLAP}, "
+          f"length={'tokens/' + args.tokens if args.tokens else 'characters'}{RESET}")
+    print(f"{INFO}{'corpus':<18} {'MB':>6} {'chunks':>8} {'chunker MB/s':>13} {'streamed MB/s':>14} {'langchain MB/s':>15} {'same':>6}{RESET}")
+    all_equal = True
+    for name, text in corpora.items():
+        megabytes = len(text.encode("utf-8")) / 1024 / 1024
+        chunks, chunker_time = timed(split_text, text, CHUNK_SIZE, CHUNK_OVERLAP, None, length_function)
+        fragments = [text[i:i + 65536] for i in range(0, len(text), 65536)]
+        _, streamed_time = timed(lambda: sum(1 for _ in iter_chunks(fragments, CHUNK_SIZE, CHUNK_OVERLAP,
+                                                                    length_function=length_function)))
+        langchain_rate, same = "-", "-"
+        if reference is not None:
+            expected, reference_time = timed(reference.split_text, text)
+            langchain_rate = f"{megabytes / reference_time:.1f}"
+            same = "yes" if expected == chunks else "NO"
+            all_equal = all_equal and expected == chunks
+        print(f"{name[:18]:<18} {megabytes:>6.1f} {len(chunks):>8} {megabytes / chunker_time:>13.1f} "
+              f"{megabytes / streamed_time:>14.1f} {langchain_rate:>15} {same:>6}")
+
+    if reference is not None:
+        if all_equal:
+            print(f"\n{SUCCESS}Chunks are identical to LangChain's{RESET}")
+        else:
+            print(f"\n{WARNING}Chunks differ from LangChain's{RESET}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
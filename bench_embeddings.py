@@ -0,0 +1,68 @@
+import time
+import random
+import argparse
+from colorama import Fore, Style
+from embeddings import LocalEmbedder, EMBEDDING_BACKENDS, DEFAULT_BACKEND, DEFAULT_THREADS
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Benchmark Configuration ---
+DEFAULT_BATCH_SIZES = "8,32,64,128,256"
+DEFAULT_CHUNKS = 512
+CHUNK_CHARS = 1000      # Same size as add_data's chunks
+
+WORDS = ("exploit vulnerability remote code execution buffer overflow privilege escalation patch advisory "
+         "malware ransomware phishing credential lateral movement persistence beacon payload CVE CWE "
+         "kernel driver firmware authentication bypass injection sanitization mitigation detection").split()
+
+
+def synthetic_chunks(count: int, seed: int = 1):
+    #Chunk-sized pseudo-text so every run embeds the same input
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(count):
+        words = []
+        while sum(len(w) + 1 for w in words) < CHUNK_CHARS:
+            words.append(rng.choice(WORDS))
+        chunks.append(" ".join(words)[:CHUNK_CHARS])
+    return chunks
+
+
+def run_benchmark(backend, model, threads, batch_sizes, count):
+    #Returns [(batch_size, chunks_per_second)]
+    chunks = synthetic_chunks(count)
+    results = []
+    embedder = LocalEmbedder(backend, model, batch_size=batch_sizes[0], threads=threads)
+    embedder(chunks[:batch_sizes[0]])   # Warm up: load the model before timing
+    for batch_size in batch_sizes:
+        embedder.batch_size = batch_size
+        start = time.perf_counter()
+        embedder(chunks)
+        elapsed = time.perf_counter() - start
+        results.append((batch_size, count / elapsed))
+    return embedder.model_id, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput (chunks/second) per batch size")
+    parser.add_argument("--backend", choices=sorted(EMBEDDING_BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="intra-op threads (0 = all cores)")
+    parser.add_argument("--batch-sizes", default=DEFAULT_BATCH_SIZES, help="comma separated list")
+    parser.add_argument("--chunks", type=int, default=DEFAULT_CHUNKS, help="chunks embedded per batch size")
+    args = parser.parse_args()
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size.strip()]
+    model_id, results = run_benchmark(args.backend, args.model, args.threads, batch_sizes, args.chunks)
+
+    print(f"\n{HEADING}Embedding benchmark: {model_id}, threads={args.threads or 'default'}, {args.chunks} chunks{RESET}")
+    print(f"{INFO}{'batch size':>12} {'chunks/s':>12}{RESET}")
+    for batch_size, rate in results:
+        print(f"{batch_size:>12} {rate:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from colorama import Fore, Style
+from page_parser import parse_page, PARSER_BACKENDS
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Benchmark Configuration ---
+FIXTURE_FOLDER = "html_fixtures"    # Saved pages, e.g. from: python bench_parse.py --save URL [URL ...]
+DEFAULT_ROUNDS = 3                  # Each backend parses every fixture this many times
+
+
+def save_fixtures(urls, folder):
+    import requests
+    os.makedirs(folder, exist_ok=True)
+    for url in urls:
+        response = requests.get(url, timeout=15)
+        response.raise_for_status()
+        name = re.sub(r"[^A-Za-z0-9._-]+", "_", url.split("://", 1)[-1]).strip("_")[:150] or "page"
+        path = Path(folder) / f"{name}.html"
+        path.write_bytes(response.content)
+        print(f"{INFO}Saved {url} -> {path}{RESET}")
+
+
+def load_fixtures(paths):
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files += sorted(p for p in path.rglob("*") if p.suffix.lower() in (".html", ".htm"))
+        elif path.is_file():
+            files.append(path)
+    return [(str(f), f.read_bytes()) for f in files]
+
+
+def page_result(content, backend):
+    #What add_data keeps from a page: non-empty stripped paragraphs (in order) and the set of links
+    paragraphs, hrefs = parse_page(content, backend)
+    return [text.strip() for text in paragraphs if text.strip()], set(hrefs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML parsing throughput per parser backend on saved pages")
+    parser.add_argument("paths", nargs="*", default=[FIXTURE_FOLDER], help="HTML files or folders of them")
+    parser.add_argument("--save", nargs="+", metavar="URL", help=f"download pages into {FIXTURE_FOLDER} first")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.save, FIXTURE_FOLDER)
+    fixtures = load_fixtures(args.paths)
+    if not fixtures:
+        print(f"{WARNING}No HTML fixtures found in {', '.join(args.paths)}. Save some with --save URL{RESET}")
+        sys.exit(1)
+    megabytes = sum(len(content) for _, content in fixtures) / 1024 / 1024
+
+    backends = []
+    for backend in PARSER_BACKENDS:
+        try:
+            parse_page(b"<p></p>", backend)
+            backends.append(backend)
+        except ImportError as e:
+            print(f"{WARNING}Skipping {backend}: {e}{RESET}")
+
+    print(f"\n{HEADING}Parse benchmark: {len(fixtures)} pages, {megabytes:.1f} MB, {args.rounds} rounds{RESET}")
+    print(f"{INFO}{'backend':<12} {'MB/s':>8} {'pages/s':>9}{RESET}")
+    for backend in backends:
+        start = time.perf_counter()
+        for _ in range(max(1, args.rounds)):
+            for _, content in fixtures:
+                parse_page(content, backend)
+        elapsed = time.perf_counter() - start
+        rounds = max(1, args.rounds)
+        print(f"{backend:<12} {megabytes * rounds / elapsed:>8.2f} {len(fixtures) * rounds / elapsed:>9.1f}")
+
+    # Every backend has to keep the same text and links as the reference html.parser backend
+    different = []
+    for name, content in fixtures:
+        expected = page_result(content, "html.parser")
+        for backend in backends:
+            if backend != "html.parser" and page_result(content, backend) != expected:
+                different.append((backend, name))
+    if different:
+        print(f"\n{WARNING}{len(different)} pages parsed differently from html.parser:{RESET}")
+        for backend, name in different[:20]:
+            print(f"  {backend}: {name}")
+    else:
+        print(f"\n{SUCCESS}All backends extracted the same paragraphs and links{RESET}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import re
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlparse
+from colorama import Fore, Style
+from crawler import AsyncCrawler
+from scheduler import UrlScorer
+from page_parser import parse_page
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Fixture Site Configuration ---
+ADVISORIES = 300
+TAGS = 150
+BLOG_POSTS = 200
+PAGINATION = 40
+DEFAULT_BUDGET = 100
+ADVISORY_PATH = re.compile(r"^/security/advisories/ADV-\d+$")
+
+
+class FixtureSite(BaseHTTPRequestHandler):
+    #A security vendor site in miniature: every page carries nav links to tag clouds, pagination and login,
+    #advisories are listed in a sitemap index (with lastmod) and only linked deep inside the blog
+    today = datetime.now(timezone.utc)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/robots.txt":
+            return self._send("User-agent: *\nDisallow: /account/\nSitemap: /sitemap_index.xml\n", "text/plain")
+        if path == "/sitemap_index.xml":
+            return self._send(self._sitemap_index(), "application/xml")
+        if path == "/sitemap-advisories.xml":
+            return self._send(self._urlset(
+                (f"/security/advisories/ADV-{i}", self.today - timedelta(days=i)) for i in range(ADVISORIES)), "application/xml")
+        if path == "/sitemap-blog.xml":
+            return self._send(self._urlset(
+                (f"/blog/post-{i}", self.today - timedelta(days=30 + i * 5)) for i in range(BLOG_POSTS)), "application/xml")
+
+        links = ["/", "/login", "/account/settings", "/search", "/blog/"]
+        links += [f"/tag/topic-{i}" for i in range(0, TAGS, 7)] + [f"/page/{i}" for i in range(1, 6)]
+        if path.startswith("/tag/") or path.startswith("/page/"):
+            number = int(re.sub(r"\D", "", path) or 0)
+            links += [f"/tag/topic-{(number + i) % TAGS}" for i in range(1, 15)]
+            links += [f"/page/{(number + i) % PAGINATION + 1}" for i in range(1, 4)]
+        elif path.startswith("/blog/"):
+            number = int(re.sub(r"\D", "", path) or 0)
+            links += [f"/blog/post-{(number + i) % BLOG_POSTS}" for i in range(1, 4)]
+            links += [f"/security/advisories/ADV-{(number * 3 + i) % ADVISORIES}" for i in range(2)]
+        body = "<html><body><p>Fixture page {}</p>{}</body></html>".format(
+            path, "".join(f'<a href="{link}">{link}</a>' for link in links))
+        self._send(body, "text/html")
+
+    def _sitemap_index(self):
+        items = "".join(f"<sitemap><loc>{self._url(path)}</loc></sitemap>"
+                        for path in ("/sitemap-advisories.xml", "/sitemap-blog.xml"))
+        return f'<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{items}</sitemapindex>'
+
+    def _urlset(self, entries):
+        items = "".join(f"<url><loc>{self._url(path)}</loc><lastmod>{when:%Y-%m-%d}</lastmod></url>" for path, when in entries)
+        return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{items}</urlset>'
+
+    def _url(self, path):
+        return f"http://{self.headers['Host']}{path}"
+
+    def _send(self, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_crawl(start_url, budget, scheduled):
+    visited = []
+
+    def handler(url, content):
+        visited.append(url)
+        _, hrefs = parse_page(content)
+        return [urljoin(url, href) for href in hrefs]
+
+    crawler = AsyncCrawler(handler, concurrency=8, delay=0, scorer=UrlScorer() if scheduled else None,
+                           use_sitemaps=scheduled, respect_robots=scheduled)
+    crawler.crawl(start_url, budget)
+    advisories = sum(1 for url in visited if ADVISORY_PATH.match(urlparse(url).path))
+    return len(visited), advisories
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl budget spent on advisory pages: breadth-first vs sitemap/priority scheduling")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="max pages per crawl")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    start_url = f"http://127.0.0.1:{server.server_port}/"
+
+    results = [(name, *run_crawl(start_url, args.budget, scheduled)) for name, scheduled in
+               (("breadth-first", False), ("scheduled", True))]
+    server.shutdown()
+
+    print(f"\n{HEADING}Crawl scheduling on the fixture site: budget {args.budget} pages, {ADVISORIES} advisories{RESET}")
+    print(f"{INFO}{'crawl':<14} {'pages':>6} {'advisories':>11} {'share':>7}{RESET}")
+    for name, pages, advisories in results:
+        print(f"{name:<14} {pages:>6} {advisories:>11} {advisories / max(1, pages):>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+import io
+import os
+import re
+import json
+import math
+import time
+import random
+import shutil
+import sys
+import hashlib
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import contextlib
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import chromadb
+import fitz  # PyMuPDF
+from colorama import Fore, Style
+import add_data
+from metrics import metrics
+from write_buffer import WriteBuffer
+from dedup import ChunkDeduplicator
+from keyword_index import KeywordIndex
+from embed_cache import CachedEmbedder
+from embeddings import LocalEmbedder, EMBEDDING_BACKENDS
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Benchmark Configuration ---
+RESULTS_FOLDER = "bench_results"
+BENCHMARKS = ["local_folder", "crawl", "add_text", "query", "startup"]   # Run in this order, query searches what the others added
+TXT_FILES = 20              # Corpus sizes at --scale 1
+TXT_FILE_KB = 256
+PDF_FILES = 10
+PDF_PAGES = 20
+SITE_PAGES = 200
+SITE_LINKS = 6              # Links from every fixture page to other pages
+TEXTS = 200
+TEXT_KB = 16
+QUERIES = 200
+QUERY_RESULTS = 5
+STARTUP_RUNS = 5            # Fresh interpreters per startup figure, the median is reported
+HEAVY_MODULES = ("chromadb", "fitz", "requests", "aiohttp", "bs4", "lxml", "numpy", "onnxruntime")
+HASH_DIMENSIONS = 384       # Same as all-MiniLM-L6-v2
+CHANGE_THRESHOLD = 0.05     # Changes smaller than this are shown as unchanged by --compare
+
+WORDS = ("exploit vulnerability remote code execution buffer overflow privilege escalation patch advisory "
+         "malware ransomware phishing credential lateral movement persistence beacon payload kernel driver "
+         "firmware authentication bypass injection sanitization mitigation detection sandbox deserialization "
+         "heap stack pointer race condition token session cookie certificate signature rootkit botnet "
+         "exfiltration reconnaissance scanner fuzzing hardening telemetry incident response forensic").split()
+
+
+class HashEmbedder:
+    #Deterministic pseudo-embeddings from a hash of the text: benchmarks everything except the model
+    #(bench_embeddings.py covers that) and needs no model download
+    model_id = "hash"
+
+    def __call__(self, texts):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(HASH_DIMENSIONS).astype(np.float32)
+            vectors.append((vector / np.linalg.norm(vector)).tolist())
+        return vectors
+
+    def report(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def paragraph(rng, sentences=5):
+    #Pseudo-text with a CVE-like ID per sentence, so chunks of different documents are not near-duplicates
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize()
+        + f" (CVE-{rng.randint(2000, 2025)}-{rng.randint(1000, 99999)})." for _ in range(sentences))
+
+
+def text_of_size(rng, kilobytes):
+    paragraphs, size = [], 0
+    while size < kilobytes * 1024:
+        paragraphs.append(paragraph(rng))
+        size += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)
+
+
+def build_local_corpus(folder: Path, rng, scale):
+    #TXT and PDF files for process_local_folder. Returns the total size in bytes
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(max(1, round(TXT_FILES * scale))):
+        (folder / f"notes-{i}.txt").write_text(text_of_size(rng, TXT_FILE_KB), encoding="utf-8")
+    for i in range(max(1, round(PDF_FILES * scale))):
+        with fitz.open() as doc:
+            for _ in range(PDF_PAGES):
+                page = doc.new_page()
+                page.insert_textbox(page.rect + (40, 40, -40, -40), "\n\n".join(paragraph(rng) for _ in range(3)), fontsize=9)
+            doc.save(folder / f"report-{i}.pdf")
+    return sum(f.stat().st_size for f in folder.iterdir())
+
+
+class FixtureSite(BaseHTTPRequestHandler):
+    #Every page is generated from its number, so the site is identical across runs
+    pages = SITE_PAGES
+    seed = 0
+
+    def do_GET(self):
+        if not self.path.startswith("/page-"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        number = int(self.path[len("/page-"):] or 0)
+        rng = random.Random(f"{self.seed}-{number}")
+        links = "".join(f'<li><a href="/page-{rng.randrange(self.pages)}">related</a></li>' for _ in range(SITE_LINKS))
+        text = "".join(f"<p>{paragraph(rng)}</p>" for _ in range(4))
+        body = (f"<html><head><title>Advisory {number}</title></head><body><nav><ul>{links}"
+                f'<li><a href="/page-{(number + 1) % self.pages}">next</a></li></ul></nav>'
+                f"<article>{text}</article></body></html>").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    #Hides add_data's per-file and per-page output while timing
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+class Suite:
+    #Runs the benchmarks against a throwaway database built with add_data's own pipeline
+    #(write buffer, embedding cache, keyword index, near-duplicate filter), so results track the code that ships
+
+    def __init__(self, workdir: Path, embed_backend, scale, workers, seed, verbose):
+        self.workdir = workdir
+        self.scale = scale
+        self.workers = workers
+        self.seed = seed
+        self.verbose = verbose
+        self.db_path = str(workdir / "SecDB")
+        # add_data reads these at call time, so its functions use the throwaway database and corpus
+        add_data.CHROMA_PATH = self.db_path
+        add_data.LOCAL_DATA_FOLDER = str(workdir / "loc_data")
+
+        self.client = chromadb.PersistentClient(path=self.db_path)
+        self.chroma = self.client.get_or_create_collection(name=add_data.COLLECTION_NAME)
+        if embed_backend == "hash":
+            self.embedder = HashEmbedder()
+        else:
+            local_embedder = LocalEmbedder(embed_backend, None, add_data.EMBED_BATCH_SIZE, add_data.EMBED_THREADS)
+            self.embedder = CachedEmbedder(local_embedder, local_embedder.model_id, str(workdir / "embed_cache.sqlite3"))
+        self.buffer = WriteBuffer(self.chroma, add_data.WRITE_BATCH_CHUNKS, add_data.WRITE_BATCH_BYTES,
+                                  self.client.get_max_batch_size(), self.embedder)
+        self.keywords = KeywordIndex(self.buffer, self.db_path)
+        self.collection = ChunkDeduplicator(self.keywords, self.db_path, add_data.DEDUP_THRESHOLD)
+
+    def close(self):
+        self.collection.flush()
+        self.collection.close()
+        self.keywords.close()
+        self.embedder.close()
+
+    def timed(self, run):
+        #(seconds, chunks added, stage metrics) of run(), including the write of everything it buffered
+        metrics.reset()
+        chunks_before = self.chroma.count()
+        start = time.perf_counter()
+        with quiet(not self.verbose):
+            run()
+            self.collection.flush()
+        seconds = time.perf_counter() - start
+        return seconds, self.chroma.count() - chunks_before, metrics.snapshot()
+
+    def local_folder(self):
+        folder = Path(add_data.LOCAL_DATA_FOLDER)
+        size = build_local_corpus(folder, random.Random(self.seed), self.scale)
+        files = len(list(folder.iterdir()))
+        seconds, chunks, stages = self.timed(lambda: add_data.process_local_folder(self.collection, self.workers))
+        return {"files": files, "mb": size / 1024 / 1024, "chunks": chunks, "seconds": seconds,
+                "files_per_s": files / seconds, "mb_per_s": size / 1024 / 1024 / seconds,
+                "chunks_per_s": chunks / seconds, "stages": stages}
+
+    def crawl(self):
+        pages = max(1, round(SITE_PAGES * self.scale))
+        site = type("Site", (FixtureSite,), {"pages": pages, "seed": self.seed})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), site)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        start_url = f"http://127.0.0.1:{server.server_port}/page-0"
+        try:
+            # No politeness delay against the local server: this measures the crawler, not the site
+            seconds, chunks, stages = self.timed(lambda: add_data.recursive_scrape(
+                start_url, pages, self.collection, delay=0))
+        finally:
+            server.shutdown()
+        visited = stages.get("html_parse", {}).get("calls", 0)
+        return {"pages": visited, "chunks": chunks, "seconds": seconds, "pages_per_s": visited / seconds,
+                "chunks_per_s": chunks / seconds, "stages": stages}
+
+    def add_text(self):
+        rng = random.Random(self.seed + 1)
+        texts = [text_of_size(rng, TEXT_KB) for _ in range(max(1, round(TEXTS * self.scale)))]
+        size = sum(map(len, texts))
+
+        def run():
+            for i, text in enumerate(texts):
+                add_data.process_and_add_text(text, self.collection, {"source_url": f"bench://text/{i}"})
+
+        seconds, chunks, stages = self.timed(run)
+        return {"texts": len(texts), "mb": size / 1024 / 1024, "chunks": chunks, "seconds": seconds,
+                "chunks_per_s": chunks / seconds, "mb_per_s": size / 1024 / 1024 / seconds, "stages": stages}
+
+    def query(self):
+        #Latency of embedding a question and searching the collection built by the other benchmarks, and of
+        #identifier lookups (CVE IDs of stored chunks) in the keyword index
+        self.collection.flush()
+        if not self.chroma.count():
+            return {"error": "empty collection, run another benchmark first"}
+        rng = random.Random(self.seed + 2)
+        questions = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))) for _ in range(max(1, QUERIES))]
+        for question in questions[:5]:     # Warm up: load the model and the index
+            self.chroma.query(query_embeddings=self.embedder([question]), n_results=QUERY_RESULTS)
+
+        embed_ms, search_ms, total_ms = [], [], []
+        for question in questions:
+            start = time.perf_counter()
+            vector = self.embedder([question])
+            embedded = time.perf_counter()
+            self.chroma.query(query_embeddings=vector, n_results=QUERY_RESULTS)
+            done = time.perf_counter()
+            embed_ms.append((embedded - start) * 1000)
+            search_ms.append((done - embedded) * 1000)
+            total_ms.append((done - start) * 1000)
+        stored = self.chroma.get(limit=QUERIES, include=["documents"])["documents"]
+        identifiers = sorted({cve for document in stored for cve in re.findall(r"CVE-\d{4}-\d+", document)})[:QUERIES]
+        keyword_ms = []
+        for identifier in identifiers:
+            start = time.perf_counter()
+            self.keywords.search(identifier, QUERY_RESULTS)
+            keyword_ms.append((time.perf_counter() - start) * 1000)
+        result = {"queries": len(questions), "collection_chunks": self.chroma.count(),
+                  "queries_per_s": len(questions) / (sum(total_ms) / 1000)}
+        for name, values in (("total", total_ms), ("embed", embed_ms), ("search", search_ms), ("keyword", keyword_ms)):
+            if not values:
+                continue
+            values.sort()
+            for p in (50, 90, 99):
+                result[f"{name}_p{p}_ms"] = percentile(values, p)
+        return result
+
+    def startup(self):
+        #Cold start of add_data.py in fresh interpreters (what every cron or scheduler run pays): --help, and a
+        #folder job with nothing new to add, which still opens the database and the write pipeline. A bare
+        #interpreter is the floor. heavy_modules lists the heavy dependencies the folder job imported
+        folder = self.workdir / "startup"
+        (folder / "empty").mkdir(parents=True, exist_ok=True)
+        (folder / "jobs.json").write_text(json.dumps([{"type": "folder", "path": "empty"}]), encoding="utf-8")
+        script = str(Path(add_data.__file__).resolve())
+        commands = {"python": [sys.executable, "-c", "pass"], "help": [sys.executable, script, "--help"],
+                    "folder_job": [sys.executable, script, "jobs", "jobs.json"]}
+        result = {}
+        for name, command in commands.items():
+            times = []
+            for _ in range(STARTUP_RUNS):
+                start = time.perf_counter()
+                run = subprocess.run(command, cwd=folder, capture_output=True, text=True)
+                times.append((time.perf_counter() - start) * 1000)
+                if run.returncode:
+                    return {"error": f"{' '.join(command[1:])} failed: {run.stderr.strip()[-500:]}"}
+            result[f"{name}_ms"] = percentile(sorted(times), 50)
+        run = subprocess.run([sys.executable, "-X", "importtime"] + commands["folder_job"][1:], cwd=folder,
+                             capture_output=True, text=True)
+        imported = {line.split("|")[-1].strip() for line in run.stderr.splitlines() if line.startswith("import time:")}
+        result["heavy_modules"] = ", ".join(module for module in HEAVY_MODULES if module in imported) or "none"
+        return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def higher_is_better(key):
+    return key.endswith("_per_s")
+
+
+def compare(old_results, new_results):
+    #Prints every throughput and latency figure of both runs with the relative change
+    print(f"\n{HEADING}Compared with {old_results['run'].get('commit') or 'unknown commit'} "
+          f"({old_results['run'].get('time')}){RESET}")
+    print(f"{INFO}{'benchmark':<14} {'metric':<18} {'before':>12} {'after':>12} {'change':>9}{RESET}")
+    for name, new in new_results["results"].items():
+        old = old_results["results"].get(name, {})
+        for key, value in new.items():
+            if not (key.endswith("_per_s") or key.endswith("_ms")) or not isinstance(old.get(key), (int, float)):
+                continue
+            change = (value - old[key]) / old[key] if old[key] else 0.0
+            better = change > 0 if higher_is_better(key) else change < 0
+            color = "" if abs(change) < CHANGE_THRESHOLD else (SUCCESS if better else WARNING)
+            print(f"{name:<14} {key:<18} {old[key]:>12.2f} {value:>12.2f} {color}{change:>+9.1%}{RESET}")
+
+
+def print_results(results):
+    for name, result in results.items():
+        print(f"\n{HEADING}{name}{RESET}")
+        if "error" in result:
+            print(f"  {WARNING}{result['error']}{RESET}")
+            continue
+        for key, value in result.items():
+            if key != "stages":
+                print(f"  {key:<20} {value:>12.2f}" if isinstance(value, float) else f"  {key:<20} {value:>12}")
+        slowest = sorted(result.get("stages", {}).items(), key=lambda item: -item[1]["seconds"])[:3]
+        if slowest:
+            print(f"  {INFO}slowest stages: " + ", ".join(f"{stage} {totals['seconds']:.2f}s" for stage, totals in slowest)
+                  + RESET)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion and retrieval benchmarks on generated fixture corpora "
+                                                 "(TXT, PDF and a local HTML site) with a throwaway database")
+    parser.add_argument("benchmarks", nargs="*", default=BENCHMARKS,
+                        help=f"benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--scale", type=float, default=1.0, help="corpus size multiplier")
+    parser.add_argument("--workers", type=int, default=add_data.INGEST_WORKERS, help="processes for local files")
+    parser.add_argument("--embed-backend", choices=sorted(EMBEDDING_BACKENDS) + ["hash"], default=add_data.EMBED_BACKEND,
+                        help="hash = deterministic vectors without a model, to measure everything but embedding")
+    parser.add_argument("--seed", type=int, default=1, help="corpus seed, keep it fixed to compare runs")
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_FOLDER}/bench-<time>.json)")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="print changes against an earlier results file")
+    parser.add_argument("--keep", action="store_true", help="keep the generated corpus and database")
+    parser.add_argument("--verbose", action="store_true", help="show add_data's output while timing")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))} (choose from {', '.join(BENCHMARKS)})")
+
+    workdir = Path(tempfile.mkdtemp(prefix="cyber-rag-bench-"))
+    run_info = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(), "python": platform.python_version(),
+                "platform": platform.platform(), "cpus": os.cpu_count(), "chromadb": chromadb.__version__,
+                "args": vars(args)}
+    results = {}
+    suite = Suite(workdir, args.embed_backend, args.scale, args.workers, args.seed, args.verbose)
+    try:
+        for name in [name for name in BENCHMARKS if name in args.benchmarks]:
+            print(f"{INFO}Running {name}...{RESET}")
+            results[name] = getattr(suite, name)()
+    finally:
+        suite.close()
+        if args.keep:
+            print(f"{INFO}Corpus and database kept in {workdir}{RESET}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+    output = args.output or os.path.join(RESULTS_FOLDER, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    report = {"run": run_info, "results": results}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n{SUCCESS}Results written to {output}{RESET}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import io
+import sys
+import time
+import tempfile
+import argparse
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlparse
+from colorama import Fore, Style
+from crawler import AsyncCrawler
+from frontier import CrawlFrontier
+from page_parser import parse_page
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+RESET = Style.RESET_ALL
+
+# --- Fixture Site Configuration ---
+FANOUT = 3                  # Child pages per page: page n links to pages FANOUT*n+1 ... FANOUT*n+FANOUT
+SITE_PAGES = 364            # Pages 0-363 = depths 0-5
+LATENCY = 0.03              # Seconds every response takes
+SPEEDUP_PAGES = 60
+MIN_SPEEDUP = 3.0           # Concurrency 16 vs 1 on SPEEDUP_PAGES pages
+DELAY_TOLERANCE = 0.005     # Seconds a politeness gap may come up short (timer resolution)
+
+
+class FixtureSite(BaseHTTPRequestHandler):
+    #A tree of pages. Every page also links to itself, its parent, a page under /private/ (disallowed by robots.txt)
+    #and the same site under another host name (localhost instead of 127.0.0.1), which a crawl must not follow.
+    #Every request is logged with its start and end time and the number of requests in flight at its start
+    lock = threading.Lock()
+    log = []
+    in_flight = 0
+
+    def do_GET(self):
+        with self.lock:
+            FixtureSite.in_flight += 1
+            entry = {"path": self.path, "host": self.headers["Host"], "start": time.monotonic(), "in_flight": self.in_flight}
+            self.log.append(entry)
+        try:
+            time.sleep(LATENCY)
+            if self.path == "/robots.txt":
+                return self._send("User-agent: *\nDisallow: /private/\n", "text/plain")
+            if self.path.startswith("/private/"):
+                return self._send("<html><body><p>Private</p></body></html>", "text/html")
+            if not self.path.startswith("/n/"):
+                return self._send("", "text/plain", 404)
+            number = int(self.path[len("/n/"):])
+            children = [FANOUT * number + i for i in range(1, FANOUT + 1) if FANOUT * number + i < SITE_PAGES]
+            links = [f"/n/{child}" for child in children]
+            links += [f"/n/{number}", f"/n/{max(0, (number - 1) // FANOUT)}", f"/private/{number}",
+                      f"http://localhost:{self.server.server_port}/n/{number}"]
+            self._send("<html><body><p>Page {}</p>{}</body></html>".format(
+                number, "".join(f'<a href="{link}">{link}</a>' for link in links)), "text/html")
+        finally:
+            with self.lock:
+                FixtureSite.in_flight -= 1
+                entry["end"] = time.monotonic()
+
+    def _send(self, text, content_type, status=200):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connection attempts under concurrency, which then wait a second for the retry
+    request_queue_size = 64
+    daemon_threads = True
+
+
+def depth_of(number):
+    depth = 0
+    while number:
+        number = (number - 1) // FANOUT
+        depth += 1
+    return depth
+
+
+def run_crawl(start_url, max_links, frontier=None, resume=False, **options):
+    #Crawls the fixture site with the crawler's per-page output hidden. Returns (pages visited, requests served)
+    FixtureSite.log.clear()
+
+    def handler(url, content):
+        _, hrefs = parse_page(content)
+        return [urljoin(url, href) for href in hrefs]
+
+    crawler = AsyncCrawler(handler, **{"delay": 0, **options})
+    with contextlib.redirect_stdout(io.StringIO()):
+        visited = crawler.crawl(start_url, max_links, frontier, resume)
+    return visited, list(FixtureSite.log)
+
+
+def pages_of(requests):
+    return [request["path"] for request in requests if request["path"] != "/robots.txt"]
+
+
+def check_link_limit(start_url):
+    visited, requests = run_crawl(start_url, 25, concurrency=8)
+    pages = pages_of(requests)
+    if visited != 25 or len(pages) != 25:
+        return f"max_links 25: {visited} pages counted, {len(pages)} requested"
+
+
+def check_breadth_first(start_url):
+    # One request at a time, so the visiting order is exactly the queue order
+    _, requests = run_crawl(start_url, 40, concurrency=1, respect_robots=True)
+    pages = pages_of(requests)
+    expected = [f"/n/{number}" for number in range(40)]
+    if pages != expected:
+        return f"visiting order {pages[:12]}... instead of /n/0, /n/1, /n/2, ..."
+    deepest = max(depth_of(int(page[len("/n/"):])) for page in pages)
+    if deepest != depth_of(39):
+        return f"reached depth {deepest}, breadth-first stops at depth {depth_of(39)}"
+
+
+def check_robots(start_url):
+    _, ignored = run_crawl(start_url, 60, concurrency=8)
+    _, respected = run_crawl(start_url, 60, concurrency=8, respect_robots=True)
+    if not any(page.startswith("/private/") for page in pages_of(ignored)):
+        return "the fixture's /private/ links were never followed without respect_robots"
+    if "/robots.txt" not in [request["path"] for request in respected]:
+        return "robots.txt was not requested with respect_robots"
+    disallowed = [page for page in pages_of(respected) if page.startswith("/private/")]
+    if disallowed:
+        return f"fetched {len(disallowed)} disallowed pages, e.g. {disallowed[0]}"
+
+
+def check_same_domain(start_url):
+    _, requests = run_crawl(start_url, 100, concurrency=8)
+    host = urlparse(start_url).netloc
+    other_hosts = sorted({request["host"] for request in requests if request["host"] != host})
+    if other_hosts:
+        return f"requested pages on {', '.join(other_hosts)}"
+
+
+def check_no_refetch(start_url):
+    # Every page links to itself and its parent, each URL must still be fetched once
+    _, requests = run_crawl(start_url, 100, concurrency=8)
+    pages = pages_of(requests)
+    if len(pages) != len(set(pages)):
+        return f"{len(pages) - len(set(pages))} pages were fetched more than once"
+
+
+def check_concurrency_limits(start_url):
+    _, limited = run_crawl(start_url, 60, concurrency=8, per_host=2)
+    _, unlimited = run_crawl(start_url, 60, concurrency=8, per_host=8)
+    most_limited = max(request["in_flight"] for request in limited)
+    most_unlimited = max(request["in_flight"] for request in unlimited)
+    if most_limited > 2:
+        return f"per_host 2: {most_limited} requests in flight"
+    if most_unlimited > 8:
+        return f"concurrency 8: {most_unlimited} requests in flight"
+    if most_unlimited <= 2:
+        return f"concurrency 8: never more than {most_unlimited} requests in flight, the limit isn't exercised"
+
+
+def check_politeness_delay(start_url):
+    delay = 0.05
+    _, requests = run_crawl(start_url, 15, concurrency=8, per_host=4, delay=delay)
+    starts = sorted(request["start"] for request in requests)
+    shortest = min(later - earlier for earlier, later in zip(starts, starts[1:]))
+    if shortest < delay - DELAY_TOLERANCE:
+        return f"delay {delay}s: two requests started {shortest:.3f}s apart"
+
+
+def check_resume(start_url):
+    # max_links applies per run: a resumed crawl visits max_links new pages and nothing it already visited
+    with tempfile.TemporaryDirectory() as folder:
+        with CrawlFrontier(folder) as frontier:
+            _, first = run_crawl(start_url, 20, frontier, concurrency=4)
+            progress = frontier.saved_progress(start_url)
+            visited, second = run_crawl(start_url, 20, frontier, resume=True, concurrency=4)
+    first, second = pages_of(first), pages_of(second)
+    if progress is None or progress[0] != 20:
+        return f"saved progress after the first run: {progress}"
+    if visited != 20 or len(second) != 20:
+        return f"resumed run visited {visited} pages ({len(second)} requests) instead of 20"
+    again = set(first) & set(second)
+    if again:
+        return f"resumed run fetched {len(again)} pages of the first run again, e.g. {sorted(again)[0]}"
+
+
+def check_speedup(start_url):
+    started = time.perf_counter()
+    run_crawl(start_url, SPEEDUP_PAGES, concurrency=1)
+    serial = time.perf_counter() - started
+    started = time.perf_counter()
+    run_crawl(start_url, SPEEDUP_PAGES, concurrency=16, per_host=16)
+    concurrent = time.perf_counter() - started
+    if serial / concurrent < MIN_SPEEDUP:
+        return f"{SPEEDUP_PAGES} pages: {serial:.2f}s at concurrency 1, {concurrent:.2f}s at 16 (< {MIN_SPEEDUP}x)"
+
+
+CHECKS = {
+    "link_limit": check_link_limit,
+    "breadth_first": check_breadth_first,
+    "robots": check_robots,
+    "same_domain": check_same_domain,
+    "no_refetch": check_no_refetch,
+    "concurrency_limits": check_concurrency_limits,
+    "politeness_delay": check_politeness_delay,
+    "resume": check_resume,
+    "speedup": check_speedup,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the crawler against a local fixture site, exits 1 if a check fails")
+    parser.add_argument("checks", nargs="*", metavar="CHECK", help=f"checks to run (default: all): {', '.join(CHECKS)}")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown checks: {', '.join(unknown)}")
+
+    server = FixtureServer(("127.0.0.1", 0), FixtureSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    start_url = f"http://127.0.0.1:{server.server_port}/n/0"
+
+    print(f"\n{HEADING}Crawler checks on a local fixture site{RESET}")
+    failed = []
+    for name in args.checks or CHECKS:
+        problem = CHECKS[name](start_url)
+        if problem:
+            failed.append(name)
+            print(f"{WARNING}  FAIL {name}: {problem}{RESET}")
+        else:
+            print(f"{SUCCESS}  ok   {name}{RESET}")
+    server.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from colorama import Fore, Style
+with contextlib.redirect_stdout(io.StringIO()):
+    # Importing dep_check runs its bootstrap check, which prints
+    from dep_check import EXIT_OK, EXIT_OUTDATED, EXIT_LOOKUP_FAILED
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+RESET = Style.RESET_ALL
+
+# --- Stand-in Index Configuration ---
+DEP_CHECK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dep_check.py")
+LATENCY = 0.3               # Seconds every version lookup takes
+MIN_IN_FLIGHT = 4           # Lookups that have to run at once
+CACHE_TTL = 3600
+RUN_TIMEOUT = 120
+
+# Runs dep_check.py as a script with pip and input() replaced: a pip run or a prompt in --check mode is a failure.
+# argv: module hidden from the bootstrap, distribution reported as not installed, dep_check.py, then its arguments
+CHILD = """
+import sys, runpy, builtins, subprocess, importlib.util, importlib.metadata
+hidden, missing, path = sys.argv[1:4]
+
+def pip_called(command, *args, **kwargs):
+    print("<pip called>")
+    raise subprocess.CalledProcessError(1, command)
+
+def input_called(*args):
+    raise RuntimeError("input() called in --check mode")
+
+find_spec, version = importlib.util.find_spec, importlib.metadata.version
+
+def find_spec_without_hidden(name, *args):
+    return None if name == hidden else find_spec(name, *args)
+
+def version_without_missing(name):
+    if name == missing:
+        raise importlib.metadata.PackageNotFoundError(name)
+    return version(name)
+
+subprocess.check_call = pip_called
+builtins.input = input_called
+importlib.util.find_spec = find_spec_without_hidden
+importlib.metadata.version = version_without_missing
+sys.argv = [path, *sys.argv[4:]]
+runpy.run_path(path, run_name="__main__")
+"""
+
+
+class StandInIndex(BaseHTTPRequestHandler):
+    #Answers <url>/<package>/json like PyPI's JSON API. Every package's latest version is "0" (never newer than the
+    #installed one), packages in outdated get "999.0" and packages in failing a 500. Every lookup is logged
+    outdated = set()
+    failing = set()
+    lock = threading.Lock()
+    log = []
+    in_flight = 0
+    most_in_flight = 0
+
+    def do_GET(self):
+        package = self.path.rstrip("/").split("/")[-2].lower()
+        with self.lock:
+            self.log.append(package)
+            StandInIndex.in_flight += 1
+            StandInIndex.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            time.sleep(LATENCY)
+            if package in self.failing:
+                self.send_response(500)
+                self.end_headers()
+                return
+            body = json.dumps({"info": {"version": "999.0" if package in self.outdated else "0"}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with self.lock:
+                StandInIndex.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connection attempts under concurrency, which then wait a second for the retry
+    request_queue_size = 64
+    daemon_threads = True
+
+
+@contextlib.contextmanager
+def serving():
+    #Index URL of a stand-in index on a local port, for the duration of the with block
+    server = FixtureServer(("127.0.0.1", 0), StandInIndex)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/pypi"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_dep_check(index_url, cache_file, ttl=0, outdated=(), failing=(), hidden="", missing=""):
+    #Runs dep_check.py --check in a fresh interpreter. Returns (exit code, output, packages looked up)
+    StandInIndex.outdated, StandInIndex.failing = set(outdated), set(failing)
+    StandInIndex.log.clear()
+    StandInIndex.most_in_flight = 0
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, hidden, missing, DEP_CHECK, "--check", "--index-url", index_url,
+         "--cache-file", cache_file, "--cache-ttl", str(ttl)],
+        capture_output=True, text=True, encoding="utf-8", errors="replace", timeout=RUN_TIMEOUT)
+    return result.returncode, result.stdout + result.stderr, list(StandInIndex.log)
+
+
+def problem_with(code, output, expected):
+    #What is wrong with a --check run, or None. Running pip, prompting or crashing is wrong whatever the exit code
+    if "<pip called>" in output:
+        return "ran pip in --check mode"
+    if "input() called" in output or "Traceback" in output:
+        return output.strip().splitlines()[-1]
+    if code != expected:
+        return f"exit code {code} instead of {expected}"
+
+
+def check_exit_codes(index_url, folder):
+    cases = [
+        ("up-to-date", {}, EXIT_OK),
+        ("outdated requests", {"outdated": {"requests"}}, EXIT_OUTDATED),
+        ("lookup of numpy failing", {"failing": {"numpy"}}, EXIT_LOOKUP_FAILED),
+        ("aiohttp not installed", {"missing": "aiohttp"}, EXIT_OUTDATED),
+        ("outdated and a lookup failing", {"outdated": {"requests"}, "failing": {"numpy"}}, EXIT_OUTDATED),
+    ]
+    for name, options, expected in cases:
+        code, output, _ = run_dep_check(index_url, os.path.join(folder, f"{name}.json"), **options)
+        problem = problem_with(code, output, expected)
+        if problem:
+            return f"{name}: {problem}"
+
+
+def check_missing_core_module(index_url, folder):
+    # The bootstrap must not install anything under --check, and must still fail the check
+    code, output, looked_up = run_dep_check(index_url, os.path.join(folder, "cache.json"), hidden="colorama")
+    problem = problem_with(code, output, EXIT_OUTDATED)
+    if problem:
+        return f"colorama missing: {problem}"
+    if looked_up:
+        return "the index was asked before the missing core module was reported"
+
+
+def check_concurrent_lookups(index_url, folder):
+    started = time.perf_counter()
+    code, _, looked_up = run_dep_check(index_url, os.path.join(folder, "cache.json"))
+    lookups = time.perf_counter() - started
+    if code != EXIT_OK or not looked_up:
+        return f"exit code {code} after {len(looked_up)} lookups"
+    if StandInIndex.most_in_flight < min(MIN_IN_FLIGHT, len(looked_up)):
+        return f"at most {StandInIndex.most_in_flight} of {len(looked_up)} lookups ran at once"
+    if len(looked_up) != len(set(looked_up)):
+        return f"{len(looked_up) - len(set(looked_up))} packages were looked up twice"
+    if lookups > LATENCY * len(looked_up):
+        return f"{len(looked_up)} lookups of {LATENCY}s took {lookups:.1f}s"
+
+
+def check_cache_ttl(index_url, folder):
+    cache_file = os.path.join(folder, "cache.json")
+    _, _, first = run_dep_check(index_url, cache_file, CACHE_TTL)
+    code, _, second = run_dep_check(index_url, cache_file, CACHE_TTL)
+    if not first or second or code != EXIT_OK:
+        return f"within the TTL: {len(second)} of {len(first)} packages looked up again, exit code {code}"
+    _, _, uncached = run_dep_check(index_url, cache_file, 0)
+    if sorted(uncached) != sorted(first):
+        return f"TTL 0: {len(uncached)} of {len(first)} packages looked up"
+    with open(cache_file, encoding="utf-8") as f:
+        cache = json.load(f)
+    for entry in cache.values():
+        entry["checked"] -= CACHE_TTL + 1
+    with open(cache_file, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    _, _, expired = run_dep_check(index_url, cache_file, CACHE_TTL)
+    if sorted(expired) != sorted(first):
+        return f"expired cache: {len(expired)} of {len(first)} packages looked up"
+    with serving() as other_index:
+        _, _, other = run_dep_check(other_index, cache_file, CACHE_TTL)
+    if sorted(other) != sorted(first):
+        return f"another index URL: {len(other)} of {len(first)} packages looked up, the cache is shared between indexes"
+
+
+def check_failed_lookups_not_cached(index_url, folder):
+    cache_file = os.path.join(folder, "cache.json")
+    run_dep_check(index_url, cache_file, CACHE_TTL, failing={"numpy"})
+    code, _, again = run_dep_check(index_url, cache_file, CACHE_TTL, failing={"numpy"})
+    if again != ["numpy"] or code != EXIT_LOOKUP_FAILED:
+        return f"second run looked up {again} instead of only numpy, exit code {code}"
+
+
+CHECKS = {
+    "exit_codes": check_exit_codes,
+    "missing_core_module": check_missing_core_module,
+    "concurrent_lookups": check_concurrent_lookups,
+    "cache_ttl": check_cache_ttl,
+    "failed_lookups_not_cached": check_failed_lookups_not_cached,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks dep_check.py --check against a local stand-in index, "
+                                                 "exits 1 if a check fails")
+    parser.add_argument("checks", nargs="*", metavar="CHECK", help=f"checks to run (default: all): {', '.join(CHECKS)}")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown checks: {', '.join(unknown)}")
+
+    print(f"\n{HEADING}dep_check checks on a local stand-in index{RESET}")
+    failed = []
+    with serving() as index_url:
+        for name in args.checks or CHECKS:
+            # Every check starts without a version cache
+            with tempfile.TemporaryDirectory() as folder:
+                problem = CHECKS[name](index_url, folder)
+            if problem:
+                failed.append(name)
+                print(f"{WARNING}  FAIL {name}: {problem}{RESET}")
+            else:
+                print(f"{SUCCESS}  ok   {name}{RESET}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
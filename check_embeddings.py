@@ -0,0 +1,123 @@
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+import chromadb
+from colorama import Fore, Style
+from embeddings import check_collection_model, record_collection_model, MODEL_METADATA_KEY, CHROMA_DEFAULT_MODEL
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+RESET = Style.RESET_ALL
+
+# --- Check Configuration ---
+ADD_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "add_data.py")
+OTHER_MODEL = "all-mpnet-base-v2"
+DIMENSION = 384
+RUN_TIMEOUT = 300
+
+
+def new_collection(folder, metadata=None, chunks=0):
+    #A collection in a new database under folder, with chunks stored (own vectors, so no model is needed)
+    client = chromadb.PersistentClient(path=os.path.join(folder, "SecDB"))
+    collection = client.create_collection("SecData", metadata=metadata)
+    if chunks:
+        collection.add(ids=[f"chunk-{i}" for i in range(chunks)], documents=[f"text {i}" for i in range(chunks)],
+                       embeddings=[[float(i + 1)] * DIMENSION for i in range(chunks)])
+    return collection
+
+
+def refused(collection, model):
+    try:
+        check_collection_model(collection, model)
+    except ValueError:
+        return True
+    return False
+
+
+def check_hnsw_metadata(folder):
+    # modify() refuses hnsw:* keys, recording the model must neither fail nor change the distance function
+    collection = new_collection(folder, {"hnsw:space": "cosine", "owner": "team"})
+    if refused(collection, OTHER_MODEL):
+        return "an empty collection with hnsw metadata refused a model"
+    record_collection_model(collection, OTHER_MODEL)
+    collection = chromadb.PersistentClient(path=os.path.join(folder, "SecDB")).get_collection("SecData")
+    if collection.metadata.get(MODEL_METADATA_KEY) != OTHER_MODEL or collection.metadata.get("owner") != "team":
+        return f"metadata after recording the model: {collection.metadata}"
+    space = (collection.configuration_json.get("hnsw") or {}).get("space")
+    if space != "cosine":
+        return f"distance function {space} after recording the model instead of cosine"
+
+
+def check_ingest_into_hnsw_collection(folder):
+    # What add_data does first: an empty folder job on an empty cosine collection must run and record the model
+    new_collection(folder, {"hnsw:space": "cosine"})
+    os.makedirs(os.path.join(folder, "loc_data"))
+    result = subprocess.run([sys.executable, ADD_DATA, "--no-dedup", "folder", "loc_data"], cwd=folder,
+                            capture_output=True, text=True, encoding="utf-8", errors="replace", timeout=RUN_TIMEOUT)
+    if result.returncode != 0:
+        return f"add_data exited with {result.returncode}: {(result.stdout + result.stderr).strip().splitlines()[-1:]}"
+    collection = chromadb.PersistentClient(path=os.path.join(folder, "SecDB")).get_collection("SecData")
+    if collection.metadata.get(MODEL_METADATA_KEY) != CHROMA_DEFAULT_MODEL:
+        return f"metadata after the folder job: {collection.metadata}"
+
+
+def check_mismatch_refused(folder):
+    collection = new_collection(folder, {MODEL_METADATA_KEY: CHROMA_DEFAULT_MODEL}, chunks=3)
+    if refused(collection, CHROMA_DEFAULT_MODEL):
+        return "the recorded model was refused"
+    if not refused(collection, OTHER_MODEL):
+        return f"{OTHER_MODEL} was accepted for a collection recorded as {CHROMA_DEFAULT_MODEL}"
+
+
+def check_default_function_inferred(folder):
+    # Collections from before models were recorded: Chroma's default embedding function means MiniLM
+    collection = new_collection(folder, chunks=3)
+    if refused(collection, CHROMA_DEFAULT_MODEL):
+        return f"{CHROMA_DEFAULT_MODEL} was refused for a collection with Chroma's default embedding function"
+    if not refused(collection, OTHER_MODEL):
+        return f"{OTHER_MODEL} was accepted for a collection with Chroma's default embedding function"
+
+
+def check_empty_collection_takes_any_model(folder):
+    collection = new_collection(folder)
+    if refused(collection, OTHER_MODEL):
+        return f"an empty collection refused {OTHER_MODEL}"
+
+
+CHECKS = {
+    "hnsw_metadata": check_hnsw_metadata,
+    "ingest_into_hnsw_collection": check_ingest_into_hnsw_collection,
+    "mismatch_refused": check_mismatch_refused,
+    "default_function_inferred": check_default_function_inferred,
+    "empty_collection_takes_any_model": check_empty_collection_takes_any_model,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the embedding model checks of collections, exits 1 if a check fails")
+    parser.add_argument("checks", nargs="*", metavar="CHECK", help=f"checks to run (default: all): {', '.join(CHECKS)}")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown checks: {', '.join(unknown)}")
+
+    print(f"\n{HEADING}Embedding model checks on throwaway databases{RESET}")
+    failed = []
+    for name in args.checks or CHECKS:
+        # Every check gets a new database
+        with tempfile.TemporaryDirectory() as folder:
+            problem = CHECKS[name](folder)
+        if problem:
+            failed.append(name)
+            print(f"{WARNING}  FAIL {name}: {problem}{RESET}")
+        else:
+            print(f"{SUCCESS}  ok   {name}{RESET}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
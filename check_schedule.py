@@ -0,0 +1,216 @@
+import io
+import re
+import sys
+import gzip
+import argparse
+import threading
+import contextlib
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer
+from urllib.parse import urljoin, urlparse
+from colorama import Fore, Style
+from crawler import AsyncCrawler
+from scheduler import UrlScorer, parse_sitemap, SITEMAP_MAX_BYTES
+from page_parser import parse_page
+from bench_schedule import FixtureSite, ADVISORIES, ADVISORY_PATH
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+RESET = Style.RESET_ALL
+
+# --- Check Configuration ---
+SMALL_BUDGET = 30           # Pages per crawl in the seeding checks
+BUDGET = 100                # Pages per crawl in the priority checks
+MIN_ADVISORY_SHARE = 0.8    # Of a scheduled crawl's budget that has to land on advisories
+BLOG_POST_PATH = re.compile(r"^/blog/post-\d+$")
+
+
+class LoggedSite(FixtureSite):
+    #bench_schedule's fixture site, with every requested path logged
+    log = []
+
+    def do_GET(self):
+        self.log.append(self.path)
+        super().do_GET()
+
+
+class GzipSite(LoggedSite):
+    #The same site, but robots.txt lists no sitemap and /sitemap.xml (where the crawler looks then) is gzipped
+    def do_GET(self):
+        if self.path == "/robots.txt":
+            self.log.append(self.path)
+            return self._send("User-agent: *\nDisallow: /account/\n", "text/plain")
+        if self.path == "/sitemap.xml":
+            self.log.append(self.path)
+            body = gzip.compress(self._urlset(
+                (f"/security/advisories/ADV-{i}", self.today) for i in range(ADVISORIES)).encode("utf-8"))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+
+class FixtureServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connection attempts under concurrency, which then wait a second for the retry
+    request_queue_size = 64
+    daemon_threads = True
+
+
+@contextlib.contextmanager
+def serving(site):
+    #Start URL of the fixture site on a local port, for the duration of the with block
+    server = FixtureServer(("127.0.0.1", 0), site)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_crawl(site, budget, scorer=None, use_sitemaps=False, respect_robots=False):
+    #Crawls a fixture site with the crawler's per-page output hidden. Returns (visited paths, requested paths)
+    site.log.clear()
+    visited = []
+
+    def handler(url, content):
+        visited.append(urlparse(url).path)
+        _, hrefs = parse_page(content)
+        return [urljoin(url, href) for href in hrefs]
+
+    crawler = AsyncCrawler(handler, concurrency=8, delay=0, scorer=scorer, use_sitemaps=use_sitemaps,
+                           respect_robots=respect_robots)
+    with serving(site) as start_url, contextlib.redirect_stdout(io.StringIO()):
+        crawler.crawl(start_url, budget)
+    return visited, list(site.log)
+
+
+def advisories_in(paths):
+    return [path for path in paths if ADVISORY_PATH.match(path)]
+
+
+def check_sitemap_seeding():
+    # Advisories are only linked deep inside the blog, within a small budget they can only come from the sitemaps
+    visited, requested = run_crawl(LoggedSite, SMALL_BUDGET, UrlScorer(), use_sitemaps=True, respect_robots=True)
+    for path in ("/robots.txt", "/sitemap_index.xml", "/sitemap-advisories.xml", "/sitemap-blog.xml"):
+        if path not in requested:
+            return f"{path} was never requested"
+    advisories = advisories_in(visited)
+    if len(advisories) < SMALL_BUDGET - 1:
+        return f"{len(advisories)} of {SMALL_BUDGET} pages were advisories, the sitemap wasn't used"
+
+
+def check_gzipped_fallback_sitemap():
+    visited, requested = run_crawl(GzipSite, SMALL_BUDGET, UrlScorer(), use_sitemaps=True)
+    if "/sitemap.xml" not in requested:
+        return "without a Sitemap line in robots.txt, /sitemap.xml was never requested"
+    advisories = advisories_in(visited)
+    if len(advisories) < SMALL_BUDGET - 1:
+        return f"{len(advisories)} of {SMALL_BUDGET} pages were advisories, the gzipped sitemap wasn't used"
+
+
+def check_priority():
+    breadth_first, _ = run_crawl(LoggedSite, BUDGET)
+    scheduled, _ = run_crawl(LoggedSite, BUDGET, UrlScorer(), use_sitemaps=True, respect_robots=True)
+    share = len(advisories_in(scheduled)) / max(1, len(scheduled))
+    baseline = len(advisories_in(breadth_first)) / max(1, len(breadth_first))
+    if share < MIN_ADVISORY_SHARE or share <= baseline:
+        return f"{share:.0%} of a scheduled crawl were advisories ({baseline:.0%} breadth-first), expected {MIN_ADVISORY_SHARE:.0%}+"
+
+
+def check_freshness():
+    # ADV-0 was modified today, ADV-1 yesterday, ...: the newest advisories come first
+    visited, _ = run_crawl(LoggedSite, SMALL_BUDGET, UrlScorer(), use_sitemaps=True)
+    numbers = sorted(int(path.rsplit("-", 1)[1]) for path in advisories_in(visited))
+    if numbers != list(range(len(numbers))):
+        return f"visited advisories {numbers[:10]}... instead of the newest ones (ADV-0, ADV-1, ...)"
+
+
+def check_robots():
+    # Breadth-first, so the /account/ links on every page aren't just pushed back by the scorer
+    _, ignored = run_crawl(LoggedSite, SMALL_BUDGET)
+    _, respected = run_crawl(LoggedSite, SMALL_BUDGET, respect_robots=True)
+    if not any(path.startswith("/account/") for path in ignored):
+        return "the fixture's /account/ links were never followed without respect_robots"
+    disallowed = [path for path in respected if path.startswith("/account/")]
+    if disallowed:
+        return f"fetched {disallowed[0]}, which robots.txt disallows"
+
+
+def check_custom_scorer():
+    # Any callable with UrlScorer's signature can replace it; this one only wants blog posts
+    def blog_first(url, depth=0, lastmod=None, in_sitemap=False):
+        return 1.0 if BLOG_POST_PATH.match(urlparse(url).path) else 0.0
+
+    visited, _ = run_crawl(LoggedSite, SMALL_BUDGET, blog_first, use_sitemaps=True)
+    posts = [path for path in visited if BLOG_POST_PATH.match(path)]
+    if len(posts) < SMALL_BUDGET - 1:
+        return f"{len(posts)} of {SMALL_BUDGET} pages were blog posts with a scorer that only wants blog posts"
+
+
+def check_sitemap_parsing():
+    urlset = ('<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+              + "".join(f"<url><loc>http://a.test/p{i}</loc><lastmod>2024-05-0{i % 9 + 1}T10:00:00Z</lastmod></url>"
+                        for i in range(1000)) + "</urlset>").encode("utf-8")
+    kind, entries = parse_sitemap(urlset)
+    if kind != "urlset" or len(entries) != 1000:
+        return f"plain urlset: {kind} with {len(entries)} entries instead of 1000"
+    if entries[0] != ("http://a.test/p0", datetime(2024, 5, 1, 10, tzinfo=timezone.utc)):
+        return f"first entry {entries[0]}"
+    kind, entries = parse_sitemap(b'<sitemapindex><sitemap><loc>http://a.test/s.xml</loc><lastmod>2024-05-01</lastmod>'
+                                  b'</sitemap></sitemapindex>')
+    if kind != "index" or entries != [("http://a.test/s.xml", datetime(2024, 5, 1, tzinfo=timezone.utc))]:
+        return f"sitemap index: {kind} {entries}"
+    if parse_sitemap(gzip.compress(urlset)) != parse_sitemap(urlset):
+        return "a gzipped sitemap parsed differently"
+    if parse_sitemap(b"\x1f\x8bgarbage") != ("urlset", []):
+        return "a broken gzip stream didn't parse to an empty urlset"
+    compressed = gzip.compress(urlset)
+    truncated = parse_sitemap(compressed[:len(compressed) // 2])[1]
+    if not 0 < len(truncated) < 1000:
+        return f"a truncated gzipped sitemap gave {len(truncated)} entries"
+    # Bigger than the limit once decompressed: only SITEMAP_MAX_BYTES are read, the rest is cut off
+    bomb = gzip.compress(urlset[:-len(b"</urlset>")] + b" " * (SITEMAP_MAX_BYTES + 1024) + b"</urlset>", 9)
+    if len(parse_sitemap(bomb)[1]) != 1000:
+        return "the entries before the cut of an oversized gzipped sitemap were lost"
+
+
+CHECKS = {
+    "sitemap_seeding": check_sitemap_seeding,
+    "gzipped_fallback_sitemap": check_gzipped_fallback_sitemap,
+    "priority": check_priority,
+    "freshness": check_freshness,
+    "robots": check_robots,
+    "custom_scorer": check_custom_scorer,
+    "sitemap_parsing": check_sitemap_parsing,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks sitemap seeding and crawl priorities on a local fixture site, "
+                                                 "exits 1 if a check fails")
+    parser.add_argument("checks", nargs="*", metavar="CHECK", help=f"checks to run (default: all): {', '.join(CHECKS)}")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown checks: {', '.join(unknown)}")
+
+    print(f"\n{HEADING}Crawl scheduling checks on a local fixture site{RESET}")
+    failed = []
+    for name in args.checks or CHECKS:
+        problem = CHECKS[name]()
+        if problem:
+            failed.append(name)
+            print(f"{WARNING}  FAIL {name}: {problem}{RESET}")
+        else:
+            print(f"{SUCCESS}  ok   {name}{RESET}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
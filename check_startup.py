@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from colorama import Fore, Style
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+RESET = Style.RESET_ALL
+
+# --- Check Configuration ---
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ("chromadb", "fitz", "requests", "aiohttp", "bs4", "lxml", "numpy", "onnxruntime")
+# A folder job has to open the database (chromadb, which loads numpy); a folder without new files needs nothing else
+DATABASE_MODULES = ("chromadb", "numpy")
+MARKER = "<loaded modules>"
+RUN_TIMEOUT = 300
+
+# Runs a script with the given arguments like "python script ...", then prints which heavy modules it imported.
+# argv: script, then its arguments
+CHILD = """
+import os, sys, json, runpy
+script = sys.argv[1]
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(script))
+try:
+    runpy.run_path(script, run_name="__main__")
+except SystemExit as e:
+    if e.code not in (None, 0):
+        raise
+print(MARKER + json.dumps(sorted(module for module in HEAVY_MODULES if module in sys.modules)))
+"""
+
+
+def heavy_modules_of(folder, script, *arguments):
+    #Heavy modules imported by "python script arguments" run in folder, or a string saying why the run failed
+    child = f"MARKER = {MARKER!r}\nHEAVY_MODULES = {HEAVY_MODULES!r}\n{CHILD}"
+    result = subprocess.run([sys.executable, "-c", child, os.path.join(HERE, script), *arguments], cwd=folder,
+                            capture_output=True, text=True, encoding="utf-8", errors="replace", timeout=RUN_TIMEOUT)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith(MARKER):
+            return json.loads(line[len(MARKER):])
+    return f"{script} {' '.join(arguments)} failed: {(result.stdout + result.stderr).strip().splitlines()[-1:]}"
+
+
+def expect_only(loaded, allowed, command):
+    if isinstance(loaded, str):
+        return loaded
+    unexpected = [module for module in loaded if module not in allowed]
+    if unexpected:
+        return f"{command} imported {', '.join(unexpected)}"
+
+
+def check_add_data_help(folder):
+    return expect_only(heavy_modules_of(folder, "add_data.py", "--help"), (), "add_data.py --help")
+
+
+def check_retrieval_help(folder):
+    return expect_only(heavy_modules_of(folder, "retrieval.py", "--help"), (), "retrieval.py --help")
+
+
+def check_folder_job(folder):
+    # Nothing to add: PDF, web and embedding model dependencies must stay unloaded
+    os.makedirs(os.path.join(folder, "empty"))
+    loaded = heavy_modules_of(folder, "add_data.py", "folder", "empty")
+    return expect_only(loaded, DATABASE_MODULES, "a folder job without new files")
+
+
+CHECKS = {
+    "add_data_help": check_add_data_help,
+    "retrieval_help": check_retrieval_help,
+    "folder_job": check_folder_job,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that add_data and retrieval only import heavy dependencies when "
+                                                 "they need them, exits 1 if a check fails")
+    parser.add_argument("checks", nargs="*", metavar="CHECK", help=f"checks to run (default: all): {', '.join(CHECKS)}")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown checks: {', '.join(unknown)}")
+
+    print(f"\n{HEADING}Startup import checks in fresh interpreters{RESET}")
+    failed = []
+    for name in args.checks or CHECKS:
+        # Every check runs in a new folder, so it gets its own throwaway database
+        with tempfile.TemporaryDirectory() as folder:
+            problem = CHECKS[name](folder)
+        if problem:
+            failed.append(name)
+            print(f"{WARNING}  FAIL {name}: {problem}{RESET}")
+        else:
+            print(f"{SUCCESS}  ok   {name}{RESET}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import io
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+from pathlib import Path
+import chromadb
+from colorama import Fore, Style
+import add_data
+from bench_suite import HashEmbedder, paragraph
+from write_buffer import WriteBuffer
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+RESET = Style.RESET_ALL
+
+# --- Check Configuration ---
+DEBOUNCE = 0.2              # Instead of add_data's WATCH_DEBOUNCE, so changes are picked up quickly
+WAIT_TIMEOUT = 30           # Seconds a change may take to show up in the collection
+
+
+class WatchRun:
+    #add_data's watch mode on a throwaway folder and database, on a background thread, with hash pseudo-embeddings
+    #(no model needed). Every list of paths the watch loop hands to process_files is recorded in batches
+
+    def __init__(self, workdir: Path):
+        self.folder = workdir / "loc_data"
+        self.folder.mkdir()
+        add_data.CHROMA_PATH = str(workdir / "SecDB")
+        add_data.WATCH_DEBOUNCE = DEBOUNCE
+        self.client = chromadb.PersistentClient(path=add_data.CHROMA_PATH)
+        self.chroma = self.client.get_or_create_collection(add_data.COLLECTION_NAME)
+        self.buffer = WriteBuffer(self.chroma, add_data.WRITE_BATCH_CHUNKS, add_data.WRITE_BATCH_BYTES,
+                                  self.client.get_max_batch_size(), HashEmbedder())
+        self.batches = []
+        process_files = add_data.process_files
+
+        def recording_process_files(collection, filepaths, *args, **kwargs):
+            self.batches.append([path.name for path in filepaths])
+            return process_files(collection, filepaths, *args, **kwargs)
+
+        add_data.process_files = recording_process_files
+        self._restore = lambda: setattr(add_data, "process_files", process_files)
+        self.thread = threading.Thread(target=add_data.watch_local_folder, daemon=True,
+                                       args=(self.buffer, 1, str(self.folder)), kwargs={"metrics_file": None})
+
+    def __enter__(self):
+        self.thread.start()
+        # The watcher is running once the catch-up pass over the empty folder went through process_files
+        self.wait_for(lambda: self.batches)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Removing the folder stops the watcher, and with it the watch loop
+        shutil.rmtree(self.folder, ignore_errors=True)
+        self.thread.join(WAIT_TIMEOUT)
+        self._restore()
+        return False
+
+    def sources(self):
+        return {Path(metadata["source_file"]).name for metadata in self.chroma.get(include=["metadatas"])["metadatas"]}
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.1)
+        return False
+
+
+def write_text(path: Path, seed: int):
+    path.write_text("\n\n".join(paragraph(random.Random(seed)) for _ in range(4)), encoding="utf-8")
+
+
+def check_bad_paths_in_batch(workdir):
+    # A directory and a FIFO named like text files and a broken PDF arrive in the same batch as good files.
+    # They are made next to the folder and moved in together, so the debounce can't split them into two batches
+    staging = workdir / "staging"
+    staging.mkdir()
+    (staging / "notes.txt").mkdir()
+    os.mkfifo(staging / "pipe.txt")
+    (staging / "broken.pdf").write_bytes(b"%PDF-1.7 not really")
+    for i in range(3):
+        write_text(staging / f"good-{i}.txt", i)
+    good = {f"good-{i}.txt" for i in range(3)}
+    with WatchRun(workdir) as run:
+        for path in list(staging.iterdir()):
+            path.rename(run.folder / path.name)
+        if not run.wait_for(lambda: good <= run.sources()):
+            return f"good files in the collection: {sorted(run.sources())}, batches: {run.batches[1:]}"
+        if not any({"notes.txt", "pipe.txt", "broken.pdf"} & set(batch) and good & set(batch) for batch in run.batches):
+            return f"no batch held a bad path next to good files, batches: {run.batches[1:]}"
+        # The watch loop is still going: a later file gets in too
+        write_text(run.folder / "later.txt", 9)
+        if not run.wait_for(lambda: "later.txt" in run.sources()):
+            return "a file written after the bad batch was never ingested"
+        if not run.thread.is_alive():
+            return "the watch loop ended"
+
+
+def check_changes_and_deletes(workdir):
+    with WatchRun(workdir) as run:
+        write_text(run.folder / "advisory.txt", 1)
+        if not run.wait_for(lambda: "advisory.txt" in run.sources()):
+            return "a new file was never ingested"
+        before = run.chroma.get(where={"source_file": str(run.folder / "advisory.txt")})["documents"]
+        write_text(run.folder / "advisory.txt", 2)
+        if not run.wait_for(lambda: run.chroma.get(where={"source_file": str(run.folder / "advisory.txt")})["documents"]
+                            not in ([], before)):
+            return "a changed file's chunks were never updated"
+        (run.folder / "advisory.txt").unlink()
+        if not run.wait_for(lambda: "advisory.txt" not in run.sources()):
+            return "a deleted file's chunks were never removed"
+
+
+CHECKS = {
+    "bad_paths_in_batch": check_bad_paths_in_batch,
+    "changes_and_deletes": check_changes_and_deletes,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks add_data's watch mode on a throwaway folder, exits 1 if a check fails")
+    parser.add_argument("checks", nargs="*", metavar="CHECK", help=f"checks to run (default: all): {', '.join(CHECKS)}")
+    parser.add_argument("--verbose", action="store_true", help="show add_data's output")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown checks: {', '.join(unknown)}")
+
+    print(f"\n{HEADING}Watch mode checks on a throwaway folder{RESET}")
+    failed = []
+    for name in args.checks or CHECKS:
+        with tempfile.TemporaryDirectory() as workdir:
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+                problem = CHECKS[name](Path(workdir))
+        if problem:
+            failed.append(name)
+            print(f"{WARNING}  FAIL {name}: {problem}{RESET}")
+        else:
+            print(f"{SUCCESS}  ok   {name}{RESET}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from itertools import accumulate
+
+# --- Chunker Configuration ---
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# start/end are character offsets into the full text that was fed in: text == full_text[start:end]
+Chunk = namedtuple("Chunk", ["text", "start", "end"])
+
+
+def tiktoken_length(encoding_name="cl100k_base"):
+    #Length function that counts tokens instead of characters (optional dependency: pip install tiktoken).
+    #Counts like LangChain's RecursiveCharacterTextSplitter.from_tiktoken_encoder, but text that looks like a
+    #special token is counted instead of raising
+    try:
+        import tiktoken
+    except ImportError as e:
+        raise ImportError("Token-count chunking needs: pip install tiktoken") from e
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def length(text):
+        return len(encoding.encode(text, disallowed_special=()))
+    return length
+
+
+class _Merger:
+    #Incremental version of LangChain's _merge_splits for keep_separator=True (splits are joined with "").
+    #Keeps running totals of the split lengths, so chunk ends and overlap starts are found with a bisect
+    #instead of adding and dropping one split at a time.
+
+    def __init__(self, chunk_size, chunk_overlap, emit, length=len):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.emit = emit
+        self.length = length
+        self._reset()
+
+    def _reset(self):
+        self.starts = []        # Offset of each split
+        self.texts = []
+        self.totals = [0]       # totals[i] = combined length of splits before i
+        self.head = 0           # First split of the chunk being built
+
+    def add(self, start, text, length=None):
+        if length is None:
+            length = self.length(text)
+        self.add_many([start], [text], [length])
+
+    def add_many(self, starts, texts, lengths):
+        self.starts += starts
+        self.texts += texts
+        totals = self.totals
+        totals += accumulate(lengths, initial=totals[-1])
+        del totals[-len(lengths) - 1]   # accumulate() repeats the running total it started from
+
+        chunk_size, chunk_overlap = self.chunk_size, self.chunk_overlap
+        count = len(self.texts)
+        head = self.head
+        while True:
+            # The split that would push the chunk past chunk_size closes it
+            end = bisect_right(totals, totals[head] + chunk_size, head) - 1
+            if end >= count:
+                break
+            if end == head:     # A single split can't be larger than a chunk, but never loop forever
+                end += 1
+                if end >= count:
+                    break
+            self._emit_range(head, end)
+            # Keep at most chunk_overlap of the tail, and only as much as still fits with the next split
+            keep_from = max(bisect_left(totals, totals[end] - chunk_overlap, head),
+                            bisect_left(totals, totals[end + 1] - chunk_size, head))
+            head = min(keep_from, bisect_left(totals, totals[end], head))
+        self.head = head
+
+        # Forget splits that can't be part of a chunk any more
+        if head > 4096:
+            del self.starts[:head], self.texts[:head], totals[:head]
+            self.head = 0
+
+    def flush(self):
+        if self.head < len(self.texts):
+            self._emit_range(self.head, len(self.texts))
+        self._reset()
+
+    def _emit_range(self, first, end):
+        text = "".join(self.texts[first:end])
+        stripped = text.strip()
+        if stripped:
+            start = self.starts[first] + len(text) - len(text.lstrip())
+            self.emit(Chunk(stripped, start, start + len(stripped)))
+
+
+class _Level:
+    #Splits a stream of text on one separator. Pieces shorter than chunk_size are merged into chunks,
+    #longer pieces are streamed into the next level down. Memory is bounded by the chunk size, not the text size.
+
+    def __init__(self, separators, chunk_size, chunk_overlap, emit, length=len, whole_text=False):
+        self.separator = separators[0]
+        self.lower_separators = separators[1:]
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.emit = emit
+        self.length = length
+        self.merger = _Merger(chunk_size, chunk_overlap, emit, length)
+        self.held_back = ""     # End of the last fragment that could be the start of a separator
+        self.held_back_offset = 0
+        # Whole-text levels always split (LangChain never merges the full text as one piece), which
+        # only matters when the separator never shows up and the length function isn't additive
+        self.whole_text = whole_text
+        self.separator_seen = False
+        self._reset_piece()
+
+    def _reset_piece(self):
+        self.piece = []
+        self.piece_start = None
+        self.piece_length = 0
+        self.lower = None       # Next level down, once the current piece is known to be too long
+
+    def feed(self, text, offset):
+        #text starts at character offset `offset` and directly follows the previous fragment
+        if not text:
+            return
+        if not self.separator:
+            # Last resort: every character is a split
+            chars = list(text)
+            self.merger.add_many(list(range(offset, offset + len(chars))), chars, list(map(self.length, chars)))
+            return
+        if self.held_back:
+            offset = self.held_back_offset
+            text = self.held_back + text
+            self.held_back = ""
+
+        separator = self.separator
+        parts = text.split(separator)
+        if len(parts) == 1:
+            self._extend_piece(self._hold_back(text, 0, offset), offset)
+            return
+
+        self.separator_seen = True
+        # Whatever comes before the first separator completes the open piece
+        self._extend_piece(parts[0], offset)
+        self._end_piece()
+
+        # Pieces that start and end inside this fragment (keep_separator: each starts with the separator)
+        pieces = [separator + part for part in parts[1:-1]]
+        starts = list(accumulate(map(len, pieces), initial=offset + len(parts[0])))
+        tail_start = starts.pop()
+        if pieces:
+            lengths = list(map(self.length, pieces))
+            chunk_size = self.chunk_size
+            if max(lengths) < chunk_size:
+                self.merger.add_many(starts, pieces, lengths)
+            else:
+                run = 0
+                for i, piece_length in enumerate(lengths):
+                    if piece_length >= chunk_size:
+                        if run < i:
+                            self.merger.add_many(starts[run:i], pieces[run:i], lengths[run:i])
+                        self._extend_piece(pieces[i], starts[i])
+                        self._end_piece()
+                        run = i + 1
+                if run < len(pieces):
+                    self.merger.add_many(starts[run:], pieces[run:], lengths[run:])
+
+        # The last piece stays open, the next fragment may continue it
+        tail = self._hold_back(separator + parts[-1], len(separator), tail_start)
+        self._extend_piece(tail, tail_start)
+
+    def _hold_back(self, text, search_from, offset):
+        #Keeps back the end of the text if it could be the first part of a separator split across fragments
+        separator = self.separator
+        for keep in range(min(len(separator) - 1, len(text) - search_from), 0, -1):
+            if text.endswith(separator[:keep]):
+                self.held_back = text[-keep:]
+                self.held_back_offset = offset + len(text) - keep
+                return text[:-keep]
+        return text
+
+    def finish(self):
+        if self.held_back:
+            held_back, self.held_back = self.held_back, ""
+            self._extend_piece(held_back, self.held_back_offset)
+        if self.whole_text and not self.separator_seen and self.lower is None and self.piece and self.lower_separators:
+            self.merger.flush()
+            self._split_with_lower("".join(self.piece), self.piece_start, whole_text=True)
+            self._reset_piece()
+        self._end_piece()
+        self.merger.flush()
+
+    def _split_with_lower(self, text, offset, whole_text=False):
+        lower = _Level(self.lower_separators, self.chunk_size, self.chunk_overlap, self.emit, self.length, whole_text)
+        lower.feed(text, offset)
+        lower.finish()
+
+    def _extend_piece(self, fragment, offset):
+        if not fragment:
+            return
+        if self.piece_start is None:
+            self.piece_start = offset
+        self.piece_length += len(fragment)
+        if self.lower is not None:
+            self.lower.feed(fragment, offset)
+            return
+        self.piece.append(fragment)
+        if self.length is not len and self.piece_length >= self.chunk_size:
+            # Token counts aren't additive, measure the whole piece
+            self.piece_length = self.length("".join(self.piece))
+        if self.piece_length >= self.chunk_size and self.lower_separators:
+            # Too long to merge: emit what was merged so far and split this piece with the next separator
+            self.merger.flush()
+            self.lower = _Level(self.lower_separators, self.chunk_size, self.chunk_overlap, self.emit, self.length,
+                                self.whole_text and not self.separator_seen)
+            self.lower.feed("".join(self.piece), self.piece_start)
+            self.piece = []
+
+    def _end_piece(self):
+        if self.lower is not None:
+            self.lower.finish()
+        elif self.piece:
+            text = "".join(self.piece)
+            piece_length = self.length(text) if self.length is not len else self.piece_length
+            if piece_length < self.chunk_size:
+                self.merger.add(self.piece_start, text, piece_length)
+            elif self.lower_separators:
+                # Only reached when a token count crossed chunk_size without the character count doing so
+                self.merger.flush()
+                self._split_with_lower(text, self.piece_start)
+            else:
+                # No separators left to split with, the piece becomes a chunk as it is
+                self.merger.flush()
+                self.emit(Chunk(text, self.piece_start, self.piece_start + len(text)))
+        self._reset_piece()
+
+
+class StreamingChunker:
+    #Recursive character splitter (same chunks as LangChain's RecursiveCharacterTextSplitter with
+    #keep_separator=True) that takes text in fragments, e.g. one PDF page at a time.
+    #feed() returns the chunks completed so far, finish() returns the rest. Every chunk carries its offsets.
+    #chunk_size/chunk_overlap are in characters unless a length_function (e.g. tiktoken_length()) is given.
+
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separators=None, length_function=None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self._ready = []
+        self._root = _Level(list(separators or SEPARATORS), chunk_size, chunk_overlap, self._ready.append,
+                            length_function or len, whole_text=True)
+        self._offset = 0
+
+    def feed(self, text):
+        if text:
+            self._root.feed(text, self._offset)
+            self._offset += len(text)
+        return self._take()
+
+    def finish(self):
+        self._root.finish()
+        return self._take()
+
+    def _take(self):
+        ready = self._ready[:]
+        self._ready.clear()
+        return ready
+
+
+def iter_chunks(fragments, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separators=None, length_function=None):
+    #Yields Chunks from an iterable of text fragments without holding the whole text
+    chunker = StreamingChunker(chunk_size, chunk_overlap, separators, length_function)
+    for fragment in fragments:
+        yield from chunker.feed(fragment)
+    yield from chunker.finish()
+
+
+def split_text(text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separators=None, length_function=None):
+    return [chunk.text for chunk in iter_chunks([text], chunk_size, chunk_overlap, separators, length_function)]
@@ -0,0 +1,335 @@
+import random
+import asyncio
+from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urljoin
+import aiohttp
+from colorama import Fore, Style
+from frontier import CrawlFrontier
+from metrics import metrics
+from scheduler import parse_robots, parse_sitemap, SITEMAP_MAX_FILES, SITEMAP_MAX_URLS, ROBOTS_USER_AGENT
+
+# Color Definitions for colorama
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Crawler Configuration ---
+DEFAULT_CONCURRENCY = 8     # Max requests in flight across all hosts
+DEFAULT_PER_HOST = 4        # Max requests in flight to a single host
+DEFAULT_DELAY = 0.1         # Seconds between request starts to the same host
+REQUEST_TIMEOUT = 15
+CHECKPOINT_PAGES = 100     # Pages between saves of the crawl frontier
+RETRY_ATTEMPTS = 4          # Tries per URL in URL list ingestion (transient errors only)
+RETRY_BACKOFF = 1.0         # Seconds before the first retry, doubled for every further one
+RETRY_BACKOFF_MAX = 60.0
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def describe_error(error):
+    #Short one-line description of a request or handler error, e.g. "503 Service Unavailable" or "TimeoutError"
+    if isinstance(error, aiohttp.ClientResponseError):
+        return f"{error.status} {error.message}"
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+
+class AsyncCrawler:
+    #Concurrent same-domain crawler sharing one connection pool.
+    #page_handler(url, content) is called for every fetched page and must return the links found on it.
+    #Handlers run one at a time on a single worker thread so only one writer ever touches the database.
+    #checkpoint() runs on that thread before every frontier save and must make the handled pages durable.
+    #With an http_cache, unchanged pages are answered from it (conditional requests) and never reach the handler.
+    #Without a scorer the crawl is breadth-first. With one (e.g. scheduler.UrlScorer) every queued URL gets
+    #scorer(url, depth, lastmod, in_sitemap) as its priority and the best URLs are visited first.
+    #use_sitemaps seeds the frontier from the sitemaps in robots.txt (or /sitemap.xml); respect_robots skips disallowed URLs.
+    #ingest_list() fetches a list of URLs instead of crawling, retrying transient errors up to retries times.
+
+    def __init__(self, page_handler, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                 delay=DEFAULT_DELAY, timeout=REQUEST_TIMEOUT, checkpoint=None, checkpoint_pages=CHECKPOINT_PAGES,
+                 http_cache=None, scorer=None, use_sitemaps=False, respect_robots=False, retries=RETRY_ATTEMPTS,
+                 backoff=RETRY_BACKOFF):
+        self.page_handler = page_handler
+        self.http_cache = http_cache
+        self.scorer = scorer
+        self.use_sitemaps = use_sitemaps
+        self.respect_robots = respect_robots
+        self.checkpoint = checkpoint or (lambda: None)
+        self.checkpoint_pages = max(1, checkpoint_pages)
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, min(per_host, self.concurrency))
+        self.delay = max(0.0, delay)
+        self.timeout = timeout
+        self.retries = max(1, retries)
+        self.backoff = max(0.0, backoff)
+
+    def crawl(self, start_url: str, max_links, frontier=None, resume=False):
+        #Blocking entry point. Returns the number of pages visited by this run; max_links applies per run,
+        #so resuming a crawl visits up to max_links more pages.
+        #Without a frontier the crawl state is kept in a throwaway in-memory one.
+        own_frontier = frontier is None
+        if own_frontier:
+            frontier = CrawlFrontier(":memory:")
+        try:
+            return asyncio.run(self._crawl(start_url, max_links, frontier, resume))
+        finally:
+            # Also runs on Ctrl+C: save everything handled so far so the crawl can be resumed
+            self.checkpoint()
+            frontier.finish()
+            if self.http_cache is not None:
+                self.http_cache.commit()
+            if own_frontier:
+                frontier.close()
+
+    async def _crawl(self, start_url: str, max_links, frontier, resume):
+        base_domain = urlparse(start_url).netloc
+        if frontier.start(start_url, resume):
+            print(f"{INFO}Resuming crawl: {frontier.scraped} pages already visited{RESET}")
+        scrape_count = 0
+        since_checkpoint = 0
+        in_flight = {}
+
+        self._init_limits()
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            async with self._session() as session:
+                self._robots = None
+                if self.use_sitemaps or self.respect_robots:
+                    sitemap_urls = await self._load_robots(session, start_url)
+                    # Seeded before the first page; a crawl that was interrupted while seeding seeds again
+                    if self.use_sitemaps and frontier.scraped == 0:
+                        await self._seed_from_sitemaps(session, frontier, start_url, sitemap_urls, base_domain)
+
+                while True:
+                    # Keep the pipeline full; pages waiting on the writer still count as in flight
+                    free_slots = min(self.concurrency * 2 - len(in_flight), max_links - scrape_count)
+                    if free_slots > 0:
+                        for current_url, depth in frontier.take(int(min(free_slots, self.concurrency * 2))):
+                            # Check if the link is on the same domain before scraping
+                            if urlparse(current_url).netloc != base_domain:
+                                frontier.skip(current_url)
+                                continue
+                            scrape_count += 1
+                            task = asyncio.create_task(self._visit(session, writer, current_url))
+                            in_flight[task] = (current_url, depth)
+
+                    if not in_flight:
+                        if scrape_count < max_links and frontier.has_queued():
+                            continue
+                        break
+
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        current_url, depth = in_flight.pop(task)
+                        # Only same-domain links are queued, the frontier never holds links that can't be visited
+                        frontier.push(self._entry(link, depth + 1) for link in task.result()
+                                      if urlparse(link).netloc == base_domain and self._allowed(link))
+                        frontier.done(current_url)
+                        since_checkpoint += 1
+
+                    if since_checkpoint >= self.checkpoint_pages:
+                        await asyncio.get_running_loop().run_in_executor(writer, self.checkpoint)
+                        frontier.commit()
+                        if self.http_cache is not None:
+                            self.http_cache.commit()
+                        since_checkpoint = 0
+        return scrape_count
+
+    def ingest_list(self, urls, results):
+        #Blocking entry point for URL lists: every URL of the (possibly lazy) iterable is fetched once, without
+        #following links, with the same limits as a crawl. Transient errors (timeouts, dropped connections,
+        #429 and 5xx responses) are retried with exponential backoff.
+        #results.record(url, status, http_status, attempts, error) gets "added", "unchanged" or "failed" for every
+        #URL and results.commit() runs after every checkpoint. Returns a Counter of the statuses.
+        try:
+            return asyncio.run(self._ingest_list(urls, results))
+        finally:
+            # Also runs on Ctrl+C: results are only saved for pages whose chunks are stored
+            self.checkpoint()
+            results.commit()
+            if self.http_cache is not None:
+                self.http_cache.commit()
+
+    async def _ingest_list(self, urls, results):
+        urls = iter(urls)
+        counts = Counter()
+        since_checkpoint = 0
+        in_flight = set()
+        exhausted = False
+
+        self._init_limits()
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            async with self._session() as session:
+                while True:
+                    # The list is read lazily; URLs waiting for a retry hold a place but no connection
+                    while not exhausted and len(in_flight) < self.concurrency * 4:
+                        url = next(urls, None)
+                        if url is None:
+                            exhausted = True
+                            break
+                        in_flight.add(asyncio.create_task(self._ingest_url(session, writer, url)))
+                    if not in_flight:
+                        break
+
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        url, status, http_status, attempts, error = task.result()
+                        results.record(url, status, http_status, attempts, error)
+                        counts[status] += 1
+                        since_checkpoint += 1
+
+                    if since_checkpoint >= self.checkpoint_pages:
+                        await asyncio.get_running_loop().run_in_executor(writer, self.checkpoint)
+                        results.commit()
+                        if self.http_cache is not None:
+                            self.http_cache.commit()
+                        since_checkpoint = 0
+                        print(f"{INFO}    {sum(counts.values())} URLs done: {counts['added']} added, "
+                              f"{counts['unchanged']} unchanged, {counts['failed']} failed{RESET}")
+        return counts
+
+    async def _ingest_url(self, session, writer, url: str):
+        #One URL of a list. Returns (url, status, http_status, attempts, error)
+        headers = self._conditional_headers(url)
+        for attempt in range(1, self.retries + 1):
+            try:
+                status, response_headers, content = await self._request(session, url, headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                http_status = getattr(e, "status", None)
+                transient = http_status in RETRY_STATUSES if http_status is not None else not isinstance(
+                    e, (aiohttp.InvalidURL, aiohttp.TooManyRedirects))
+                if not transient or attempt == self.retries:
+                    error = describe_error(e)
+                    print(f"{WARNING} ! {url} failed after {attempt} attempts: {error}{RESET}")
+                    return url, "failed", http_status, attempt, error
+                await asyncio.sleep(self._retry_delay(attempt, getattr(e, "headers", None)))
+                continue
+            try:
+                _, unchanged = await self._handle(writer, url, status, response_headers, content)
+            except Exception as e:
+                # A page the handler can't process must not stop a list of thousands
+                print(f"{WARNING} ! {url} could not be added: {describe_error(e)}{RESET}")
+                return url, "failed", status, attempt, describe_error(e)
+            return url, "unchanged" if unchanged else "added", status, attempt, ""
+
+    def _retry_delay(self, attempt, headers):
+        #Exponential backoff with jitter; a Retry-After header (in seconds) from a 429/503 takes precedence
+        retry_after = (headers or {}).get("Retry-After", "")
+        if retry_after.strip().isdigit():
+            return min(RETRY_BACKOFF_MAX, float(retry_after))
+        return min(RETRY_BACKOFF_MAX, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def _init_limits(self):
+        self._fetch_slots = asyncio.Semaphore(self.concurrency)
+        self._host_slots = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        self._host_locks = defaultdict(asyncio.Lock)
+        self._next_request_at = defaultdict(float)
+
+    def _session(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    def _entry(self, url, depth, lastmod=None, in_sitemap=False):
+        #Frontier entry for a URL: (url, priority, depth)
+        priority = self.scorer(url, depth, lastmod, in_sitemap) if self.scorer is not None else 0.0
+        return url, priority, depth
+
+    def _allowed(self, url):
+        return self._robots is None or self._robots.can_fetch(ROBOTS_USER_AGENT, url)
+
+    async def _load_robots(self, session, start_url):
+        #Reads robots.txt (its rules are only applied with respect_robots). Returns the sitemaps it lists
+        robots_url = urljoin(start_url, "/robots.txt")
+        fetched = await self._fetch(session, robots_url, quiet=True)
+        if fetched is None:
+            return []
+        robots, sitemap_urls = parse_robots(fetched[2].decode("utf-8", errors="replace"), robots_url)
+        if self.respect_robots:
+            self._robots = robots
+        return sitemap_urls
+
+    async def _seed_from_sitemaps(self, session, frontier, start_url, sitemap_urls, base_domain):
+        #Queues every same-domain page listed in the site's sitemaps (following sitemap indexes)
+        pending = list(sitemap_urls) or [urljoin(start_url, "/sitemap.xml")]
+        seen_sitemaps = set()
+        fetched_files = queued = listed = 0
+        while pending and fetched_files < SITEMAP_MAX_FILES and listed < SITEMAP_MAX_URLS:
+            batch = []
+            while pending and len(seen_sitemaps) < SITEMAP_MAX_FILES and len(batch) < self.concurrency:
+                sitemap_url = pending.pop(0)
+                if sitemap_url not in seen_sitemaps:
+                    seen_sitemaps.add(sitemap_url)
+                    batch.append(sitemap_url)
+            if not batch:
+                break
+            for fetched in await asyncio.gather(*(self._fetch(session, url, quiet=True) for url in batch)):
+                if fetched is None:
+                    continue
+                fetched_files += 1
+                kind, entries = parse_sitemap(fetched[2])
+                if kind == "index":
+                    pending.extend(loc for loc, _ in entries)
+                    continue
+                entries = entries[:SITEMAP_MAX_URLS - listed]
+                listed += len(entries)
+                queued += frontier.push(self._entry(loc, 1, lastmod, True) for loc, lastmod in entries
+                                        if urlparse(loc).netloc == base_domain and self._allowed(loc))
+        if fetched_files:
+            print(f"{SUCCESS}Seeded {queued} URLs from {fetched_files} sitemaps{RESET}")
+        frontier.commit()
+
+    async def _request(self, session, url: str, headers=None):
+        #GET with the crawler's limits and politeness delay. Returns (status, headers, body), raises on errors
+        host = urlparse(url).netloc
+        async with self._fetch_slots, self._host_slots[host]:
+            await self._wait_for_turn(host)
+            with metrics.stage("fetch") as timer:
+                async with session.get(url, headers=headers or {}) as response:
+                    response.raise_for_status()
+                    body = await response.read()
+                    timer.bytes = len(body)
+                    return response.status, response.headers, body
+
+    async def _fetch(self, session, url: str, headers=None, quiet=False):
+        #Like _request, but returns None on errors
+        try:
+            return await self._request(session, url, headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if not quiet:
+                print(f"{WARNING} ! Error during request: {e!r}{RESET}")
+            return None
+
+    def _conditional_headers(self, url: str):
+        return self.http_cache.conditional_headers(url) if self.http_cache is not None else {}
+
+    async def _visit(self, session, writer, url: str):
+        print(f"\n-> {INFO} Scraping: {url}")
+        fetched = await self._fetch(session, url, self._conditional_headers(url))
+        if fetched is None:
+            return []
+        links, _ = await self._handle(writer, url, *fetched)
+        return links
+
+    async def _handle(self, writer, url: str, status, response_headers, content):
+        #Runs the page handler on the writer thread unless the HTTP cache knows the page is unchanged.
+        #Returns (links, unchanged)
+        if self.http_cache is not None:
+            links = self.http_cache.unchanged_links(url, status, content, response_headers)
+            if links is not None:
+                print(f"  = {INFO}Unchanged since last crawl, skipped{RESET}")
+                return links, True
+        loop = asyncio.get_running_loop()
+        links = await loop.run_in_executor(writer, self.page_handler, url, content) or []
+        if self.http_cache is not None:
+            self.http_cache.record(url, response_headers, content, links)
+        return links, False
+
+    async def _wait_for_turn(self, host: str):
+        #Politeness delay: spaces out request starts to the same host
+        if not self.delay:
+            return
+        async with self._host_locks[host]:
+            loop = asyncio.get_running_loop()
+            wait = self._next_request_at[host] - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_request_at[host] = loop.time() + self.delay
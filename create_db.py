@@ -1,9 +1,13 @@
 import chromadb
 import os
+import re
 import sys
 import shutil
+import argparse
 import colorama
 from colorama import Fore, Style
+from snapshot import export_snapshot, import_snapshot, SNAPSHOT_SUFFIX
+from shards import ShardMap, open_collection, reshard, DEFAULT_WEB_SHARDS, FILE_SHARD
 
 # Colorama color Definitions
 HEADING = Fore.YELLOW
@@ -12,13 +16,17 @@ SUCCESS = Fore.GREEN
 INFO = Fore.CYAN
 RESET = Style.RESET_ALL
 
+# --- Database Configuration ---
+DEFAULT_DB_PATH = "SecDB"
+DEFAULT_COLLECTION_NAME = "SecData"
+
 
 def create_chroma_db():
     #Guides user through creating a persistent ChromaDB database and collection
     
     # Default names for database and collection
-    default_db_path = "SecDB"
-    default_collection_name = "SecData"
+    default_db_path = DEFAULT_DB_PATH
+    default_collection_name = DEFAULT_COLLECTION_NAME
 
     db_path = ""
     collection_name = ""
@@ -195,6 +203,98 @@ def create_chroma_db():
         sys.exit()
 
 
+def export_collection(db_path: str, collection_name: str, output: str = None):
+    #Writes a collection's chunks and embeddings to a snapshot file (see snapshot.py)
+    if not os.path.isdir(db_path):
+        print(f"{WARNING}Database directory {db_path} doesn't exist{RESET}")
+        sys.exit(1)
+    client = chromadb.PersistentClient(path=db_path)
+    try:
+        # A sharded collection is exported as one; shard the imported database again if needed
+        collection = open_collection(client, db_path, collection_name, create=False)
+    except Exception as e:
+        print(f"{WARNING}Could not open collection {collection_name} in {db_path}: {e}{RESET}")
+        sys.exit(1)
+    output = output or f"{collection_name}{SNAPSHOT_SUFFIX}"
+    print(f"{INFO}Exporting {collection.count()} chunks from {db_path}/{collection_name}...{RESET}")
+    export_snapshot(collection, output)
+
+
+def import_collection(snapshot_path: str, db_path: str, collection_name: str = None):
+    #Provisions a database from a snapshot: chunks are loaded with their stored embeddings, nothing is re-embedded
+    if not os.path.isfile(snapshot_path):
+        print(f"{WARNING}Snapshot {snapshot_path} not found{RESET}")
+        sys.exit(1)
+    if ShardMap.load(db_path) is not None:
+        print(f"{WARNING}{db_path} is sharded, import into a new database and shard that one{RESET}")
+        sys.exit(1)
+    print(f"{INFO}Importing {snapshot_path} into {db_path}...{RESET}")
+    try:
+        import_snapshot(snapshot_path, db_path, collection_name)
+    except ValueError as e:
+        print(f"{WARNING}{e}{RESET}")
+        sys.exit(1)
+
+
+def parse_domain_shard(value: str):
+    #"nvd.nist.gov=nvd" -> ("nvd.nist.gov", "nvd")
+    domain, _, shard = value.partition("=")
+    if not domain or not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9_-]*", shard):
+        raise argparse.ArgumentTypeError(f"expected DOMAIN=SHARD with a shard name of letters, digits, - and _, got {value}")
+    return domain.strip().lower(), shard
+
+
+def shard_collection(db_path: str, collection_name: str, web_shards: int = DEFAULT_WEB_SHARDS, domains=None,
+                     off: bool = False):
+    #Splits a collection into shards by source (see shards.py) or changes its shard map; off = back to one collection.
+    #Chunks that change collection are moved with their embeddings. Don't run add_data.py or retrieval.py meanwhile
+    if not os.path.isdir(db_path):
+        print(f"{WARNING}Database directory {db_path} doesn't exist{RESET}")
+        sys.exit(1)
+    shard_map = None if off else ShardMap(collection_name, web_shards, dict(domains or []))
+    client = chromadb.PersistentClient(path=db_path)
+    try:
+        reshard(client, db_path, collection_name, shard_map)
+    except ValueError as e:
+        print(f"{WARNING}{e}{RESET}")
+        sys.exit(1)
+    if shard_map is None:
+        print(f"{SUCCESS}{db_path} keeps {collection_name} in one collection again{RESET}")
+        return
+    print(f"{SUCCESS}{collection_name} is sharded into:{RESET}")
+    for name in shard_map.collection_names():
+        print(f"  {name}: {client.get_collection(name=name).count()} chunks")
+    print(f"{INFO}Local files go to {shard_map.collection_name(FILE_SHARD)}, web pages by domain{RESET}")
+
+
 if __name__ == "__main__":
-    create_chroma_db()
+    parser = argparse.ArgumentParser(description="Create the ChromaDB database, or export/import collection snapshots")
+    commands = parser.add_subparsers(dest="command", metavar="command",
+                                     help="run without a command to create a database interactively")
+    export_parser = commands.add_parser("export", help="write a collection's chunks and embeddings to a snapshot file")
+    export_parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    export_parser.add_argument("--collection", default=DEFAULT_COLLECTION_NAME)
+    export_parser.add_argument("-o", "--output", help=f"snapshot file (default: <collection>{SNAPSHOT_SUFFIX})")
+    import_parser = commands.add_parser("import", help="load a snapshot into a new database without re-embedding")
+    import_parser.add_argument("snapshot")
+    import_parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    import_parser.add_argument("--collection", help="collection name (default: the exported collection's name)")
+    shards_parser = commands.add_parser("shards", help="split a collection into shards by source type and domain")
+    shards_parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    shards_parser.add_argument("--collection", default=DEFAULT_COLLECTION_NAME)
+    shards_parser.add_argument("--web-shards", type=int, default=DEFAULT_WEB_SHARDS,
+                               help="shards for web pages of domains without their own shard")
+    shards_parser.add_argument("--domain", action="append", type=parse_domain_shard, default=[], metavar="DOMAIN=SHARD",
+                               help="own shard for a domain and its subdomains, e.g. nvd.nist.gov=nvd (repeatable)")
+    shards_parser.add_argument("--off", action="store_true", help="move everything back into one collection")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_collection(args.db, args.collection, args.output)
+    elif args.command == "import":
+        import_collection(args.snapshot, args.db, args.collection)
+    elif args.command == "shards":
+        shard_collection(args.db, args.collection, args.web_shards, args.domain, args.off)
+    else:
+        create_chroma_db()
     print(f"\n{INFO}Program finished{RESET}")
@@ -0,0 +1,319 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from functools import lru_cache
+import numpy as np
+from colorama import Fore, Style
+from metrics import metrics
+
+# Color Definitions for colorama
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Dedup Configuration ---
+DEDUP_FILE = "dedup_index.sqlite3"  # Stored inside the database directory, so a rebuilt database starts empty
+DEFAULT_THRESHOLD = 0.8     # Estimated Jaccard similarity (of word 3-grams) above which two chunks are near-duplicates
+NUM_PERM = 64               # MinHash signature length
+BANDS = 16                  # LSH bands of NUM_PERM // BANDS rows: chunks this similar become candidates almost surely
+SOURCE_KEYS = ("source_file", "source_url")
+
+_WORD = re.compile(r"\w+")
+_SEEDS = np.frombuffer(hashlib.shake_256(b"cyber-rag minhash").digest(8 * NUM_PERM), dtype=np.uint64)
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_hash(word):
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _mix(x):
+    #splitmix64 finalizer, applied to whole arrays
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _rotate(x, bits):
+    return (x << np.uint64(bits)) | (x >> np.uint64(64 - bits))
+
+
+def minhash(text: str):
+    #MinHash signature (NUM_PERM uint32 values) of the chunk's word 3-gram shingles
+    words = _WORD.findall(text.lower()) or [""]
+    h = np.fromiter(map(_word_hash, words), dtype=np.uint64, count=len(words))
+    if len(h) >= 3:
+        shingles = h[:-2] ^ _rotate(h[1:-1], 21) ^ _rotate(h[2:], 42)
+    else:
+        shingles = np.bitwise_xor.reduce(h, keepdims=True)
+    # One hash function per signature position: mix the shingle hash with a per-position seed
+    hashed = _mix(shingles[:, None] ^ _SEEDS[None, :])
+    return (hashed.min(axis=0) >> np.uint64(32)).astype(np.uint32)
+
+
+def _band_keys(signature):
+    rows = NUM_PERM // BANDS
+    return [int.from_bytes(hashlib.blake2b(bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes(),
+                                           digest_size=8).digest(), "big", signed=True)
+            for band in range(BANDS)]
+
+
+def similarity(signature, other):
+    #Estimated Jaccard similarity of two signatures
+    return float(np.count_nonzero(signature == other)) / NUM_PERM
+
+
+def _signature(blob):
+    return np.frombuffer(blob, dtype=np.uint32)
+
+
+def _source_of(metadata):
+    for key in SOURCE_KEYS:
+        if metadata and metadata.get(key):
+            return metadata[key]
+    return None
+
+
+class ChunkDeduplicator:
+    #Stands in for the collection (usually in front of a WriteBuffer) and drops chunks that are near-duplicates
+    #of a chunk already stored for another source, so they're never embedded or stored twice.
+    #Dropped chunks are kept in a persistent index linked to the stored copy: reads by source still return them,
+    #so delta syncs treat them as present, and if the stored copy is deleted one of its duplicates takes its place.
+    #Index changes are committed by flush(), after the collection's pending writes.
+
+    def __init__(self, collection, db_path, threshold=DEFAULT_THRESHOLD):
+        self.collection = collection
+        self.threshold = threshold
+        self.skipped = 0
+        self.promoted = 0
+
+        os.makedirs(db_path, exist_ok=True)
+        self.path = os.path.join(db_path, DEDUP_FILE)
+        # Crawler pages are handled on a worker thread, menu operations on the main thread
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            # Signatures of stored chunks, and their LSH band keys for candidate lookup
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS signatures ("
+                "id INTEGER PRIMARY KEY, chunk_id TEXT UNIQUE NOT NULL, source TEXT NOT NULL, signature BLOB NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS bands ("
+                "band_key INTEGER NOT NULL, signature_id INTEGER NOT NULL, PRIMARY KEY (band_key, signature_id)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS duplicates ("
+                "chunk_id TEXT PRIMARY KEY, source TEXT NOT NULL, canonical_id TEXT NOT NULL, "
+                "signature BLOB NOT NULL, document TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS duplicates_source ON duplicates (source)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS duplicates_canonical ON duplicates (canonical_id)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def __getattr__(self, name):
+        # Anything not deduplicated goes straight to the collection
+        return getattr(self.collection, name)
+
+    def index_existing(self, batch_size=1000):
+        #One-time signing of chunks stored before the index existed. Returns the number indexed
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM signatures LIMIT 1").fetchone() or not self.collection.count():
+                return 0
+            indexed = offset = 0
+            while True:
+                page = self.collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+                if not page["ids"]:
+                    break
+                for chunk_id, doc, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                    source = _source_of(metadata)
+                    if source and doc:
+                        self._index(chunk_id, source, minhash(doc))
+                        indexed += 1
+                offset += len(page["ids"])
+            self._conn.commit()
+        return indexed
+
+    def add(self, documents, ids, metadatas=None, **kwargs):
+        if metadatas is None:
+            metadatas = [None] * len(ids)
+        keep_docs, keep_ids, keep_metas = [], [], []
+        with self._lock, metrics.stage("dedup", sum(map(len, documents)), len(ids)):
+            for doc, chunk_id, metadata in zip(documents, ids, metadatas):
+                source = _source_of(metadata)
+                signature = minhash(doc)
+                canonical_id = self._find_near_duplicate(signature, source) if source else None
+                if canonical_id is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO duplicates (chunk_id, source, canonical_id, signature, document, metadata) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (chunk_id, source, canonical_id, signature.tobytes(), doc, json.dumps(metadata)),
+                    )
+                    self.skipped += 1
+                    continue
+                if source:
+                    self._index(chunk_id, source, signature)
+                keep_docs.append(doc)
+                keep_ids.append(chunk_id)
+                keep_metas.append(metadata)
+        if keep_ids:
+            self.collection.add(documents=keep_docs, ids=keep_ids, metadatas=keep_metas, **kwargs)
+
+    def _find_near_duplicate(self, signature, source):
+        #ID of the most similar stored chunk from another source at or above the threshold, or None
+        band_keys = _band_keys(signature)
+        rows = self._conn.execute(
+            "SELECT DISTINCT s.chunk_id, s.source, s.signature FROM bands b JOIN signatures s ON s.id = b.signature_id "
+            f"WHERE b.band_key IN ({','.join('?' * len(band_keys))})",
+            band_keys,
+        )
+        best_id, best = None, self.threshold
+        for chunk_id, candidate_source, candidate in rows:
+            if candidate_source == source:
+                continue
+            score = similarity(signature, _signature(candidate))
+            if score >= best:
+                best_id, best = chunk_id, score
+        return best_id
+
+    def _index(self, chunk_id, source, signature):
+        self._unindex([chunk_id])
+        signature_id = self._conn.execute(
+            "INSERT INTO signatures (chunk_id, source, signature) VALUES (?, ?, ?)", (chunk_id, source, signature.tobytes())
+        ).lastrowid
+        self._conn.executemany("INSERT OR IGNORE INTO bands (band_key, signature_id) VALUES (?, ?)",
+                               [(band_key, signature_id) for band_key in _band_keys(signature)])
+
+    def _unindex(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            row = self._conn.execute("SELECT id, signature FROM signatures WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if row is None:
+                continue
+            signature_id, signature = row
+            self._conn.executemany("DELETE FROM bands WHERE band_key = ? AND signature_id = ?",
+                                   [(band_key, signature_id) for band_key in _band_keys(_signature(signature))])
+            self._conn.execute("DELETE FROM signatures WHERE id = ?", (signature_id,))
+
+    def get(self, ids=None, where=None, **kwargs):
+        result = self.collection.get(ids=ids, where=where, **kwargs)
+        source = self._source_filter_value(where)
+        if source is None or kwargs.get("where_document") or kwargs.get("offset"):
+            return result
+        # Dropped duplicates of this source count as present, so delta syncs don't try to add them again
+        limit = kwargs.get("limit")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id, document, metadata FROM duplicates WHERE source = ?", (source,)
+            ).fetchall()
+        if not rows:
+            return result
+        result = dict(result)
+        for chunk_id, document, metadata in rows:
+            if limit is not None and len(result["ids"]) >= limit:
+                break
+            if ids is not None and chunk_id not in ids:
+                continue
+            result["ids"] = list(result["ids"]) + [chunk_id]
+            if result.get("metadatas") is not None:
+                result["metadatas"] = list(result["metadatas"]) + [json.loads(metadata)]
+            if result.get("documents") is not None:
+                result["documents"] = list(result["documents"]) + [document]
+        return result
+
+    def update(self, ids, metadatas=None, **kwargs):
+        ids = [ids] if isinstance(ids, str) else list(ids)
+        with self._lock:
+            duplicate_ids = self._duplicate_ids(ids)
+            if duplicate_ids and metadatas is not None:
+                self._conn.executemany(
+                    "UPDATE duplicates SET metadata = ? WHERE chunk_id = ?",
+                    [(json.dumps(metadata), chunk_id) for chunk_id, metadata in zip(ids, metadatas) if chunk_id in duplicate_ids],
+                )
+        stored = [(chunk_id, i) for i, chunk_id in enumerate(ids) if chunk_id not in duplicate_ids]
+        if stored:
+            stored_metadatas = [metadatas[i] for _, i in stored] if metadatas is not None else None
+            self.collection.update(ids=[chunk_id for chunk_id, _ in stored], metadatas=stored_metadatas, **kwargs)
+
+    def delete(self, ids=None, where=None, **kwargs):
+        with self._lock:
+            source = self._source_filter_value(where)
+            if ids is not None:
+                ids = [ids] if isinstance(ids, str) else list(ids)
+                duplicate_ids = self._duplicate_ids(ids)
+                self._conn.executemany("DELETE FROM duplicates WHERE chunk_id = ?", [(chunk_id,) for chunk_id in duplicate_ids])
+                stored_ids = [chunk_id for chunk_id in ids if chunk_id not in duplicate_ids]
+            else:
+                if source is not None:
+                    self._conn.execute("DELETE FROM duplicates WHERE source = ?", (source,))
+                stored_ids = self.collection.get(where=where, include=[], **kwargs)["ids"]
+            if not stored_ids:
+                return None
+            result = self.collection.delete(ids=stored_ids)
+            self._unindex(stored_ids)
+            self._promote(stored_ids)
+        return result
+
+    def _promote(self, deleted_ids):
+        #The first remaining duplicate of each deleted chunk is stored in its place, the others are relinked to it
+        for canonical_id in deleted_ids:
+            rows = self._conn.execute(
+                "SELECT chunk_id, source, signature, document, metadata FROM duplicates WHERE canonical_id = ? ORDER BY rowid",
+                (canonical_id,),
+            ).fetchall()
+            if not rows:
+                continue
+            chunk_id, source, signature, document, metadata = rows[0]
+            self._conn.execute("DELETE FROM duplicates WHERE chunk_id = ?", (chunk_id,))
+            self._conn.execute("UPDATE duplicates SET canonical_id = ? WHERE canonical_id = ?", (chunk_id, canonical_id))
+            self._index(chunk_id, source, _signature(signature))
+            self.collection.add(documents=[document], ids=[chunk_id], metadatas=[json.loads(metadata)])
+            self.promoted += 1
+
+    def _duplicate_ids(self, ids):
+        found = set()
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(row[0] for row in self._conn.execute(
+                f"SELECT chunk_id FROM duplicates WHERE chunk_id IN ({placeholders})", batch))
+        return found
+
+    @staticmethod
+    def _source_filter_value(where):
+        #The source path/URL when where selects exactly one source, e.g. {"source_url": url}
+        if where and len(where) == 1:
+            (key, value), = where.items()
+            if key in SOURCE_KEYS and isinstance(value, str):
+                return value
+        return None
+
+    def duplicate_sources(self, chunk_id):
+        #Other sources whose copy of this chunk was dropped as a near-duplicate
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT source FROM duplicates WHERE canonical_id = ?", (chunk_id,))]
+
+    def flush(self):
+        #Writes the collection's pending chunks first, then commits the index that refers to them
+        with self._lock:
+            flush = getattr(self.collection, "flush", None)
+            written = flush() if flush is not None else 0
+            self._conn.commit()
+        return written
+
+    def report(self):
+        print(f"{INFO}Dedup: {SUCCESS}{self.skipped}{INFO} near-duplicate chunks skipped (not embedded), "
+              f"{self.promoted} promoted after their stored copy was removed{RESET}")
+
+    def close(self):
+        self._conn.close()
@@ -1,9 +1,24 @@
 import sys
+import argparse
 import subprocess
 import importlib.util
 
-def bootstrap_dependencies():
+# --- Version Check Configuration ---
+PYPI_JSON_URL = "https://pypi.org/pypi"     # PyPI JSON API, or a mirror/stand-in index that serves <url>/<package>/json
+LOOKUP_TIMEOUT = 5              # Seconds per PyPI request
+LOOKUP_WORKERS = 8              # PyPI requests at once, over one pooled session
+VERSION_CACHE_FILE = "dep_check_cache.json"     # Latest versions seen on PyPI, reused until they are older than...
+VERSION_CACHE_TTL = 6 * 60 * 60                 # ...six hours (seconds; 0 = always ask PyPI)
+
+# --check exit codes
+EXIT_OK = 0             # Everything installed and up-to-date
+EXIT_OUTDATED = 1       # Something is missing or outdated
+EXIT_LOOKUP_FAILED = 2  # Everything is installed, but the latest version of some libraries couldn't be fetched
+
+
+def bootstrap_dependencies(check_only=False):
     #Checks for core dependencies. The script must be re-run after installation.
+    #check_only never installs: missing core dependencies end the script with EXIT_OUTDATED
 
     core_libs = {
         "requests": "requests",
@@ -21,6 +36,9 @@ def bootstrap_dependencies():
 
     if missing_libs:
         print(f"\n[ ! ] The following core dependencies are missing: {', '.join(missing_libs)}")
+        if check_only:
+            print(f"Install them with: pip install {' '.join(missing_libs)}")
+            sys.exit(EXIT_OUTDATED)
         print("Attempting to install them via pip...")
 
         try:
@@ -30,70 +48,144 @@ def bootstrap_dependencies():
         except (subprocess.CalledProcessError, FileNotFoundError) as e:
             print(f"\n ❌ EROR: Failed to install core dependencies: {e}")
             print(f"Please install them manually by running: pip install {' '.join(missing_libs)}")
+            sys.exit(EXIT_OUTDATED)
         
         sys.exit()
     else:
         print(f"All core dependencies are present")
 
 
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Checks that the project's dependencies are installed and up-to-date")
+    parser.add_argument("--check", action="store_true",
+                        help=f"only report, don't ask or install anything; exit code {EXIT_OK} = up-to-date, "
+                             f"{EXIT_OUTDATED} = missing/outdated, {EXIT_LOOKUP_FAILED} = latest versions unknown")
+    parser.add_argument("--index-url", default=PYPI_JSON_URL,
+                        help="PyPI JSON API to look versions up in (pip itself uses its own index configuration)")
+    parser.add_argument("--cache-file", default=VERSION_CACHE_FILE)
+    parser.add_argument("--cache-ttl", type=int, default=VERSION_CACHE_TTL, help="seconds (0 = always ask the index)")
+    return parser.parse_args()
+
+
 # SCRIPT EXECUTION STARTS HERE
-# 1. Run the bootstrap check immediately. If it finds missing libraries it will install them and exit
-bootstrap_dependencies()
+# 1. Arguments first (argparse is in the standard library), so --check knows not to install anything
+ARGS = parse_arguments() if __name__ == "__main__" else None
 
-# 2. If the script continues past this, core dependencies are installed and will be imported
+# 2. Run the bootstrap check immediately. If it finds missing libraries it will install them and exit
+bootstrap_dependencies(check_only=ARGS is not None and ARGS.check)
+
+# 3. If the script continues past this, core dependencies are installed and will be imported
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import requests.adapters
 from packaging.version import parse as parse_version
 import importlib.metadata
 import colorama
 from colorama import Fore, Style
 
 
-# 3. Initialize Colorama and define colors
+# 4. Initialize Colorama and define colors
 colorama.init(autoreset=True)
 HEADING = Fore.YELLOW
 SUCCESS = Fore.GREEN
 WARNING = Fore.RED
 INFO = Fore.CYAN
 
-# Dependency List installed/updated via pip
+# Dependency List installed/updated via pip (keep in step with req.txt)
 REQUIRED_LIBS = [
-    "chromadb", "requests", "beautifulsoup4", "PyMuPDF", "langchain",
-    "colorama", "packaging"
+    "chromadb", "requests", "beautifulsoup4", "PyMuPDF",
+    "colorama", "packaging", "aiohttp", "numpy"
 ]
-
-
-def get_latest_version(package_name):
+# Only used by some features: checked for updates when installed, never reported as missing
+OPTIONAL_LIBS = {
+    "lxml": "fast HTML parsing with add_data --html-parser lxml",
+    "tiktoken": "token-sized chunks (CHUNK_TOKEN_ENCODING)",
+    "sentence-transformers": "add_data/retrieval --embed-backend sentence-transformers",
+    "langchain": "bench_chunker.py comparison only",
+}
+
+def new_session(workers=LOOKUP_WORKERS):
+    # One session for all lookups, so connections to PyPI are reused instead of a new TLS handshake per package
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_latest_version(package_name, session=None, index_url=PYPI_JSON_URL):
     # Fetches the latest version from PyPI, returns the version string or None if not found or an error occurs.
     try:
-        url = f"https://pypi.org/pypi/{package_name}/json"
-        response = requests.get(url, timeout=5)
+        url = f"{index_url.rstrip('/')}/{package_name}/json"
+        response = (session or requests).get(url, timeout=LOOKUP_TIMEOUT)
         response.raise_for_status()  # Raises an HTTPError for bad responses
         data = response.json()
         return data['info']['version']
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
         print(f"{WARNING}Could not fetch version for {package_name} {e}")
         return None
 
 
-def update_libraries(libs_to_update):
-    # Use pip to install or upgrade a list of libraries.
-    if not libs_to_update:
-        print(f"{INFO}No libraries selected for update")
-        return
+def load_version_cache(cache_file=VERSION_CACHE_FILE):
+    # {"<index url>|<package>": {"version": ..., "checked": unix time}}, empty if there is no usable cache file
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
 
-    print(f"\n{INFO}Attempting to update libraries via pip...")
+def save_version_cache(cache, cache_file=VERSION_CACHE_FILE):
+    # Written to a temporary file first, so an interrupted run never leaves a broken cache behind
     try:
-        # Calling pip via subprocess with the --upgrade flag
-        for lib in libs_to_update:
-            print(f"{INFO}Updating {lib}...")
-            # Use --upgrade to ensure the package is updated to the latest version
-            subprocess.check_call(
-                [sys.executable, "-m", "pip", "install", "--upgrade", lib]
-            )
+        with open(f"{cache_file}.tmp", "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+        os.replace(f"{cache_file}.tmp", cache_file)
+    except OSError as e:
+        print(f"{WARNING}Could not save the version cache {cache_file}: {e}")
+
+
+def get_latest_versions(packages, index_url=PYPI_JSON_URL, cache_file=VERSION_CACHE_FILE, ttl=VERSION_CACHE_TTL,
+                        workers=LOOKUP_WORKERS):
+    # Latest version of every package as {package: version or None}. Versions checked less than ttl seconds ago
+    # come from the cache file, the others are fetched from PyPI concurrently. Failed lookups are not cached
+    cache = load_version_cache(cache_file) if cache_file else {}
+    now = time.time()
+    latest = {}
+    to_fetch = []
+    for package in packages:
+        entry = cache.get(f"{index_url}|{package.lower()}")
+        if entry and now - entry.get("checked", 0) < ttl:
+            latest[package] = entry["version"]
+        else:
+            to_fetch.append(package)
+
+    if to_fetch:
+        with new_session(workers) as session, ThreadPoolExecutor(max(1, min(workers, len(to_fetch)))) as pool:
+            fetched = pool.map(lambda package: get_latest_version(package, session, index_url), to_fetch)
+            for package, version in zip(to_fetch, fetched):
+                latest[package] = version
+                if version:
+                    cache[f"{index_url}|{package.lower()}"] = {"version": version, "checked": now}
+        if cache_file:
+            save_version_cache(cache, cache_file)
+    return latest
+
+
+def pip_install(packages, upgrade=False):
+    # Installs/upgrades all packages with a single pip run, so dependencies are resolved once for all of them.
+    # Returns True on success
+    command = [sys.executable, "-m", "pip", "install", *(["--upgrade"] if upgrade else []), *packages]
+    try:
+        subprocess.check_call(command)
         return True
     except subprocess.CalledProcessError as e:
-        print(f"\n{WARNING}An error occurred during updates: {e}")
-        print("Please try updating the libraries manually")
+        print(f"\n{WARNING}An error occurred while running pip: {e}")
+        print(f"Please try running it manually: pip install {'--upgrade ' if upgrade else ''}{' '.join(packages)}")
         return False
     except FileNotFoundError:
         print(f"\n{WARNING}EROR: 'pip' command not found")
@@ -101,83 +193,90 @@ def update_libraries(libs_to_update):
         return False
 
 
-def install_missing_libraries(libs_to_install):
-    # Use pip to install a list of missing libraries.
-    if not libs_to_install:
-        print("No missing libraries to install")
-        return
-
-    print(f"\n{INFO}Attempting to install missing libraries via pip...")
-    try:
-        for lib in libs_to_install:
-            print(f"Installing {lib}...")
-            subprocess.check_call(
-                [sys.executable, "-m", "pip", "install", lib]
-            )
-        print(f"\n{SUCCESS}Installation of missing libraries successful\n")
-    except subprocess.CalledProcessError as e:
-        print(f"\n{WARNING}An error occurred during installation: {e}")
-        print("Please try installing the libraries manually")
-    except FileNotFoundError:
-        print(f"\n{WARNING}Error: 'pip' command not found")
-        print("Please ensure pip is installed and in your system's PATH.")
-
-
-def main():
-    # Checks for dependencies, identifies missing or outdated packages, prompts user for installation or updates
+def check_libraries(index_url=PYPI_JSON_URL, cache_file=VERSION_CACHE_FILE, ttl=VERSION_CACHE_TTL):
+    # Sorts REQUIRED_LIBS and the installed OPTIONAL_LIBS into (missing, outdated, uptodate, unchecked, optional
+    # libraries that aren't installed). unchecked = installed, latest version unknown
     missing_libs = []
     outdated_libs = []
     uptodate_libs = []
+    unchecked_libs = []
+    absent_optional_libs = []
+    installed = {}
 
-    print("\nChecking Project Dependencies...")
-
-    for lib in REQUIRED_LIBS:
+    for lib in REQUIRED_LIBS + list(OPTIONAL_LIBS):
         try:
-            installed_version = importlib.metadata.version(lib)
-            latest_version = get_latest_version(lib)
-
-            if latest_version and parse_version(installed_version) < parse_version(latest_version):
-                outdated_libs.append({
-                    "name": lib,
-                    "installed": installed_version,
-                    "latest": latest_version
-                })
-            else:
-                uptodate_libs.append({"name": lib, "version": installed_version})
+            installed[lib] = importlib.metadata.version(lib)
         except importlib.metadata.PackageNotFoundError:
-            missing_libs.append(lib)
+            (absent_optional_libs if lib in OPTIONAL_LIBS else missing_libs).append(lib)
+
+    latest = get_latest_versions(list(installed), index_url, cache_file, ttl)
+    for lib, installed_version in installed.items():
+        latest_version = latest.get(lib)
+        if latest_version and parse_version(installed_version) < parse_version(latest_version):
+            outdated_libs.append({
+                "name": lib,
+                "installed": installed_version,
+                "latest": latest_version
+            })
+        else:
+            uptodate_libs.append({"name": lib, "version": installed_version})
+            if not latest_version:
+                unchecked_libs.append(lib)
+    return missing_libs, outdated_libs, uptodate_libs, unchecked_libs, absent_optional_libs
+
+
+def main(index_url=PYPI_JSON_URL, cache_file=VERSION_CACHE_FILE, ttl=VERSION_CACHE_TTL, check_only=False):
+    # Checks for dependencies, identifies missing or outdated packages, prompts user for installation or updates.
+    # check_only reports without asking or installing anything and returns an exit code (EXIT_*)
+    print("\nChecking Project Dependencies...")
+    missing_libs, outdated_libs, uptodate_libs, unchecked_libs, absent_optional_libs = check_libraries(
+        index_url, cache_file, ttl)
 
     # --- Report Status ---
     if uptodate_libs:
         print(f"\n ✔ {HEADING} The following libraries are installed and up-to-date:")
         for lib in uptodate_libs:
-            print(f"  - {lib['name']} (v{lib['version']})")
+            unknown = " (latest version unknown)" if lib['name'] in unchecked_libs else ""
+            print(f"  - {lib['name']} (v{lib['version']}){unknown}")
 
-    if not missing_libs and not outdated_libs:
-        print("\nAll required libraries are installed and up-to-date")
-        return
+    if absent_optional_libs:
+        print(f"\n{INFO} Optional libraries that aren't installed:")
+        for lib in absent_optional_libs:
+            print(f"  - {lib} ({OPTIONAL_LIBS[lib]})")
 
     if missing_libs:
         print(f"\n{HEADING} ❌ The following required libraries are missing:")
         for lib in missing_libs:
             print(f"  - {lib}")
-        try:
-            prompt = input("\nDo you want to install them? (yes/no): ").lower().strip()
-            if prompt in ['yes', 'y']:
-                install_missing_libraries(missing_libs)
-            else:
-                print(f"\n{WARNING}Skipping installation of missing libraries. The program may not run correctly\n")
-        except KeyboardInterrupt:
-            print("\n\nExiting Installation")
-            return
 
     if outdated_libs:
         print(f"\n{HEADING} The following libraries are installed but outdated:")
         for lib in outdated_libs:
             print(f"  - {lib['name']} (Installed: v{lib['installed']}, Latest: v{lib['latest']})")
 
-        # --- Prompt for Update ---
-        try:
+    if not missing_libs and not outdated_libs:
+        if unchecked_libs:
+            print(f"\nAll required libraries are installed, but the latest version of {', '.join(unchecked_libs)} couldn't be checked")
+            return EXIT_LOOKUP_FAILED
+        print("\nAll required libraries are installed and up-to-date")
+        return EXIT_OK
+
+    if check_only:
+        return EXIT_OUTDATED
+
+    # Everything chosen below is installed/updated with one pip run at the end
+    to_install = []
+    to_update = []
+    try:
+        if missing_libs:
+            prompt = input("\nDo you want to install the missing libraries? (yes/no): ").lower().strip()
+            if prompt in ['yes', 'y']:
+                to_install = list(missing_libs)
+            else:
+                print(f"\n{WARNING}Skipping installation of missing libraries. The program may not run correctly\n")
+
+        if outdated_libs:
+            # --- Prompt for Update ---
             print(f"\n{HEADING}How would you like to proceed with updates?")
             print(" [ 1 ] Update all outdated libraries")
             print(" [ 2 ] Choose which libraries to update")
@@ -185,29 +284,32 @@ def main():
             choice = input(f"{INFO}Enter your choice (1/2/3): ").strip()
 
             if choice == '1':
-                libs_to_update_all = [lib['name'] for lib in outdated_libs]
-                if update_libraries(libs_to_update_all):
-                    print(f"\n{SUCCESS}All needed libraries have been updated to the current available version")
-                print("Exiting.")
-
+                to_update = [lib['name'] for lib in outdated_libs]
             elif choice == '2':
                 for lib in outdated_libs:
                     prompt = input(f"  Update {INFO}{lib['name']} from v{lib['installed']} to v{lib['latest']}? (yes/no): ").lower().strip()
                     if prompt in ['yes', 'y']:
-                        if update_libraries([lib['name']]):
-                             print(f"  > '{lib['name']}' updated.")
-                print("\nAll installs and updates are complete")
-                print("Exiting\n")
-
+                        to_update.append(lib['name'])
             elif choice == '3':
-                print("\nExiting without updating\n")
+                print("\nNot updating any libraries")
             else:
-                print("\nInvalid choice. Exiting without updating\n")
+                print("\nInvalid choice. Not updating any libraries")
+    except KeyboardInterrupt:
+        print("\n\nExiting Installation\n")
+        return EXIT_OUTDATED
+
+    if not to_install and not to_update:
+        print("\nExiting without installing or updating\n")
+        return EXIT_OUTDATED
 
-        except KeyboardInterrupt:
-            print("\nExiting Installation\n")
-            return
+    # Missing libraries are installed at their latest version too, so one "pip install --upgrade" covers both
+    print(f"\n{INFO}Installing/updating {', '.join(to_install + to_update)} via pip...")
+    if pip_install(to_install + to_update, upgrade=True):
+        print(f"\n{SUCCESS}All selected libraries have been installed/updated to the current available version")
+        # Remaining missing/outdated libraries are the ones the user skipped
+        return EXIT_OK if len(to_install) == len(missing_libs) and len(to_update) == len(outdated_libs) else EXIT_OUTDATED
+    return EXIT_OUTDATED
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main(ARGS.index_url, ARGS.cache_file, ARGS.cache_ttl, ARGS.check))
@@ -0,0 +1,129 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from colorama import Fore, Style
+
+# Color Definitions for colorama
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Cache Configuration ---
+DEFAULT_CACHE_PATH = "embed_cache.sqlite3"      # Kept outside SecDB so it survives a database rebuild
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024          # Least recently used vectors are evicted past this size
+LOOKUP_BATCH = 500                              # Keys per SQL lookup (stays under SQLite's variable limit)
+
+
+def cache_key(model_id: str, text: str):
+    #Vectors are only reusable for the exact same text embedded by the same model
+    return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbedder:
+    #Wraps an embedding function with a persistent on-disk cache keyed by (model ID, chunk text).
+    #Call it with a list of texts and it returns their vectors. Only cache misses reach the wrapped function.
+
+    def __init__(self, embedding_function, model_id: str, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.embedding_function = embedding_function
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Writes can come from the crawler's writer thread, the lock keeps them sequential
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, nbytes INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+
+    def __call__(self, texts):
+        with self._lock:
+            return self._embed(list(texts))
+
+    def _embed(self, texts):
+        keys = [cache_key(self.model_id, text) for text in texts]
+        found = self._lookup(set(keys))
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        now = time.time()
+        if missing:
+            vectors = self.embedding_function(list(missing.values()))
+            rows = []
+            for key, vector in zip(missing, vectors):
+                vector = [float(value) for value in vector]
+                found[key] = vector
+                blob = array("f", vector).tobytes()
+                rows.append((key, blob, len(blob), now))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, nbytes, last_used) VALUES (?, ?, ?, ?)", rows
+                )
+            self._total_bytes += sum(row[2] for row in rows)
+
+        hit_keys = [(now, key) for key in set(keys) if key not in missing]
+        if hit_keys:
+            with self._conn:
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", hit_keys)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+        return [found[key] for key in keys]
+
+    def _lookup(self, keys):
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[start:start + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for key, blob in self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch):
+                vector = array("f")
+                vector.frombytes(blob)
+                found[key] = vector.tolist()
+        return found
+
+    def _evict(self):
+        #Drops least recently used vectors until the cache is back under 90% of its size limit
+        target = int(self.max_bytes * 0.9)
+        with self._conn:
+            while self._total_bytes > target:
+                rows = self._conn.execute(
+                    "SELECT key, nbytes FROM embeddings ORDER BY last_used LIMIT ?", (LOOKUP_BATCH,)
+                ).fetchall()
+                if not rows:
+                    self._total_bytes = 0
+                    break
+                evict = []
+                for key, nbytes in rows:
+                    evict.append((key,))
+                    self._total_bytes -= nbytes
+                    if self._total_bytes <= target:
+                        break
+                self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evict)
+                self.evictions += len(evict)
+
+    def report(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        print(f"{INFO}Embedding cache: {SUCCESS}{self.hits}{INFO} hits, {self.misses} misses "
+              f"({hit_rate:.1f}% hit rate), {self.evictions} evicted, {self._total_bytes / 1024 / 1024:.1f} MB on disk{RESET}")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,161 @@
+import os
+import inspect
+
+# --- Embedding Configuration ---
+DEFAULT_BACKEND = "chroma-default"
+DEFAULT_BATCH_SIZE = 64     # Chunks per forward pass
+DEFAULT_THREADS = 0         # Intra-op threads for the model runtime (0 = runtime default, usually all cores)
+MODEL_METADATA_KEY = "embedding_model"  # Collection metadata naming the model its vectors come from
+CHROMA_DEFAULT_MODEL = "all-MiniLM-L6-v2"   # What Chroma's "default" embedding function computes
+
+# The model and its vectors have to stay the same for the life of a collection:
+# Chroma embeds query_texts with the collection's own embedding function (chroma-default unless create_db was changed).
+# record_collection_model() records the model in the collection's metadata, check_collection_model() refuses any other one
+
+# Internals of chromadb's ONNXMiniLM_L6_V2 that the chroma-default backend relies on to tune the batch size and
+# thread count (checked against chromadb 1.5); a chromadb upgrade that changes them fails with a clear error
+CHROMA_ONNX_INTERNALS = ("ort", "_forward", "_download_model_if_not_exists", "_preferred_providers",
+                         "DOWNLOAD_PATH", "EXTRACTED_FOLDER_NAME")
+
+
+def _load_chroma_default(model: str, threads: int):
+    #Chroma's bundled all-MiniLM-L6-v2 ONNX model, same vectors as the collection's implicit embedding
+    #but with a configurable batch size and intra-op thread count
+    if model != "all-MiniLM-L6-v2":
+        raise ValueError(f"The chroma-default backend only provides all-MiniLM-L6-v2, not {model}")
+    import chromadb
+    from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+    class TunedMiniLM(ONNXMiniLM_L6_V2):
+        @property
+        def model(self):
+            if "_session" not in self.__dict__:
+                so = self.ort.SessionOptions()
+                so.log_severity_level = 3
+                so.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                if threads > 0:
+                    so.intra_op_num_threads = threads
+                providers = self._preferred_providers or self.ort.get_available_providers()
+                providers = [p for p in providers if p != "CoreMLExecutionProvider"]
+                self.__dict__["_session"] = self.ort.InferenceSession(
+                    os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model.onnx"),
+                    providers=providers, sess_options=so,
+                )
+            return self.__dict__["_session"]
+
+    onnx_model = TunedMiniLM()
+    missing = [name for name in CHROMA_ONNX_INTERNALS if not hasattr(onnx_model, name)]
+    try:
+        # model is overridden above; _forward has to get the session from it for the settings to apply
+        if not missing and "self.model" not in inspect.getsource(ONNXMiniLM_L6_V2._forward):
+            missing.append("_forward using self.model")
+    except (OSError, TypeError):
+        pass    # No source to look at (e.g. a frozen install)
+    if missing:
+        raise RuntimeError(f"chromadb {chromadb.__version__} changed the ONNX embedding internals the chroma-default "
+                           f"backend relies on ({', '.join(missing)}). Install chromadb 1.5.x or use "
+                           f"--embed-backend sentence-transformers")
+
+    def encode(texts, batch_size):
+        onnx_model._download_model_if_not_exists()
+        return onnx_model._forward(texts, batch_size=batch_size)
+    return encode
+
+
+def _load_sentence_transformers(model: str, threads: int):
+    #Any sentence-transformers model (optional dependency: pip install sentence-transformers)
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError("The sentence-transformers backend needs: pip install sentence-transformers") from e
+    if threads > 0:
+        torch.set_num_threads(threads)
+    st_model = SentenceTransformer(model, device="cpu")
+
+    def encode(texts, batch_size):
+        return st_model.encode(texts, batch_size=batch_size, normalize_embeddings=True, show_progress_bar=False)
+    return encode
+
+
+# Backend name -> (default model, loader). Loaders take (model, threads) and return encode(texts, batch_size)
+EMBEDDING_BACKENDS = {
+    "chroma-default": ("all-MiniLM-L6-v2", _load_chroma_default),
+    "sentence-transformers": ("all-MiniLM-L6-v2", _load_sentence_transformers),
+}
+
+
+class LocalEmbedder:
+    #Computes embeddings locally in large batches so they can be handed to Chroma explicitly.
+    #The model is loaded on first use; model_id identifies the vectors (used as the embedding cache key).
+
+    def __init__(self, backend=DEFAULT_BACKEND, model=None, batch_size=DEFAULT_BATCH_SIZE, threads=DEFAULT_THREADS):
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend {backend}. Choose from: {', '.join(EMBEDDING_BACKENDS)}")
+        default_model, self._loader = EMBEDDING_BACKENDS[backend]
+        self.backend = backend
+        self.model = model or default_model
+        self.batch_size = max(1, batch_size)
+        self.threads = max(0, threads)
+        self._encode = None
+
+    @property
+    def model_id(self):
+        return f"{self.backend}/{self.model}"
+
+    def __call__(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        if self._encode is None:
+            self._encode = self._loader(self.model, self.threads)
+        vectors = self._encode(texts, self.batch_size)
+        return vectors.tolist() if hasattr(vectors, "tolist") else [list(vector) for vector in vectors]
+
+
+def _collections_of(collection):
+    #The Chroma collections behind collection: every shard of a shards.ShardedCollection, else just itself
+    shards = getattr(collection, "shards", None)
+    return list(shards.values()) if isinstance(shards, dict) else [collection]
+
+
+def recorded_model(collection, infer: bool = True):
+    #The model a collection's vectors come from: the one recorded in its metadata, or (infer) Chroma's default model
+    #for a collection that uses Chroma's default embedding function. None when it can't be told
+    collections = _collections_of(collection)
+    for chroma_collection in collections:
+        model = (chroma_collection.metadata or {}).get(MODEL_METADATA_KEY)
+        if model:
+            return model
+    if not infer:
+        return None
+    configuration = getattr(collections[0], "configuration_json", None) or {}
+    function = configuration.get("embedding_function") or {}
+    if function.get("name") == "default":
+        return CHROMA_DEFAULT_MODEL
+    return None
+
+
+def check_collection_model(collection, model: str):
+    #Raises ValueError when the collection's vectors come from another model than model: mixing models fills the
+    #collection with vectors from different spaces and similarity search silently returns nonsense.
+    #Backends don't matter, only the model (chroma-default and sentence-transformers all-MiniLM-L6-v2 agree).
+    # An empty collection without a recorded model can still take any model
+    expected = recorded_model(collection, infer=bool(collection.count()))
+    if expected is not None and expected != model:
+        raise ValueError(f"Collection {collection.name} holds {expected} vectors, not {model}. Use --embed-model "
+                         f"{expected} (or a new collection for {model})")
+    if expected is None and collection.count():
+        raise ValueError(f"Collection {collection.name} doesn't record its embedding model and has no known "
+                         f"embedding function; set metadata {MODEL_METADATA_KEY}={model} if its vectors come from it")
+
+
+def record_collection_model(collection, model: str):
+    #Writes model into the metadata of the collections that don't name it yet (after check_collection_model).
+    #modify() replaces the whole metadata and refuses hnsw:* keys, even unchanged ones; Chroma keeps the index
+    #settings in the collection's configuration, so they are left out
+    for chroma_collection in _collections_of(collection):
+        metadata = {key: value for key, value in (chroma_collection.metadata or {}).items() if not key.startswith("hnsw:")}
+        if metadata.get(MODEL_METADATA_KEY) != model:
+            metadata[MODEL_METADATA_KEY] = model
+            chroma_collection.modify(metadata=metadata)
@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import hashlib
+
+# --- Frontier Configuration ---
+FRONTIER_FILE = "crawl_frontier.sqlite3"    # Stored inside the database directory
+BLOOM_BITS = 1 << 26                        # 8 MB filter, ~0.3% false positives at 5 million URLs
+BLOOM_HASHES = 5
+TAKE_BATCH = 64                             # URLs read from disk per query
+START_PRIORITY = 1e9                        # The start URL is always visited first
+
+
+def url_fingerprint(url: str):
+    #64-bit fingerprint of a URL, stored instead of the URL to keep the visited set small
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+class _BloomFilter:
+    #Fixed-size bit array: "no" is certain, "maybe" is checked against the exact fingerprints on disk
+
+    def __init__(self, bits=BLOOM_BITS, hashes=BLOOM_HASHES, array=None):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray(array) if array is not None and len(array) == bits // 8 else bytearray(bits // 8)
+
+    def add(self, fingerprint):
+        #Sets the fingerprint's bits. Returns True if they were all set already ("maybe seen").
+        # Double hashing on the two halves of the fingerprint, so the filter can be rebuilt from disk
+        fingerprint &= 0xFFFFFFFFFFFFFFFF
+        position, step = fingerprint & 0xFFFFFFFF, (fingerprint >> 32) | 1
+        array, bits = self.array, self.bits
+        was_set = True
+        for _ in range(self.hashes):
+            position %= bits
+            mask = 1 << (position & 7)
+            if not array[position >> 3] & mask:
+                array[position >> 3] |= mask
+                was_set = False
+            position += step
+        return was_set
+
+
+class CrawlFrontier:
+    #Persistent crawl state kept next to the Chroma data: the queue of URLs still to visit and the
+    #fingerprints of every URL already queued. Memory stays flat however many links a site has.
+    #URLs are taken highest priority first, then in discovery order (all priorities 0 = breadth-first).
+    #Changes are only written by commit(), which the crawler runs after the pages it covers are stored,
+    #so a crash or Ctrl+C resumes from the last checkpoint. Pages taken but not finished are visited again.
+
+    def __init__(self, db_path, bloom_bits=BLOOM_BITS):
+        if db_path == ":memory:":
+            self.path = db_path
+        else:
+            os.makedirs(db_path, exist_ok=True)
+            self.path = os.path.join(db_path, FRONTIER_FILE)
+        self.bloom_bits = bloom_bits
+        self._conn = sqlite3.connect(self.path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS crawls ("
+                "id INTEGER PRIMARY KEY, start_url TEXT UNIQUE NOT NULL, scraped INTEGER NOT NULL DEFAULT 0, "
+                "bloom BLOB, bloom_count INTEGER)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS frontier ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, crawl INTEGER NOT NULL, url TEXT NOT NULL, taken INTEGER NOT NULL DEFAULT 0, "
+                "priority REAL NOT NULL DEFAULT 0, depth INTEGER NOT NULL DEFAULT 0)"
+            )
+            # Frontiers saved before crawls were prioritized
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(frontier)")}
+            for column, definition in (("priority", "REAL NOT NULL DEFAULT 0"), ("depth", "INTEGER NOT NULL DEFAULT 0")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE frontier ADD COLUMN {column} {definition}")
+            self._conn.execute("DROP INDEX IF EXISTS frontier_queue")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS frontier_priority ON frontier (crawl, taken, priority DESC, id)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen ("
+                "crawl INTEGER NOT NULL, fingerprint INTEGER NOT NULL, PRIMARY KEY (crawl, fingerprint)) WITHOUT ROWID"
+            )
+        self.crawl_id = None
+        self.scraped = 0
+        self._bloom = None
+        self._taken = {}        # url -> frontier row id, for pages in flight
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def saved_progress(self, start_url: str):
+        #Pages visited and URLs still queued by an unfinished crawl from start_url, or None
+        row = self._conn.execute("SELECT id, scraped FROM crawls WHERE start_url = ?", (start_url,)).fetchone()
+        if row is None:
+            return None
+        queued = self._conn.execute("SELECT COUNT(*) FROM frontier WHERE crawl = ?", (row[0],)).fetchone()[0]
+        return (row[1], queued) if queued else None
+
+    def start(self, start_url: str, resume: bool = False):
+        #Opens the crawl for start_url. Returns the number of pages already visited (0 for a fresh crawl).
+        row = self._conn.execute("SELECT id FROM crawls WHERE start_url = ?", (start_url,)).fetchone()
+        if row is not None and not resume:
+            self._delete_crawl(row[0])
+            row = None
+        self._bloom = _BloomFilter(self.bloom_bits)
+        self._taken.clear()
+        with self._conn:
+            if row is None:
+                self.crawl_id = self._conn.execute("INSERT INTO crawls (start_url) VALUES (?)", (start_url,)).lastrowid
+                self.scraped = 0
+            else:
+                self.crawl_id = row[0]
+                self.scraped, bloom, bloom_count = self._conn.execute(
+                    "SELECT scraped, bloom, bloom_count FROM crawls WHERE id = ?", (self.crawl_id,)).fetchone()
+                self._conn.execute("UPDATE frontier SET taken = 0 WHERE crawl = ? AND taken = 1", (self.crawl_id,))
+                seen_count = self._conn.execute("SELECT COUNT(*) FROM seen WHERE crawl = ?", (self.crawl_id,)).fetchone()[0]
+                if bloom is not None and bloom_count == seen_count:
+                    self._bloom = _BloomFilter(self.bloom_bits, array=bloom)
+                else:
+                    # Saved filter is missing or stale (the crawl was killed), rebuild it from the fingerprints
+                    for (fingerprint,) in self._conn.execute("SELECT fingerprint FROM seen WHERE crawl = ?", (self.crawl_id,)):
+                        self._bloom.add(fingerprint)
+        if row is None:
+            self.push([(start_url, START_PRIORITY, 0)])
+            self.commit()
+        return self.scraped
+
+    def push(self, entries):
+        #Queues the URLs that were never queued before. Entries are URLs or (url, priority, depth) tuples.
+        #Returns how many were new.
+        new = []
+        for entry in entries:
+            url, priority, depth = (entry, 0.0, 0) if isinstance(entry, str) else entry
+            fingerprint = url_fingerprint(url)
+            if self._bloom.add(fingerprint) and self._is_seen(fingerprint):
+                continue
+            new.append((fingerprint, url, priority, depth))
+        if new:
+            self._conn.executemany("INSERT OR IGNORE INTO seen (crawl, fingerprint) VALUES (?, ?)",
+                                   [(self.crawl_id, entry[0]) for entry in new])
+            self._conn.executemany("INSERT INTO frontier (crawl, url, priority, depth) VALUES (?, ?, ?, ?)",
+                                   [(self.crawl_id, url, priority, depth) for _, url, priority, depth in new])
+        return len(new)
+
+    def _is_seen(self, fingerprint):
+        return self._conn.execute("SELECT 1 FROM seen WHERE crawl = ? AND fingerprint = ?",
+                                  (self.crawl_id, fingerprint)).fetchone() is not None
+
+    def take(self, limit: int = TAKE_BATCH):
+        #Next queued (url, depth) pairs, highest priority first, marked as in flight
+        rows = self._conn.execute(
+            "SELECT id, url, depth FROM frontier WHERE crawl = ? AND taken = 0 ORDER BY priority DESC, id LIMIT ?",
+            (self.crawl_id, limit)).fetchall()
+        if rows:
+            self._conn.executemany("UPDATE frontier SET taken = 1 WHERE id = ?", [(row_id,) for row_id, _, _ in rows])
+            self._taken.update((url, row_id) for row_id, url, _ in rows)
+        return [(url, depth) for _, url, depth in rows]
+
+    def skip(self, url: str):
+        #Drops a taken URL that won't be visited (e.g. off-domain)
+        row_id = self._taken.pop(url, None)
+        if row_id is not None:
+            self._conn.execute("DELETE FROM frontier WHERE id = ?", (row_id,))
+
+    def done(self, url: str):
+        self.skip(url)
+        self.scraped += 1
+
+    def has_queued(self):
+        return self._conn.execute("SELECT 1 FROM frontier WHERE crawl = ? AND taken = 0 LIMIT 1",
+                                  (self.crawl_id,)).fetchone() is not None
+
+    def commit(self):
+        self._conn.execute("UPDATE crawls SET scraped = ? WHERE id = ?", (self.scraped, self.crawl_id))
+        self._conn.commit()
+
+    def finish(self):
+        #Commits the crawl, or removes its state if nothing is left to visit. Returns True if it can be resumed.
+        self.commit()
+        if self._conn.execute("SELECT 1 FROM frontier WHERE crawl = ? LIMIT 1", (self.crawl_id,)).fetchone():
+            # Save the filter so resuming doesn't have to rebuild it from every fingerprint
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE crawls SET bloom = ?, bloom_count = (SELECT COUNT(*) FROM seen WHERE crawl = ?) WHERE id = ?",
+                    (bytes(self._bloom.array), self.crawl_id, self.crawl_id))
+            return True
+        self._delete_crawl(self.crawl_id)
+        return False
+
+    def _delete_crawl(self, crawl_id):
+        with self._conn:
+            self._conn.execute("DELETE FROM frontier WHERE crawl = ?", (crawl_id,))
+            self._conn.execute("DELETE FROM seen WHERE crawl = ?", (crawl_id,))
+            self._conn.execute("DELETE FROM crawls WHERE id = ?", (crawl_id,))
+
+    def close(self):
+        self._conn.close()
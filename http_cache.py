@@ -0,0 +1,114 @@
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+from collections import namedtuple
+from colorama import Fore, Style
+
+# Color Definitions for colorama
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- HTTP Cache Configuration ---
+HTTP_CACHE_FILE = "http_cache.sqlite3"      # Stored inside the database directory, so a rebuilt database starts empty
+
+CacheEntry = namedtuple("CacheEntry", ["etag", "last_modified", "body_hash", "links"])
+
+
+def body_hash(content: bytes):
+    return hashlib.sha256(content).hexdigest()
+
+
+class HttpCache:
+    #Validators (ETag, Last-Modified) and a body hash for every page added from the web, plus the links found on it.
+    #Re-fetches send conditional requests; a 304 or an identical body means the page is already in the database,
+    #so it isn't parsed, chunked or embedded again and its saved links are used for crawling.
+    #Like the ingestion manifest, changes are staged and only written by commit(), after the page's chunks are stored.
+
+    def __init__(self, db_path):
+        os.makedirs(db_path, exist_ok=True)
+        self.path = os.path.join(db_path, HTTP_CACHE_FILE)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_hash TEXT NOT NULL, links BLOB NOT NULL)"
+        )
+        self._staged = {}
+        self.not_modified = 0   # 304 responses
+        self.same_body = 0      # 200 responses with a body identical to the stored one
+        self.changed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def get(self, url: str):
+        if url in self._staged:
+            return self._staged[url]
+        row = self._conn.execute(
+            "SELECT etag, last_modified, body_hash, links FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, content_hash, links = row
+        return CacheEntry(etag, last_modified, content_hash, json.loads(zlib.decompress(links)))
+
+    def conditional_headers(self, url: str):
+        #Request headers that let the server answer 304 Not Modified
+        entry = self.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def unchanged_links(self, url: str, status: int, content: bytes, headers=None):
+        #The saved links if the response shows the page hasn't changed since it was added, otherwise None
+        entry = self.get(url)
+        if entry is None:
+            self.changed += 1
+            return None
+        if status == 304:
+            self.not_modified += 1
+        elif body_hash(content) == entry.body_hash:
+            self.same_body += 1
+        else:
+            self.changed += 1
+            return None
+        # Keep the newest validators so the next request can still be answered with a 304
+        if headers is not None:
+            etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+            if (etag or entry.etag, last_modified or entry.last_modified) != (entry.etag, entry.last_modified):
+                self._staged[url] = entry._replace(etag=etag or entry.etag, last_modified=last_modified or entry.last_modified)
+        return entry.links
+
+    def record(self, url: str, headers, content: bytes, links):
+        #Stages a page that was just added to the database
+        self._staged[url] = CacheEntry(headers.get("ETag"), headers.get("Last-Modified"), body_hash(content), list(links))
+
+    def commit(self):
+        if not self._staged:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body_hash, links) VALUES (?, ?, ?, ?, ?)",
+                [(url, entry.etag, entry.last_modified, entry.body_hash, zlib.compress(json.dumps(entry.links).encode("utf-8")))
+                 for url, entry in self._staged.items()],
+            )
+        self._staged.clear()
+
+    def report(self):
+        skipped = self.not_modified + self.same_body
+        if skipped + self.changed:
+            print(f"{INFO}HTTP cache: {SUCCESS}{skipped}{INFO} unchanged pages skipped ({self.not_modified} not modified, "
+                  f"{self.same_body} identical body), {self.changed} new or changed{RESET}")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from colorama import Fore, Style
+
+# Color Definitions for colorama
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Keyword Index Configuration ---
+KEYWORD_FILE = "keyword_index.sqlite3"  # Stored inside the database directory, so a rebuilt database starts empty
+SOURCE_KEYS = ("source_file", "source_url")
+RRF_K = 60                  # Reciprocal rank fusion constant: score = sum of 1 / (RRF_K + rank) over both result lists
+
+_TOKEN = re.compile(r"\w+(?:[-.:/]\w+)*")
+# Queries made only of these are answered by the keyword index alone
+_IDENTIFIER = re.compile(
+    r"(?:cve-\d{4}-\d{4,}|cwe-\d+|capec-\d+|ghsa(?:-[0-9a-z]{4}){3}|ms\d{2}-\d{3}|kb\d{6,}|t\d{4}(?:\.\d{3})?"
+    r"|[0-9a-f]{32}|[0-9a-f]{40}|[0-9a-f]{64})", re.IGNORECASE)
+_SEPARATORS = re.compile(r"[\s,;|]+|\b(?:and|or)\b", re.IGNORECASE)
+
+
+def _source_of(metadata):
+    for key in SOURCE_KEYS:
+        if metadata and metadata.get(key):
+            return metadata[key]
+    return None
+
+
+def match_expression(query: str):
+    #FTS5 query for free text: every word or identifier is an alternative (BM25 ranks chunks matching more,
+    #and rarer, terms first). Identifiers such as CVE-2021-44228 or T1059.001 become phrases, so their parts
+    #have to appear together and in order. Returns None when the query has nothing to search for
+    terms = []
+    for token in _TOKEN.findall(query.lower()):
+        words = re.findall(r"\w+", token)
+        phrase = '"' + " ".join(words) + '"'
+        if phrase not in terms:
+            terms.append(phrase)
+    return " OR ".join(terms) or None
+
+
+def is_identifier_query(query: str):
+    #True for queries like "CVE-2021-44228" or "CWE-79, CWE-89": exact lookups the keyword index answers alone
+    return bool(_IDENTIFIER.search(query)) and not _SEPARATORS.sub("", _IDENTIFIER.sub("", query))
+
+
+def reciprocal_rank_fusion(rankings, limit):
+    #Fuses ranked ID lists. Returns [(chunk ID, score)] best first
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])[:limit]
+
+
+class KeywordIndex:
+    #BM25 keyword index (SQLite FTS5) over the same chunks and chunk IDs as the Chroma collection.
+    #Stands in for the collection (between the near-duplicate filter and the write buffer, so it only holds chunks
+    #that are actually stored): adds are indexed, updates and deletes are mirrored.
+    #Index changes are committed by flush(), after the collection's pending writes, then on_write() is called.
+    #With collection=None it is a read-only search index, e.g. for the retrieval service.
+
+    def __init__(self, collection, db_path, on_write=None):
+        self.collection = collection
+        self.on_write = on_write or (lambda: None)
+        os.makedirs(db_path, exist_ok=True)
+        self.path = os.path.join(db_path, KEYWORD_FILE)
+        # Crawler pages are handled on a worker thread, menu operations on the main thread
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            # WAL: the retrieval service can search while add_data writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id INTEGER PRIMARY KEY, chunk_id TEXT UNIQUE NOT NULL, source TEXT, metadata TEXT, document TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+            # External content FTS table over chunks.document, kept in sync by triggers
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunk_text USING fts5("
+                "document, content='chunks', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS chunks_insert AFTER INSERT ON chunks BEGIN "
+                "INSERT INTO chunk_text (rowid, document) VALUES (new.id, new.document); END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS chunks_delete AFTER DELETE ON chunks BEGIN "
+                "INSERT INTO chunk_text (chunk_text, rowid, document) VALUES ('delete', old.id, old.document); END"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def __getattr__(self, name):
+        # Anything that doesn't change the index goes straight to the collection
+        return getattr(self.collection, name)
+
+    def index_existing(self, batch_size=1000):
+        #One-time indexing of chunks stored before the index existed. Returns the number indexed
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() or not self.collection.count():
+                return 0
+            indexed = offset = 0
+            while True:
+                page = self.collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+                if not page["ids"]:
+                    break
+                self._index(page["ids"], page["documents"], page["metadatas"])
+                indexed += len(page["ids"])
+                offset += len(page["ids"])
+            self._conn.commit()
+        return indexed
+
+    def add(self, documents, ids, metadatas=None, **kwargs):
+        with self._lock:
+            self._index(ids, documents, metadatas or [None] * len(ids))
+        return self.collection.add(documents=documents, ids=ids, metadatas=metadatas, **kwargs)
+
+    def _index(self, ids, documents, metadatas):
+        self._remove(ids)
+        self._conn.executemany(
+            "INSERT INTO chunks (chunk_id, source, metadata, document) VALUES (?, ?, ?, ?)",
+            [(chunk_id, _source_of(metadata), json.dumps(metadata), document or "")
+             for chunk_id, document, metadata in zip(ids, documents, metadatas)],
+        )
+
+    def _remove(self, ids):
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({','.join('?' * len(batch))})", batch)
+
+    def update(self, ids, metadatas=None, **kwargs):
+        ids = [ids] if isinstance(ids, str) else list(ids)
+        with self._lock:
+            if metadatas is not None:
+                self._conn.executemany("UPDATE chunks SET metadata = ?, source = ? WHERE chunk_id = ?",
+                                       [(json.dumps(metadata), _source_of(metadata), chunk_id)
+                                        for chunk_id, metadata in zip(ids, metadatas)])
+            if kwargs.get("documents") is not None:
+                rows = self._conn.execute(
+                    f"SELECT chunk_id, metadata FROM chunks WHERE chunk_id IN ({','.join('?' * len(ids))})", ids
+                ).fetchall()
+                metadata_of = {chunk_id: json.loads(metadata) for chunk_id, metadata in rows}
+                self._index(ids, kwargs["documents"], [metadata_of.get(chunk_id) for chunk_id in ids])
+        return self.collection.update(ids=ids, metadatas=metadatas, **kwargs)
+
+    def delete(self, ids=None, where=None, **kwargs):
+        with self._lock:
+            if ids is None:
+                # Resolve the filter first; Chroma doesn't say what it deleted
+                ids = self.collection.get(where=where, include=[], **kwargs)["ids"]
+                if not ids:
+                    return None
+                where, kwargs = None, {}
+            ids = [ids] if isinstance(ids, str) else list(ids)
+            self._remove(ids)
+            return self.collection.delete(ids=ids, where=where, **kwargs)
+
+    def search(self, query: str, n_results: int = 10, source: str = None):
+        #BM25 top n_results for a free-text query, optionally within one source (file path or URL).
+        #Returns [(chunk ID, document, metadata, score)] best first; higher scores are better
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        sql = ("SELECT c.chunk_id, c.document, c.metadata, -bm25(chunk_text) FROM chunk_text "
+               "JOIN chunks c ON c.id = chunk_text.rowid WHERE chunk_text MATCH ?")
+        parameters = [expression]
+        if source is not None:
+            sql += " AND c.source = ?"
+            parameters.append(source)
+        sql += " ORDER BY rank LIMIT ?"
+        parameters.append(n_results)
+        with self._lock:
+            rows = self._conn.execute(sql, parameters).fetchall()
+        return [(chunk_id, document, json.loads(metadata) if metadata else None, score)
+                for chunk_id, document, metadata, score in rows]
+
+    def indexed_count(self):
+        #Not count(): that still means the collection's count for the wrappers above this one
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def flush(self):
+        #Writes the collection's pending chunks first, then commits the index that refers to them
+        with self._lock:
+            flush = getattr(self.collection, "flush", None)
+            written = flush() if flush is not None else 0
+            self._conn.commit()
+        self.on_write()
+        return written
+
+    def report(self):
+        print(f"{INFO}Keyword index: {SUCCESS}{self.indexed_count()}{INFO} chunks searchable by keyword{RESET}")
+
+    def close(self):
+        self._conn.close()
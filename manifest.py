@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import hashlib
+from collections import namedtuple
+
+# --- Manifest Configuration ---
+MANIFEST_FILE = "ingest_manifest.sqlite3"   # Stored inside the database directory
+HASH_BLOCK_SIZE = 1024 * 1024
+
+ManifestEntry = namedtuple("ManifestEntry", ["size", "mtime", "content_hash"])
+
+
+def hash_file(filepath):
+    #SHA-256 of a file's contents, read in blocks so large files don't have to fit in memory
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    #Local record of every ingested file (path, size, mtime, content hash) kept next to the Chroma data.
+    #The whole table is loaded once, so change detection never has to query the collection.
+    #Changes are staged and only written by commit(), which callers run after their chunks are safely stored.
+
+    def __init__(self, db_path):
+        os.makedirs(db_path, exist_ok=True)
+        self.path = os.path.join(db_path, MANIFEST_FILE)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, content_hash TEXT NOT NULL)"
+        )
+        self.entries = {
+            path: ManifestEntry(size, mtime, content_hash)
+            for path, size, mtime, content_hash in self._conn.execute("SELECT path, size, mtime, content_hash FROM files")
+        }
+        self._staged = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def get(self, path):
+        return self.entries.get(str(path))
+
+    def is_unchanged(self, path, size, mtime):
+        #Fast path: same size and mtime as the last ingest
+        entry = self.get(path)
+        return entry is not None and entry.size == size and entry.mtime == mtime
+
+    def record(self, path, size, mtime, content_hash):
+        entry = ManifestEntry(size, mtime, content_hash)
+        self.entries[str(path)] = entry
+        self._staged[str(path)] = entry
+
+    def remove(self, path):
+        self.entries.pop(str(path), None)
+        self._staged[str(path)] = None
+
+    def commit(self):
+        if not self._staged:
+            return
+        with self._conn:
+            for path, entry in self._staged.items():
+                if entry is None:
+                    self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO files (path, size, mtime, content_hash) VALUES (?, ?, ?, ?)",
+                        (path, entry.size, entry.mtime, entry.content_hash),
+                    )
+        self._staged.clear()
+
+    def close(self):
+        self._conn.close()
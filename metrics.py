@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import threading
+from colorama import Fore, Style
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Metrics Configuration ---
+PROMETHEUS_PREFIX = "cyber_rag_stage"
+FIELDS = ("calls", "seconds", "errors", "bytes", "chunks")
+# Order of the summary table; stages recorded under other names are listed after these
+STAGE_ORDER = ["fetch", "html_parse", "pdf_extract", "text_read", "split", "chroma_read", "dedup", "embed", "chroma_write"]
+
+
+class _Timer:
+    #One timed call of a stage. bytes and chunks can be set inside the with block, e.g. once the result is known
+    __slots__ = ("_metrics", "_name", "_start", "bytes", "chunks")
+
+    def __init__(self, metrics, name, bytes, chunks):
+        self._metrics = metrics
+        self._name = name
+        self.bytes = bytes
+        self.chunks = chunks
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics.record(self._name, time.perf_counter() - self._start, 1, self.bytes, self.chunks,
+                             0 if exc_type is None else 1)
+        return False
+
+
+class Metrics:
+    #Per-stage totals for ingestion: calls, seconds, errors, bytes and chunks. Timing one call costs about a
+    #microsecond and stages are timed per page, file block or batch, never per chunk, so it is always on.
+    #Thread-safe (the crawler fetches on the event loop while the writer thread parses and stores). Worker
+    #processes send a snapshot() back with their results and the parent merge()s it.
+    #Text stages count characters as bytes. Stages that overlap (concurrent fetches) add up to more than wall time.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self.started = time.time()
+
+    def stage(self, name: str, bytes: int = 0, chunks: int = 0):
+        #with metrics.stage("html_parse", bytes=len(content)): ...
+        return _Timer(self, name, bytes, chunks)
+
+    def record(self, name: str, seconds: float, calls: int = 1, bytes: int = 0, chunks: int = 0, errors: int = 0):
+        with self._lock:
+            totals = self._stages.get(name)
+            if totals is None:
+                totals = self._stages[name] = [0, 0.0, 0, 0, 0]
+            totals[0] += calls
+            totals[1] += seconds
+            totals[2] += errors
+            totals[3] += bytes
+            totals[4] += chunks
+
+    def snapshot(self):
+        #{stage: {"calls", "seconds", "errors", "bytes", "chunks"}} in table order
+        with self._lock:
+            stages = dict(self._stages)
+        names = [name for name in STAGE_ORDER if name in stages] + sorted(set(stages) - set(STAGE_ORDER))
+        return {name: dict(zip(FIELDS, stages[name])) for name in names}
+
+    def merge(self, snapshot: dict):
+        for name, totals in snapshot.items():
+            self.record(name, totals["seconds"], totals["calls"], totals["bytes"], totals["chunks"], totals["errors"])
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def report(self):
+        stages = self.snapshot()
+        if not stages:
+            return
+        print(f"\n{HEADING}Ingestion stages{RESET}")
+        print(f"{INFO}{'stage':<14} {'calls':>9} {'seconds':>9} {'ms/call':>9} {'MB':>9} {'MB/s':>8} {'chunks':>9} {'errors':>7}{RESET}")
+        for name, totals in stages.items():
+            seconds, megabytes = totals["seconds"], totals["bytes"] / 1024 / 1024
+            print(f"{name:<14} {totals['calls']:>9} {seconds:>9.2f} {seconds * 1000 / max(1, totals['calls']):>9.2f} "
+                  f"{megabytes:>9.1f} {megabytes / seconds if seconds else 0:>8.1f} {totals['chunks']:>9} {totals['errors']:>7}")
+
+    def to_json(self):
+        return json.dumps({"started": self.started, "written": time.time(), "stages": self.snapshot()}, indent=2)
+
+    def to_prometheus(self):
+        #Prometheus text exposition format, e.g. for node_exporter's textfile collector
+        lines = []
+        stages = self.snapshot()
+        for field, help_text in (("calls", "Timed calls"), ("seconds", "Time spent"), ("errors", "Calls that raised"),
+                                 ("bytes", "Input bytes (characters for text stages)"), ("chunks", "Chunks handled")):
+            metric = f"{PROMETHEUS_PREFIX}_{field}_total"
+            lines.append(f"# HELP {metric} {help_text} per ingestion stage")
+            lines.append(f"# TYPE {metric} counter")
+            lines += [f'{metric}{{stage="{name}"}} {totals[field]}' for name, totals in stages.items()]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        #Writes JSON (.json) or Prometheus text format (anything else, e.g. .prom). The file is replaced
+        #atomically, so a collector never reads a half-written file
+        text = self.to_json() if path.lower().endswith(".json") else self.to_prometheus()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+
+# Shared by every module of one process
+metrics = Metrics()
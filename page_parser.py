@@ -0,0 +1,107 @@
+import importlib.util
+# BeautifulSoup and lxml are imported on first use, so importing this module (e.g. for --help) stays cheap
+
+# --- Parser Configuration ---
+# Text inside these never counts as paragraph text (same as BeautifulSoup's get_text())
+SKIPPED_TAGS = {"script", "style", "template"}
+
+
+def _parse_html_parser(content: bytes):
+    #Default backend: BeautifulSoup with the pure-Python html.parser, one tree walk for <p> and one for <a href>
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    paragraphs = [p.get_text() for p in soup.find_all('p')]
+    hrefs = [a_tag['href'] for a_tag in soup.find_all('a', href=True)]
+    return paragraphs, hrefs
+
+
+class _PageTarget:
+    #lxml parser target: collects paragraph text and link targets while the document is parsed,
+    #without building a tree. A <p> inside another <p> adds its text to both, like get_text() does.
+
+    def __init__(self):
+        self.paragraphs = []
+        self.hrefs = []
+        self._open = []         # Text parts of every <p> that is still open
+        self._skipping = 0
+
+    def start(self, tag, attrib):
+        if tag == "p":
+            parts = []
+            self.paragraphs.append(parts)
+            self._open.append(parts)
+        elif tag == "a":
+            href = attrib.get("href")
+            if href is not None:
+                self.hrefs.append(href)
+        elif tag in SKIPPED_TAGS:
+            self._skipping += 1
+
+    def end(self, tag):
+        if tag == "p":
+            if self._open:
+                self._open.pop()
+        elif tag in SKIPPED_TAGS and self._skipping:
+            self._skipping -= 1
+
+    def data(self, text):
+        if self._open and not self._skipping:
+            for parts in self._open:
+                parts.append(text)
+
+    def close(self):
+        return ["".join(parts) for parts in self.paragraphs], self.hrefs
+
+
+def _decode(content: bytes):
+    #Declared encoding first, then UTF-8, then BeautifulSoup's full detection (the slow path)
+    from bs4.dammit import EncodingDetector, UnicodeDammit
+    encoding = EncodingDetector.find_declared_encoding(content, is_html=True)
+    for candidate in (encoding, "utf-8"):
+        if candidate:
+            try:
+                return content.decode(candidate)
+            except (UnicodeDecodeError, LookupError):
+                pass
+    return UnicodeDammit(content, is_html=True).unicode_markup or ""
+
+
+def _parse_lxml(content: bytes):
+    #libxml2's C parser with a streaming target: paragraphs and links come out of a single pass
+    from lxml import etree
+    parser = etree.HTMLParser(target=_PageTarget())
+    text = _decode(content)
+    if not text.strip():
+        return [], []
+    parser.feed(text)
+    return parser.close()
+
+
+def _lxml_available():
+    # Finding the package is enough here, lxml itself is loaded by the first page parsed with it
+    return importlib.util.find_spec("lxml") is not None
+
+
+# Backend name -> parse(content) returning (paragraph texts, raw href values), both in document order
+PARSER_BACKENDS = {
+    "lxml": _parse_lxml,
+    "html.parser": _parse_html_parser,
+}
+# html.parser stays the default until lxml segments pages the same way. Known differences of lxml (libxml2 repairs
+# the markup like a browser, html.parser keeps it as written):
+# - <p>a<p>b</p>: a second <p> closes the open one, so "a" and "b" instead of "ab" and "b"
+# - a block element inside a <p> (div, table, ul, h1-h6, form, blockquote, hr, ...) closes it, the text after the
+#   block is no paragraph text any more: <p>a<div>b</div>c</p> gives "a" instead of "abc"
+# - a <p> inside <title> isn't a paragraph
+# - CDATA sections are dropped, \r\n becomes \n and NUL characters become U+FFFD
+# bench_parse.py lists the pages of a fixture set where the two backends differ
+DEFAULT_PARSER = "html.parser"
+
+
+def parse_page(content: bytes, backend: str = DEFAULT_PARSER):
+    #Returns (paragraph texts, raw href values) of an HTML page
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown HTML parser {backend}. Choose from: {', '.join(PARSER_BACKENDS)}")
+    if backend == "lxml" and not _lxml_available():
+        raise ImportError("The lxml HTML parser needs: pip install lxml")
+    return PARSER_BACKENDS[backend](content)
@@ -0,0 +1,378 @@
+import os
+import json
+import time
+import argparse
+import threading
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from colorama import Fore, Style
+from embeddings import LocalEmbedder, EMBEDDING_BACKENDS, DEFAULT_BACKEND, DEFAULT_THREADS, check_collection_model
+from keyword_index import KeywordIndex, is_identifier_query, reciprocal_rank_fusion, SOURCE_KEYS
+from shards import open_collection, ShardedCollection
+
+# Color Definitions for colorama
+HEADING = Fore.YELLOW
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Retrieval Configuration ---
+CHROMA_PATH = "SecDB"
+COLLECTION_NAME = "SecData"
+HOST = "127.0.0.1"          # Local only: there is no authentication
+PORT = 8765
+DEFAULT_RESULTS = 5
+MAX_RESULTS = 100
+MAX_QUERIES = 256           # Queries per request
+EMBEDDING_CACHE_SIZE = 10000    # Query embeddings kept in memory (never stale, they only depend on the model)
+RESULT_CACHE_SIZE = 10000       # Top-k results kept in memory, dropped whenever ingestion writes
+WRITE_MARKER_FILE = "last_write"    # Touched in the database directory after every write by add_data
+DEFAULT_INCLUDE = ["documents", "metadatas", "distances"]
+QUERY_MODES = ["auto", "vector", "keyword", "hybrid"]
+DEFAULT_MODE = "auto"
+HYBRID_CANDIDATES = 50      # Results taken from each side before fusing
+
+
+def mark_written(db_path: str):
+    #Tells running retrieval services that the collection changed. Called by the write buffer after every write
+    path = os.path.join(db_path, WRITE_MARKER_FILE)
+    now = time.time_ns()
+    try:
+        os.utime(path, ns=(now, now))
+    except FileNotFoundError:
+        os.makedirs(db_path, exist_ok=True)
+        with open(path, "w"):
+            pass
+
+
+def where_source(where):
+    #The source path/URL when where selects exactly one source, e.g. {"source_url": url}
+    if where and len(where) == 1:
+        (key, value), = where.items()
+        if key in SOURCE_KEYS and isinstance(value, str):
+            return value
+    return None
+
+
+class LRUCache:
+    #Thread-safe least recently used cache
+    def __init__(self, max_items: int):
+        self.max_items = max(0, max_items)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.max_items:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"items": len(self._items), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+class Retriever:
+    #Keeps the Chroma client, the collection and the embedding model loaded between queries.
+    #Query embeddings and top-k results are cached; results are dropped as soon as the write marker shows that
+    #add_data wrote to the database. The embedder must be the one the collection was built with.
+
+    def __init__(self, db_path=CHROMA_PATH, collection_name=COLLECTION_NAME, embedder=None,
+                 embedding_cache_size=EMBEDDING_CACHE_SIZE, result_cache_size=RESULT_CACHE_SIZE):
+        import chromadb     # Not needed by search(), so clients can import this module cheaply
+        self.db_path = db_path
+        self.client = chromadb.PersistentClient(path=db_path)
+        # Several collections behind one when the database is sharded (see shards.py); queries fan out to them
+        self.collection = open_collection(self.client, db_path, collection_name, create=False)
+        self.keywords = KeywordIndex(None, db_path)
+        self.embedder = embedder or LocalEmbedder()
+        if getattr(self.embedder, "model", None):
+            # Query vectors have to come from the model the collection was built with
+            check_collection_model(self.collection, self.embedder.model)
+        self.embeddings = LRUCache(embedding_cache_size)
+        self.results = LRUCache(result_cache_size)
+        self._marker_path = os.path.join(db_path, WRITE_MARKER_FILE)
+        self._last_write = self._write_marker()
+        # The model runtimes aren't guaranteed to be thread-safe, requests run on several threads
+        self._embed_lock = threading.Lock()
+
+    def warm_up(self):
+        #Loads the model and the vector index before the first real query
+        self.query(["warm up"], use_cache=False)
+
+    def _write_marker(self):
+        try:
+            return os.stat(self._marker_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _check_for_writes(self):
+        last_write = self._write_marker()
+        if last_write != self._last_write:
+            self._last_write = last_write
+            self.results.clear()
+
+    def query(self, queries, n_results=DEFAULT_RESULTS, where=None, where_document=None, include=None,
+              mode=DEFAULT_MODE, use_cache=True):
+        #Top n_results chunks for every query text. Returns a list with one result dict per query, each with
+        #ids, documents, metadatas and distances (as selected by include), scores for keyword and hybrid results
+        #and cached = whether it was a cache hit.
+        #mode: "vector", "keyword" (BM25), "hybrid" (both, fused by reciprocal rank) or "auto": keyword for
+        #identifier lookups like CVE-2021-44228 (vector if nothing matches), hybrid for everything else.
+        #Only queries missing from the result cache are embedded (one batch) and searched (one Chroma call).
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Unknown mode {mode}. Choose from: {', '.join(QUERY_MODES)}")
+        include = list(include or DEFAULT_INCLUDE)
+        n_results = max(1, min(int(n_results), MAX_RESULTS))
+        self._check_for_writes()
+        write_seen = self._last_write
+
+        options = json.dumps([n_results, where, where_document, sorted(include), mode], sort_keys=True)
+        answers = [None] * len(queries)
+        missing = {}    # query text -> positions in the request
+        for i, text in enumerate(queries):
+            cached = self.results.get((text, options)) if use_cache else None
+            if cached is not None:
+                answers[i] = dict(cached, cached=True)
+            else:
+                missing.setdefault(text, []).append(i)
+
+        found = {}
+        modes = {text: self._mode_for(text, mode) for text in missing}
+        # Identifier lookups are answered here without touching the model or Chroma
+        for text in [text for text in missing if modes[text] == "keyword"]:
+            hits = self._keyword_hits(text, n_results, where, where_document)
+            if hits or mode == "keyword":
+                found[text] = self._keyword_answer(hits, include)
+            else:
+                modes[text] = "vector"
+        vector_texts = [text for text in missing if modes[text] in ("vector", "hybrid")]
+        if vector_texts:
+            hybrid = any(modes[text] == "hybrid" for text in vector_texts)
+            candidates = max(n_results, HYBRID_CANDIDATES) if hybrid else n_results
+            vector_answers = self._vector_answers(vector_texts, candidates, where, where_document, include, use_cache)
+            for text, answer in zip(vector_texts, vector_answers):
+                if modes[text] == "vector":
+                    found[text] = {key: values[:n_results] for key, values in answer.items()}
+                else:
+                    hits = self._keyword_hits(text, candidates, where, where_document)
+                    found[text] = self._fused_answer(answer, hits, n_results, include)
+
+        for text, answer in found.items():
+            # Not cached if a write was noticed meanwhile: the answer may predate it
+            if use_cache and self._last_write == write_seen:
+                self.results.put((text, options), answer)
+            for i in missing[text]:
+                answers[i] = dict(answer, cached=False)
+        return answers
+
+    @staticmethod
+    def _mode_for(text, mode):
+        if mode != "auto":
+            return mode
+        return "keyword" if is_identifier_query(text) else "hybrid"
+
+    def _vector_answers(self, texts, n_results, where, where_document, include, use_cache):
+        vectors = [self.embeddings.get(text) if use_cache else None for text in texts]
+        to_embed = [text for text, vector in zip(texts, vectors) if vector is None]
+        if to_embed:
+            with self._embed_lock:
+                embedded = dict(zip(to_embed, self.embedder(to_embed)))
+            for text in to_embed:
+                self.embeddings.put(text, embedded[text])
+            vectors = [embedded[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        found = self.collection.query(query_embeddings=vectors, n_results=n_results, where=where,
+                                      where_document=where_document, include=include)
+        return [{key: list(found[key][position]) for key in ["ids"] + include if found.get(key) is not None}
+                for position in range(len(texts))]
+
+    def _keyword_hits(self, text, n_results, where, where_document):
+        #BM25 hits [(chunk ID, document, metadata, score)] that also pass the metadata/document filters
+        source = where_source(where)
+        if where_document is None and (where is None or source is not None):
+            return self.keywords.search(text, n_results, source)
+        # Anything but a plain source filter is checked by Chroma, on more candidates to make up for the ones it drops
+        hits = self.keywords.search(text, n_results * 4)
+        if hits:
+            allowed = set(self.collection.get(ids=[hit[0] for hit in hits], where=where,
+                                              where_document=where_document, include=[])["ids"])
+            hits = [hit for hit in hits if hit[0] in allowed]
+        return hits[:n_results]
+
+    @staticmethod
+    def _keyword_answer(hits, include):
+        answer = {"ids": [hit[0] for hit in hits], "scores": [hit[3] for hit in hits]}
+        if "documents" in include:
+            answer["documents"] = [hit[1] for hit in hits]
+        if "metadatas" in include:
+            answer["metadatas"] = [hit[2] for hit in hits]
+        if "distances" in include:
+            answer["distances"] = [None] * len(hits)
+        return answer
+
+    @staticmethod
+    def _fused_answer(vector_answer, hits, n_results, include):
+        #Reciprocal rank fusion of the vector and keyword rankings. Distances are None for keyword-only hits
+        fused = reciprocal_rank_fusion([vector_answer["ids"], [hit[0] for hit in hits]], n_results)
+        by_id = {hit[0]: {"documents": hit[1], "metadatas": hit[2], "distances": None} for hit in hits}
+        for position, chunk_id in enumerate(vector_answer["ids"]):
+            by_id[chunk_id] = {key: vector_answer[key][position] for key in ("documents", "metadatas", "distances")
+                               if key in vector_answer}
+        answer = {"ids": [chunk_id for chunk_id, _ in fused], "scores": [score for _, score in fused]}
+        for key in ("documents", "metadatas", "distances"):
+            if key in include:
+                answer[key] = [by_id[chunk_id].get(key) for chunk_id, _ in fused]
+        return answer
+
+    def stats(self):
+        stats = {"chunks": self.collection.count(), "keyword_chunks": self.keywords.indexed_count(),
+                 "embedding_cache": self.embeddings.stats(),
+                 "result_cache": self.results.stats()}
+        if isinstance(self.collection, ShardedCollection):
+            stats["shards"] = self.collection.counts()
+        return stats
+
+
+class RetrievalHandler(BaseHTTPRequestHandler):
+    #POST /query {"queries": [...], "n_results": 5, "where": {...}, "where_document": {...}, "include": [...],
+    #             "mode": "auto" | "vector" | "keyword" | "hybrid"}
+    #GET /stats
+    protocol_version = "HTTP/1.1"   # Keep-alive, so a client doesn't pay a new connection per query
+    disable_nagle_algorithm = True  # Headers and body are separate writes; Nagle + delayed ACK would add ~40 ms
+    retriever = None
+
+    def do_POST(self):
+        if self.path != "/query":
+            return self._send(404, {"error": "unknown path, use POST /query"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            queries = request.get("queries")
+            if isinstance(queries, str):
+                queries = [queries]
+            if not isinstance(queries, list) or not queries or not all(isinstance(text, str) for text in queries):
+                return self._send(400, {"error": "queries must be a string or a list of strings"})
+            if len(queries) > MAX_QUERIES:
+                return self._send(400, {"error": f"at most {MAX_QUERIES} queries per request"})
+            start = time.perf_counter()
+            results = self.retriever.query(queries, request.get("n_results", DEFAULT_RESULTS), request.get("where"),
+                                           request.get("where_document"), request.get("include"),
+                                           request.get("mode", DEFAULT_MODE))
+            self._send(200, {"results": results, "ms": (time.perf_counter() - start) * 1000})
+        except (ValueError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            # e.g. an invalid metadata filter, reported by Chroma
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self._send(404, {"error": "unknown path, use GET /stats"})
+        self._send(200, self.retriever.stats())
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(retriever, host=HOST, port=PORT):
+    handler = type("Handler", (RetrievalHandler,), {"retriever": retriever})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def search(queries, n_results=DEFAULT_RESULTS, where=None, where_document=None, include=None, mode=DEFAULT_MODE,
+           url=f"http://{HOST}:{PORT}", timeout=30):
+    #Client for a running service: one result dict per query (see Retriever.query)
+    payload = {"queries": [queries] if isinstance(queries, str) else list(queries), "n_results": n_results,
+               "where": where, "where_document": where_document, "include": include, "mode": mode}
+    request = urllib.request.Request(f"{url}/query", data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running retrieval service over the RAG database, and a client for it")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="load the database and model and answer queries over local HTTP")
+    serve_parser.add_argument("--db", default=CHROMA_PATH)
+    serve_parser.add_argument("--collection", default=COLLECTION_NAME)
+    serve_parser.add_argument("--host", default=HOST)
+    serve_parser.add_argument("--port", type=int, default=PORT)
+    serve_parser.add_argument("--embed-backend", choices=sorted(EMBEDDING_BACKENDS), default=DEFAULT_BACKEND,
+                              help="must match the collection's embedding function")
+    serve_parser.add_argument("--embed-model", default=None)
+    serve_parser.add_argument("--embed-threads", type=int, default=DEFAULT_THREADS)
+    serve_parser.add_argument("--cache-size", type=int, default=RESULT_CACHE_SIZE, help="cached queries (0 = off)")
+    query_parser = commands.add_parser("query", help="ask a running service")
+    query_parser.add_argument("queries", nargs="+")
+    query_parser.add_argument("-k", "--n-results", type=int, default=DEFAULT_RESULTS)
+    query_parser.add_argument("--where", type=json.loads, help='metadata filter as JSON, e.g. \'{"source_url": "..."}\'')
+    query_parser.add_argument("--mode", choices=QUERY_MODES, default=DEFAULT_MODE,
+                              help="auto = keyword index for identifiers (CVE-..., CWE-..., hashes), hybrid otherwise")
+    query_parser.add_argument("--url", default=f"http://{HOST}:{PORT}")
+    args = parser.parse_args()
+
+    if args.command == "query":
+        for text, result in zip(args.queries, search(args.queries, args.n_results, args.where,
+                                                         mode=args.mode, url=args.url)):
+            print(f"\n{HEADING}{text}{RESET}")
+            # Keyword and hybrid results are ranked by score (higher is better), vector results by distance
+            scores = result.get("scores") or [None] * len(result["ids"])
+            for document, metadata, distance, score in zip(result["documents"], result["metadatas"],
+                                                           result["distances"], scores):
+                source = (metadata or {}).get("source_file") or (metadata or {}).get("source_url")
+                rank = f"score {score:.4g}" if score is not None else f"{distance:.3f}"
+                print(f"{INFO}{rank} {source}{RESET}\n    {' '.join(document.split())[:200]}")
+        return
+
+    print(f"{INFO}Loading {args.db}/{args.collection} and the embedding model...{RESET}")
+    embedder = LocalEmbedder(args.embed_backend, args.embed_model, threads=args.embed_threads)
+    try:
+        retriever = Retriever(args.db, args.collection, embedder, result_cache_size=args.cache_size)
+    except Exception as e:
+        print(f"{WARNING}Could not open collection {args.collection} in {args.db} (run create_db.py first?): {e}{RESET}")
+        return
+    retriever.warm_up()
+    server = serve(retriever, args.host, args.port)
+    print(f"{SUCCESS}Retrieval service ready on http://{args.host}:{args.port} ({retriever.collection.count()} chunks){RESET}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{INFO}Stopping retrieval service{RESET}")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import io
+import re
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import urlparse, urljoin
+from urllib.robotparser import RobotFileParser
+import xml.etree.ElementTree as ET
+
+# --- Scheduler Configuration ---
+SITEMAP_MAX_FILES = 500         # Sitemaps (including the ones listed in sitemap indexes) fetched per crawl
+SITEMAP_MAX_URLS = 500000       # URLs taken from sitemaps per crawl
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024    # Decompressed size read from a gzipped sitemap (the sitemap protocol's limit)
+ROBOTS_USER_AGENT = "*"
+
+# (regex searched in the lowercased URL path and query, weight). Weights of all matching patterns add up
+DEFAULT_PATTERNS = [
+    (r"advisor|bulletin|security|vulnerab|cve-\d{4}-\d+|ghsa-|exploit|patch|threat|malware|/kb/", 3.0),
+    (r"blog|news|research|report|/docs?/|whitepaper", 1.0),
+    (r"/(tags?|categor(y|ies)|topics?|authors?|archives?|labels?)(/|$)", -3.0),
+    (r"/page/\d+|[?&]page=\d+|/\d{4}/\d{2}/?$", -2.0),
+    (r"log-?in|sign-?in|sign-?up|register|log-?out|account|cart|checkout|wp-admin|password", -5.0),
+    (r"/(search|feed|rss|print|share|comments?)(/|$)|\.(xml|rss|atom|json|zip|gz|png|jpe?g|gif|svg|css|js|ico)$", -4.0),
+]
+
+
+def parse_lastmod(value):
+    #W3C datetime from a sitemap (e.g. 2024-05-01 or 2024-05-01T10:00:00Z) as an aware datetime, or None
+    if not value:
+        return None
+    value = value.strip().replace("Z", "+00:00")
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value[:10], "%Y-%m-%d")
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class UrlScorer:
+    #Default crawl priority: path patterns, link depth and sitemap freshness. Higher scores are crawled first.
+    #Any callable with the same signature can be passed to the crawler instead.
+
+    def __init__(self, patterns=None, depth_weight=0.5, freshness_weight=2.0, freshness_half_life_days=180,
+                 sitemap_bonus=1.0):
+        self.patterns = [(re.compile(pattern), weight) for pattern, weight in (patterns or DEFAULT_PATTERNS)]
+        self.depth_weight = depth_weight
+        self.freshness_weight = freshness_weight
+        self.freshness_half_life_days = freshness_half_life_days
+        self.sitemap_bonus = sitemap_bonus
+
+    def __call__(self, url: str, depth: int = 0, lastmod=None, in_sitemap: bool = False):
+        parsed = urlparse(url)
+        target = parsed.path.lower() + ("?" + parsed.query.lower() if parsed.query else "")
+        score = sum(weight for pattern, weight in self.patterns if pattern.search(target))
+        score -= self.depth_weight * depth
+        if in_sitemap:
+            score += self.sitemap_bonus
+        if lastmod is not None:
+            # Recently changed pages first: full weight today, half after one half-life
+            age_days = max(0.0, (datetime.now(timezone.utc) - lastmod).total_seconds() / 86400)
+            score += self.freshness_weight * 0.5 ** (age_days / self.freshness_half_life_days)
+        return score
+
+
+def parse_robots(text: str, robots_url: str):
+    #Returns (RobotFileParser, sitemap URLs listed in robots.txt)
+    parser = RobotFileParser(robots_url)
+    parser.parse(text.splitlines())
+    return parser, [urljoin(robots_url, sitemap) for sitemap in parser.site_maps() or []]
+
+
+def _gunzip(content: bytes, max_bytes: int = SITEMAP_MAX_BYTES):
+    #At most max_bytes of decompressed data, so a compression bomb can't exhaust memory. A truncated stream gives
+    #what could be decompressed, a broken one nothing
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        return decompressor.decompress(content, max_bytes)
+    except zlib.error:
+        return b""
+
+
+def parse_sitemap(content: bytes):
+    #Returns ("index" or "urlset", [(loc, lastmod datetime or None)]). Handles gzipped sitemaps.
+    #A broken or truncated sitemap only loses the entries that couldn't be read, it never raises
+    if content[:2] == b"\x1f\x8b":
+        content = _gunzip(content)
+    kind, entries = "urlset", []
+    loc = lastmod = None
+    try:
+        for event, element in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if event == "start":
+                if tag == "sitemapindex":
+                    kind = "index"
+                continue
+            if tag == "loc":
+                loc = (element.text or "").strip()
+            elif tag == "lastmod":
+                lastmod = parse_lastmod(element.text)
+            elif tag in ("url", "sitemap"):
+                if loc:
+                    entries.append((loc, lastmod))
+                loc = lastmod = None
+                element.clear()
+    except ET.ParseError:
+        pass    # Keep whatever was read before the broken part
+    return kind, entries
@@ -0,0 +1,356 @@
+import os
+import json
+import zlib
+import hashlib
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from colorama import Fore, Style
+from keyword_index import SOURCE_KEYS
+
+# Color Definitions for colorama
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Shard Configuration ---
+SHARD_MAP_FILE = "shards.json"  # In the database directory; no file = one collection, like before
+FILE_SHARD = "files"            # Every local file (source_file)
+DEFAULT_WEB_SHARDS = 4          # Web pages of domains without their own shard are spread over web-0..web-N by domain
+QUERY_THREADS = 8               # Shards queried at once by a fan-out query
+DOMAIN_HASH = "blake2b"         # How new maps spread domains over the web shards; maps keep the one they were made with
+
+# A shard map looks like
+#   {"collection": "SecData", "web_shards": 4, "domains": {"nvd.nist.gov": "nvd", "attack.mitre.org": "mitre"},
+#    "domain_hash": "blake2b"}
+# and spreads the collection over the Chroma collections SecData-files, SecData-nvd, SecData-mitre and
+# SecData-web-0..3. A domain also covers its subdomains. All chunks of one source land in the same shard, so
+# everything add_data does per source (delta sync, delete, duplicate checks) touches a single shard.
+
+
+def _source_filter(where):
+    #(metadata key, source path/URL) when where selects exactly one source, e.g. {"source_url": url}
+    if where and len(where) == 1:
+        (key, value), = where.items()
+        if key in SOURCE_KEYS and isinstance(value, str):
+            return key, value
+    return None
+
+
+def _domain(url: str):
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class ShardMap:
+    #Which collection every source belongs to. Saved as shards.json in the database directory, read by
+    #add_data.py, retrieval.py and create_db.py; create_db.py shards is the only thing that changes it
+
+    def __init__(self, collection: str, web_shards: int = DEFAULT_WEB_SHARDS, domains: dict = None,
+                 domain_hash: str = DOMAIN_HASH):
+        if domain_hash not in ("blake2b", "crc32"):
+            raise ValueError(f"Unknown domain hash {domain_hash}")
+        self.collection = collection
+        self.web_shards = max(1, int(web_shards))
+        self.domains = {domain.lower(): shard for domain, shard in (domains or {}).items()}
+        self.domain_hash = domain_hash
+
+    @classmethod
+    def load(cls, db_path: str):
+        #The database's shard map, None if it keeps everything in one collection
+        try:
+            with open(os.path.join(db_path, SHARD_MAP_FILE), encoding="utf-8") as f:
+                layout = json.load(f)
+        except FileNotFoundError:
+            return None
+        # Maps written before the hash was recorded used crc32
+        return cls(layout["collection"], layout.get("web_shards", DEFAULT_WEB_SHARDS), layout.get("domains"),
+                   layout.get("domain_hash", "crc32"))
+
+    def save(self, db_path: str):
+        os.makedirs(db_path, exist_ok=True)
+        path = os.path.join(db_path, SHARD_MAP_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"collection": self.collection, "web_shards": self.web_shards, "domains": self.domains,
+                       "domain_hash": self.domain_hash}, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def remove(db_path: str):
+        try:
+            os.remove(os.path.join(db_path, SHARD_MAP_FILE))
+        except FileNotFoundError:
+            pass
+
+    def shards(self):
+        #Every shard name, the file shard first
+        named = sorted(set(self.domains.values()) - {FILE_SHARD})
+        return [FILE_SHARD] + named + [f"web-{i}" for i in range(self.web_shards)]
+
+    def collection_name(self, shard: str):
+        return f"{self.collection}-{shard}"
+
+    def collection_names(self):
+        return [self.collection_name(shard) for shard in self.shards()]
+
+    def shard_for_source(self, key: str, source: str):
+        if key != "source_url":
+            return FILE_SHARD
+        domain = _domain(source)
+        # The longest matching domain wins, so docs.example.com can have another shard than example.com
+        for candidate in sorted(self.domains, key=len, reverse=True):
+            if domain == candidate or domain.endswith(f".{candidate}"):
+                return self.domains[candidate]
+        # A stable hash rather than hash(): the same domain has to land in the same shard in every process.
+        # crc32 is linear, so similar names (h1.com, h2.com) tend to share its low bits and the same shard
+        if self.domain_hash == "crc32":
+            value = zlib.crc32(domain.encode("utf-8"))
+        else:
+            value = int.from_bytes(hashlib.blake2b(domain.encode("utf-8"), digest_size=8).digest(), "big")
+        return f"web-{value % self.web_shards}"
+
+    def shard_for(self, metadata):
+        #Chunks without a source (nothing add_data writes) go to the file shard
+        for key in SOURCE_KEYS:
+            if metadata and metadata.get(key):
+                return self.shard_for_source(key, metadata[key])
+        return FILE_SHARD
+
+
+def hnsw_settings(collection):
+    #The collection's HNSW index settings (distance space etc.) where this Chroma version exposes them
+    configuration = getattr(collection, "configuration_json", None) or {}
+    return {key: value for key, value in (configuration.get("hnsw") or {}).items() if value is not None}
+
+
+def create_like(client, name: str, template):
+    #A new collection with template's metadata and HNSW settings (distance space etc.), so distances stay comparable
+    hnsw = hnsw_settings(template) if template is not None else {}
+    options = {"configuration": {"hnsw": hnsw}} if hnsw else {}
+    metadata = template.metadata if template is not None else None
+    return client.create_collection(name=name, metadata=metadata or None, **options)
+
+
+def _merge_gets(results):
+    #One get() result out of several shards' results
+    merged = {}
+    for key in results[0]:
+        if key == "included":
+            merged[key] = results[0][key]
+        elif all(result.get(key) is None for result in results):
+            merged[key] = None
+        else:
+            merged[key] = [value for result in results if result.get(key) is not None for value in result[key]]
+    return merged
+
+
+class ShardedCollection:
+    #Stands in for a single Chroma collection over all collections of a shard map. Writes and source-filtered
+    #reads go to the one shard that holds the source; other reads and queries fan out to every shard on a thread
+    #pool, and query() merges each query's top n_results by distance
+
+    def __init__(self, client, shard_map: ShardMap, create: bool = True, threads: int = QUERY_THREADS, template=None):
+        #create makes missing shards like template, by default like the first shard that exists
+        self.client = client
+        self.shard_map = shard_map
+        self.name = shard_map.collection
+        existing = {collection.name for collection in client.list_collections()}
+        names = {shard: shard_map.collection_name(shard) for shard in shard_map.shards()}
+        if create and template is None:
+            template = next((client.get_collection(name=name) for name in names.values() if name in existing), None)
+        self.shards = {shard: client.get_collection(name=name) if name in existing or not create
+                       else create_like(client, name, template) for shard, name in names.items()}
+        self._pool = ThreadPoolExecutor(max(1, min(threads, len(self.shards))), thread_name_prefix="shard")
+
+    @property
+    def metadata(self):
+        return self.shards[FILE_SHARD].metadata
+
+    def _fan_out(self, call, shards=None):
+        #call(collection) on every shard at once, results in shard order
+        collections = [self.shards[shard] for shard in (shards or self.shards)]
+        if len(collections) == 1:
+            return [call(collections[0])]
+        return list(self._pool.map(call, collections))
+
+    def _shard_of_filter(self, where):
+        source = _source_filter(where)
+        return self.shard_map.shard_for_source(*source) if source else None
+
+    def _group(self, ids, metadatas):
+        #{shard: positions} for chunks routed by their metadata
+        groups = {}
+        for position, metadata in enumerate(metadatas):
+            groups.setdefault(self.shard_map.shard_for(metadata), []).append(position)
+        return groups
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None, **kwargs):
+        ids = [ids] if isinstance(ids, str) else list(ids)
+        # One write at a time: all shards share the database's SQLite file
+        for shard, positions in self._group(ids, metadatas if metadatas is not None else [None] * len(ids)).items():
+            self.shards[shard].add(
+                ids=[ids[i] for i in positions],
+                documents=[documents[i] for i in positions] if documents is not None else None,
+                metadatas=[metadatas[i] for i in positions] if metadatas is not None else None,
+                embeddings=[embeddings[i] for i in positions] if embeddings is not None else None,
+                **kwargs,
+            )
+
+    def update(self, ids, metadatas=None, **kwargs):
+        ids = [ids] if isinstance(ids, str) else list(ids)
+        if metadatas is not None:
+            # A chunk's source never changes, so the new metadata names its shard
+            groups = self._group(ids, metadatas)
+        else:
+            groups = {}
+            for shard, result in zip(self.shards, self._fan_out(lambda c: c.get(ids=ids, include=[]))):
+                held = set(result["ids"])
+                groups[shard] = [i for i, chunk_id in enumerate(ids) if chunk_id in held]
+        for shard, positions in groups.items():
+            if not positions:
+                continue
+            self.shards[shard].update(
+                ids=[ids[i] for i in positions],
+                metadatas=[metadatas[i] for i in positions] if metadatas is not None else None,
+                **{key: [value[i] for i in positions] if value is not None else None for key, value in kwargs.items()},
+            )
+
+    def delete(self, ids=None, where=None, **kwargs):
+        shard = self._shard_of_filter(where) if ids is None else None
+        # Deleting IDs a shard doesn't hold is a no-op, so ID deletes simply go to every shard
+        self._fan_out(lambda c: c.delete(ids=ids, where=where, **kwargs), [shard] if shard else None)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, **kwargs):
+        shard = self._shard_of_filter(where)
+        if shard is not None:
+            return self.shards[shard].get(ids=ids, where=where, limit=limit, offset=offset, **kwargs)
+        if ids is None and where is None and not kwargs.get("where_document") and (limit or offset):
+            return self._get_page(limit, offset or 0, **kwargs)
+        results = self._fan_out(lambda c: c.get(ids=ids, where=where, **kwargs))
+        merged = _merge_gets(results)
+        if limit or offset:
+            start = offset or 0
+            end = start + limit if limit else None
+            merged = {key: value[start:end] if isinstance(value, list) and key != "included" else value
+                      for key, value in merged.items()}
+        return merged
+
+    def _get_page(self, limit, offset, **kwargs):
+        #Unfiltered paging (index_existing, snapshot export): the shards are read one after another, in shard order
+        results = []
+        for collection in self.shards.values():
+            if limit is not None and limit <= 0:
+                break
+            count = collection.count()
+            if offset >= count and results:
+                offset -= count
+                continue
+            # The first shard is always asked, so a page past the end is still an (empty) Chroma result
+            result = collection.get(limit=limit, offset=offset, **kwargs)
+            offset = max(0, offset - count)
+            if limit is not None:
+                limit -= len(result["ids"])
+            results.append(result)
+        return _merge_gets(results)
+
+    def count(self):
+        return sum(self._fan_out(lambda c: c.count()))
+
+    def counts(self):
+        #{collection name: chunks} per shard
+        return {collection.name: count for collection, count
+                in zip(self.shards.values(), self._fan_out(lambda c: c.count()))}
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=None, **kwargs):
+        shard = self._shard_of_filter(where)
+        options = dict(kwargs, n_results=n_results, where=where)
+        if include is not None:
+            # Distances are needed to merge the shards' results
+            options["include"] = list(include) + ([] if "distances" in include else ["distances"])
+        if query_embeddings is not None:
+            options["query_embeddings"] = query_embeddings
+        if query_texts is not None:
+            options["query_texts"] = query_texts
+        results = self._fan_out(lambda c: c.query(**options), [shard] if shard else None)
+        if len(results) == 1:
+            return results[0]
+        # Every shard returns its own top n_results per query; the best n_results of all of them are kept
+        merged = {key: None if results[0].get(key) is None else [] for key in results[0]}
+        merged["included"] = results[0].get("included")
+        for position in range(len(results[0]["ids"])):
+            ranked = sorted(((distance, shard_result, rank) for shard_result in results
+                             for rank, distance in enumerate(shard_result["distances"][position])),
+                            key=lambda item: item[0])[:n_results]
+            for key, values in merged.items():
+                if key != "included" and values is not None:
+                    values.append([shard_result[key][position][rank] for _, shard_result, rank in ranked])
+        if include is not None and "distances" not in include:
+            merged["distances"] = None
+        return merged
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+
+def open_collection(client, db_path: str, collection_name: str, create: bool = True):
+    #The collection to read and write: a ShardedCollection when the database has a shard map for collection_name,
+    #the plain Chroma collection otherwise
+    shard_map = ShardMap.load(db_path)
+    if shard_map is not None and shard_map.collection == collection_name:
+        return ShardedCollection(client, shard_map, create)
+    if create:
+        return client.get_or_create_collection(name=collection_name)
+    return client.get_collection(name=collection_name)
+
+
+def reshard(client, db_path: str, collection_name: str, shard_map: ShardMap = None, batch_size: int = 1000):
+    #Switches the database to shard_map (None = one collection named collection_name), moving the chunks that
+    #change collection with their stored embeddings, so nothing is re-embedded. Collections left empty are
+    #removed. Returns the number of chunks moved
+    old_map = ShardMap.load(db_path)
+    if old_map is not None and old_map.collection != collection_name:
+        raise ValueError(f"{db_path} is sharded for collection {old_map.collection}, not {collection_name}")
+    existing = {collection.name for collection in client.list_collections()}
+    old_names = old_map.collection_names() if old_map else [collection_name]
+    # New collections get the metadata and HNSW settings of the collection(s) the chunks come from
+    template = next((client.get_collection(name=name) for name in old_names if name in existing), None)
+    if shard_map:
+        target = ShardedCollection(client, shard_map, template=template)
+    elif collection_name in existing:
+        target = client.get_collection(name=collection_name)
+    else:
+        target = create_like(client, collection_name, template)
+    target_of = ((lambda metadata: shard_map.collection_name(shard_map.shard_for(metadata))) if shard_map
+                 else (lambda metadata: collection_name))
+    moved = 0
+    for name in old_names:
+        if name not in existing:
+            continue
+        source = client.get_collection(name=name)
+        moving = []
+        offset = 0
+        # Pages are read from the old collection and written elsewhere; it is only changed after the last page
+        while True:
+            page = source.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            keep = [i for i, metadata in enumerate(page["metadatas"]) if target_of(metadata) != name]
+            if keep:
+                target.add(ids=[page["ids"][i] for i in keep], documents=[page["documents"][i] for i in keep],
+                           metadatas=[page["metadatas"][i] for i in keep],
+                           embeddings=[page["embeddings"][i] for i in keep])
+                moving.extend(page["ids"][i] for i in keep)
+                print(f"{INFO}  Moved {moved + len(moving)} chunks{RESET}", end="\r")
+        for start in range(0, len(moving), batch_size):
+            source.delete(ids=moving[start:start + batch_size])
+        moved += len(moving)
+        wanted = shard_map.collection_names() if shard_map else [collection_name]
+        if name not in wanted and not source.count():
+            client.delete_collection(name=name)
+    if shard_map:
+        shard_map.save(db_path)
+        target.close()
+    else:
+        ShardMap.remove(db_path)
+    print(f"{SUCCESS}Moved {moved} chunks{RESET}")
+    return moved
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import zipfile
+import numpy as np
+from colorama import Fore, Style
+from keyword_index import KeywordIndex
+from shards import hnsw_settings
+
+# Color Definitions for colorama
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Snapshot Configuration ---
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_SUFFIX = ".snapshot"
+PART_SIZE = 5000            # Chunks per part: what export reads from Chroma and import loads into memory at a time
+HEADER_FILE = "snapshot.json"
+TEXT_COLUMNS = ("ids", "documents", "metadatas")
+
+# A snapshot is a zip file with one folder per part:
+#   part-00000/embeddings.npy   float32 [chunks, dimension], stored uncompressed (vectors barely compress)
+#   part-00000/ids.json, documents.json, metadatas.json   one JSON list per column, deflated
+# plus snapshot.json with the collection's name, metadata and HNSW settings, the counts and the dimension
+
+
+def _member(part: int, column: str):
+    return f"part-{part:05d}/{column}"
+
+
+def export_snapshot(collection, path: str, part_size: int = PART_SIZE):
+    #Writes every chunk of collection (ID, document, metadata, embedding) to a snapshot file, part_size chunks at a time,
+    #so memory stays flat for any collection size. The file is replaced atomically. Returns the number of chunks.
+    #Nothing should write to the collection meanwhile, chunks are read page by page
+    temp_path = f"{path}.tmp"
+    exported = parts = 0
+    dimension = None
+    start_time = time.time()
+    total = collection.count()
+    with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        while True:
+            page = collection.get(include=["embeddings", "documents", "metadatas"], limit=part_size, offset=exported)
+            if not page["ids"]:
+                break
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            dimension = embeddings.shape[1]
+            with archive.open(_member(parts, "embeddings.npy"), "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, embeddings, allow_pickle=False)
+            for column in TEXT_COLUMNS:
+                archive.writestr(_member(parts, f"{column}.json"), json.dumps(page[column]),
+                                 compress_type=zipfile.ZIP_DEFLATED)
+            exported += len(page["ids"])
+            parts += 1
+            print(f"{INFO}  Exported {exported}/{total} chunks{RESET}", end="\r")
+        header = {
+            "format": SNAPSHOT_FORMAT, "collection": collection.name, "metadata": collection.metadata,
+            "hnsw": hnsw_settings(collection), "count": exported, "dimension": dimension, "parts": parts,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        archive.writestr(HEADER_FILE, json.dumps(header, indent=2))
+    os.replace(temp_path, path)
+    print(f"{SUCCESS}Exported {exported} chunks to {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB) "
+          f"in {time.time() - start_time:.1f}s{RESET}")
+    return exported
+
+
+def read_header(path: str):
+    with zipfile.ZipFile(path) as archive:
+        header = json.loads(archive.read(HEADER_FILE))
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is snapshot format {header.get('format')}, this version reads format {SNAPSHOT_FORMAT}")
+    return header
+
+
+def import_snapshot(path: str, db_path: str, collection_name: str = None):
+    #Bulk-loads a snapshot into a new collection in db_path (created if needed) with the stored embeddings,
+    #so nothing is embedded again. The BM25 keyword index is built along the way for retrieval.py.
+    #db_path must not hold any collection yet: the keyword index and the near-duplicate store are per database,
+    #so chunks imported next to another collection would show up in its keyword and hybrid results. Returns the collection
+    import chromadb
+    header = read_header(path)
+    collection_name = collection_name or header["collection"]
+    client = chromadb.PersistentClient(path=db_path)
+    existing = [collection.name for collection in client.list_collections()]
+    if existing:
+        raise ValueError(f"{db_path} already holds {', '.join(existing)}, import into a new database")
+    leftover = KeywordIndex(None, db_path)
+    try:
+        # Rows of collections that were deleted from db_path would come back as keyword hits
+        if leftover.indexed_count():
+            raise ValueError(f"{db_path} has a keyword index from earlier collections, import into a new database")
+    finally:
+        leftover.close()
+    options = {"configuration": {"hnsw": header["hnsw"]}} if header.get("hnsw") else {}
+    collection = client.create_collection(name=collection_name, metadata=header.get("metadata") or None, **options)
+
+    # Every chunk also goes into the keyword index, which only commits on flush()
+    target = KeywordIndex(collection, db_path)
+    batch_size = client.get_max_batch_size()
+    imported = 0
+    start_time = time.time()
+    with zipfile.ZipFile(path) as archive:
+        for part in range(header["parts"]):
+            with archive.open(_member(part, "embeddings.npy")) as f:
+                embeddings = np.lib.format.read_array(f, allow_pickle=False)
+            ids, documents, metadatas = (json.loads(archive.read(_member(part, f"{column}.json")))
+                                         for column in TEXT_COLUMNS)
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                target.add(documents=documents[start:end], ids=ids[start:end], metadatas=metadatas[start:end],
+                           embeddings=embeddings[start:end])
+            imported += len(ids)
+            print(f"{INFO}  Imported {imported}/{header['count']} chunks{RESET}", end="\r")
+    target.flush()
+    target.close()
+    print(f"{SUCCESS}Imported {imported} chunks into {db_path}/{collection_name} in {time.time() - start_time:.1f}s{RESET}")
+    return collection
@@ -0,0 +1,111 @@
+import os
+import time
+from collections import Counter
+from urllib.parse import urlsplit, urlunsplit
+from colorama import Fore, Style
+from frontier import url_fingerprint
+
+# Color Definitions for colorama
+WARNING = Fore.RED
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- URL List Configuration ---
+RESULTS_COLUMNS = ["url", "status", "http_status", "attempts", "error", "finished"]
+DONE_STATUSES = {"added", "unchanged"}     # URLs with one of these results are skipped by the next run
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(line: str):
+    #Canonical form of a URL from a list (lowercase scheme and host, no default port or fragment, "/" for an
+    #empty path), or None for blank lines, comments and anything that isn't an http(s) URL. The query is kept
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    try:
+        parts = urlsplit(line)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    netloc = parts.hostname.lower()
+    if ":" in netloc:
+        netloc = f"[{netloc}]"  # IPv6 literal
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+class UrlListResults:
+    #Per-URL outcome of URL list ingestion, appended to a tab-separated results file (one row per attempt at a URL,
+    #the last row wins). URLs whose last result is "added" or "unchanged" are skipped by the next run, so
+    #re-running the same list only retries the failures.
+    #Like the HTTP cache, rows are staged and only written by commit(), after the pages' chunks are stored.
+
+    def __init__(self, path, fresh: bool = False):
+        self.path = path
+        self.done = set()       # Fingerprints of URLs finished by earlier runs
+        self._staged = []
+        self.counts = Counter()
+        if os.path.exists(path) and not fresh:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                for line in f:
+                    row = line.rstrip("\r\n").split("\t")
+                    if len(row) < 2 or row[0] == RESULTS_COLUMNS[0]:
+                        continue
+                    fingerprint = url_fingerprint(row[0])
+                    if row[1] in DONE_STATUSES:
+                        self.done.add(fingerprint)
+                    else:
+                        self.done.discard(fingerprint)
+
+    def read(self, list_path):
+        #Streams normalized URLs from a list file, dropping invalid lines, duplicates and URLs finished before.
+        #Only 64-bit fingerprints are kept, so lists of millions of URLs don't need to fit in memory
+        seen = set()
+        with open(list_path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                url = normalize_url(line)
+                if url is None:
+                    if line.strip() and not line.lstrip().startswith("#"):
+                        self.counts["invalid"] += 1
+                    continue
+                fingerprint = url_fingerprint(url)
+                if fingerprint in seen:
+                    self.counts["duplicate"] += 1
+                    continue
+                seen.add(fingerprint)
+                if fingerprint in self.done:
+                    self.counts["done before"] += 1
+                    continue
+                yield url
+
+    def record(self, url: str, status: str, http_status=None, attempts: int = 1, error: str = ""):
+        self.counts[status] += 1
+        error = " ".join(str(error or "").split())  # Keep every result on one line
+        self._staged.append((url, status, "" if http_status is None else str(http_status), str(attempts), error,
+                             time.strftime("%Y-%m-%dT%H:%M:%S")))
+
+    def commit(self):
+        if not self._staged:
+            return
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", encoding="utf-8", newline="") as f:
+            if new_file:
+                f.write("\t".join(RESULTS_COLUMNS) + "\n")
+            f.writelines("\t".join(row) + "\n" for row in self._staged)
+        self._staged.clear()
+
+    def report(self):
+        counts = self.counts
+        print(f"{INFO}URL list: {SUCCESS}{counts['added']}{INFO} added, {counts['unchanged']} unchanged, "
+              f"{WARNING}{counts['failed']}{INFO} failed, {counts['duplicate']} duplicates and "
+              f"{counts['invalid']} invalid lines skipped, {counts['done before']} done by earlier runs{RESET}")
+        if counts["failed"]:
+            print(f"{INFO}    Failures are listed in {self.path}, run the list again to retry them{RESET}")
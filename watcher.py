@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from pathlib import Path
+from colorama import Fore, Style
+
+# Color Definitions for colorama
+WARNING = Fore.RED
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Watcher Configuration ---
+DEFAULT_SUFFIXES = (".pdf", ".txt")     # Same files as process_local_folder
+DEFAULT_DEBOUNCE = 1.0      # A file is handed on once it has had no events for this long (copies and editors write in bursts)
+DEFAULT_MAX_DELAY = 30.0    # ...or once it has been changing for this long, so a file that is appended to all the time still gets in
+DEFAULT_POLL_INTERVAL = 2.0 # Seconds between folder scans when inotify isn't available (or poll=True)
+DEFAULT_QUEUE_SIZE = 256    # Files waiting for the consumer; the watcher stops reading events while it is full
+BATCH_FILES = 64            # Files handed to the consumer at once at most
+
+# inotify(7) event flags
+_IN_MODIFY = 0x2
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ONLYDIR = 0x1000000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+               | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length; the name follows, NUL padded
+
+
+def _inotify_open(folder: str):
+    #An inotify descriptor watching folder, or None where inotify isn't available (not Linux, no libc, limits reached)
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(_IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(folder), _WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class FolderWatcher:
+    #Watches one folder (not its subfolders, like process_local_folder) for created, changed, moved and deleted
+    #files with the given suffixes, using inotify on Linux and scanning the folder every poll_interval elsewhere.
+    #Events are debounced per file on a background thread; files that have settled go through a bounded queue
+    #and batches() hands them to the caller, which decides from the file's existence whether to add or remove it.
+    #Use as a context manager: the watcher thread runs inside the with block.
+
+    def __init__(self, folder: str, suffixes=DEFAULT_SUFFIXES, debounce: float = DEFAULT_DEBOUNCE,
+                 max_delay: float = DEFAULT_MAX_DELAY, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, poll: bool = False):
+        self.folder = folder
+        self.suffixes = tuple(suffixes)
+        self.debounce = max(0.0, debounce)
+        self.max_delay = max(self.debounce, max_delay)
+        self.poll_interval = max(0.1, poll_interval)
+        self.queue = queue.Queue(max(1, queue_size))
+        self.error = None
+        self._pending = {}      # path -> (first event, last event), monotonic seconds
+        self._stop = threading.Event()
+        self._fd = None if poll else _inotify_open(folder)
+        self.backend = "inotify" if self._fd is not None else f"polling every {self.poll_interval:g}s"
+        if self._fd is None:
+            # A scan only sees a file every poll_interval, so it has to stay unchanged for one more scan
+            self.debounce += self.poll_interval
+            self.max_delay = max(self.debounce, self.max_delay)
+        self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def batches(self, max_files: int = BATCH_FILES):
+        #Yields lists of (path, seconds since its first event) until the watcher stops, e.g. when the folder is removed.
+        #Every path appears once per batch
+        while self._thread.is_alive() or not self.queue.empty():
+            try:
+                # Short waits, so Ctrl-C reaches the main thread promptly everywhere
+                item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            now = time.monotonic()
+            first_events = {item[0]: item[1]}
+            while len(first_events) < max_files:
+                try:
+                    path, first_event = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                first_events[path] = min(first_event, first_events.get(path, first_event))
+            yield [(path, now - first_event) for path, first_event in first_events.items()]
+
+    def _run(self):
+        try:
+            if self._fd is not None:
+                self._watch_inotify()
+            else:
+                self._watch_polling()
+        except Exception as e:
+            self.error = e
+
+    def _wants(self, name: str):
+        return name.endswith(self.suffixes)
+
+    def _note(self, name: str, now: float):
+        path = str(Path(self.folder) / name)
+        first, _ = self._pending.get(path, (now, now))
+        self._pending[path] = (first, now)
+
+    def _wait_time(self, now: float, idle: float):
+        #Seconds until the next pending file settles, idle if there is none
+        if not self._pending:
+            return idle
+        due = min(min(last + self.debounce, first + self.max_delay) for first, last in self._pending.values())
+        return min(idle, max(0.05, due - now))
+
+    def _hand_over(self, now: float):
+        for path, (first, last) in list(self._pending.items()):
+            if now - last < self.debounce and now - first < self.max_delay:
+                continue
+            del self._pending[path]
+            # Blocks while the consumer is behind; inotify keeps queueing events in the kernel meanwhile
+            while not self._stop.is_set():
+                try:
+                    self.queue.put((path, first), timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+
+    def _watch_inotify(self):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._fd], [], [], self._wait_time(time.monotonic(), 0.5))
+            now = time.monotonic()
+            if ready:
+                data = os.read(self._fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, name_length = _EVENT.unpack_from(data, offset)
+                    name = data[offset + _EVENT.size:offset + _EVENT.size + name_length].rstrip(b"\0")
+                    offset += _EVENT.size + name_length
+                    if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                        print(f"{WARNING}[!] {self.folder} was removed or moved, stopped watching it{RESET}")
+                        self._hand_over(float("inf"))
+                        return
+                    if mask & _IN_Q_OVERFLOW:
+                        # Events were lost: every file is looked at again (unchanged ones are skipped by the manifest)
+                        print(f"{INFO}Too many changes at once, rescanning {self.folder}{RESET}")
+                        for entry in os.scandir(self.folder):
+                            if entry.is_file() and self._wants(entry.name):
+                                self._note(entry.name, now)
+                        continue
+                    name = os.fsdecode(name)
+                    if name and self._wants(name):
+                        self._note(name, now)
+            self._hand_over(now)
+
+    def _scan(self):
+        #{file name: (size, mtime)} of the watched files, None if the folder can't be read
+        try:
+            with os.scandir(self.folder) as entries:
+                return {entry.name: (stat.st_size, stat.st_mtime_ns) for entry in entries
+                        if self._wants(entry.name) and entry.is_file() for stat in [entry.stat()]}
+        except OSError:
+            return None
+
+    def _watch_polling(self):
+        snapshot = self._scan() or {}
+        next_scan = time.monotonic() + self.poll_interval
+        while not self._stop.wait(self._wait_time(time.monotonic(), max(0.0, next_scan - time.monotonic()))):
+            now = time.monotonic()
+            if now >= next_scan:
+                next_scan = now + self.poll_interval
+                current = self._scan()
+                # A folder that can't be read (e.g. an unmounted share) is not the same as every file being deleted
+                if current is not None:
+                    for name in set(snapshot) | set(current):
+                        if snapshot.get(name) != current.get(name):
+                            self._note(name, now)
+                    snapshot = current
+            self._hand_over(now)
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,143 @@
+from colorama import Fore, Style
+from metrics import metrics
+
+# Color Definitions for colorama
+SUCCESS = Fore.GREEN
+INFO = Fore.CYAN
+RESET = Style.RESET_ALL
+
+# --- Buffer Configuration ---
+DEFAULT_MAX_CHUNKS = 512                # Flush once this many chunks are pending
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024     # ...or once the pending documents reach this size
+DEFAULT_MAX_BATCH_SIZE = 5000           # Fallback when the client can't report Chroma's limit
+
+
+class WriteBuffer:
+    #Collects chunks from many sources and writes them to a Chroma collection in large batches.
+    #Stands in for the collection: add() is buffered, reads and deletes that could touch a pending write flush first.
+    #Everything that reaches Chroma through it (flushed adds, updates and deletes) is timed as chroma_write.
+    #Use it as a context manager so the last batch is flushed on exit and on Ctrl-C.
+    #With an embedder (e.g. embed_cache.CachedEmbedder) vectors are computed per batch and passed to Chroma explicitly.
+    #on_write() is called after every write that reaches the collection (e.g. retrieval.mark_written).
+
+    def __init__(self, collection, max_chunks=DEFAULT_MAX_CHUNKS, max_bytes=DEFAULT_MAX_BYTES, max_batch_size=None,
+                 embedder=None, on_write=None):
+        self.collection = collection
+        self.embedder = embedder
+        self.on_write = on_write or (lambda: None)
+        self.max_chunks = max(1, max_chunks)
+        self.max_bytes = max(1, max_bytes)
+        if max_batch_size is None:
+            try:
+                max_batch_size = collection._client.get_max_batch_size()
+            except Exception:
+                max_batch_size = DEFAULT_MAX_BATCH_SIZE
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._pending_ids = set()
+        self._pending_bytes = 0
+        self.chunks_written = 0
+        self.batches_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def __getattr__(self, name):
+        # Anything not buffered goes straight to the collection
+        return getattr(self.collection, name)
+
+    def add(self, documents, ids, metadatas=None):
+        if metadatas is None:
+            metadatas = [None] * len(ids)
+        for doc, chunk_id, metadata in zip(documents, ids, metadatas):
+            # Chroma rejects duplicate IDs inside one request; keep the first one like a plain add would
+            if chunk_id in self._pending_ids:
+                continue
+            self._pending_ids.add(chunk_id)
+            self._ids.append(chunk_id)
+            self._documents.append(doc)
+            self._metadatas.append(metadata)
+            self._pending_bytes += len(doc.encode("utf-8"))
+        if len(self._ids) >= self.max_chunks or self._pending_bytes >= self.max_bytes:
+            self.flush()
+
+    def get(self, ids=None, where=None, **kwargs):
+        if self._touches_pending(ids, where, kwargs):
+            self.flush()
+        return self.collection.get(ids=ids, where=where, **kwargs)
+
+    def delete(self, ids=None, where=None, **kwargs):
+        if self._touches_pending(ids, where, kwargs):
+            self.flush()
+        # Timed after the flush above, which records its own writes
+        with metrics.stage("chroma_write", chunks=0 if ids is None else len([ids] if isinstance(ids, str) else ids)):
+            result = self.collection.delete(ids=ids, where=where, **kwargs)
+        self.on_write()
+        return result
+
+    def update(self, ids, **kwargs):
+        if self._touches_pending(ids, None, {}):
+            self.flush()
+        with metrics.stage("chroma_write", chunks=len([ids] if isinstance(ids, str) else ids)):
+            result = self.collection.update(ids=ids, **kwargs)
+        self.on_write()
+        return result
+
+    def _touches_pending(self, ids, where, other_filters):
+        #Whether a read/delete could see or affect a pending chunk. Only plain
+        #ID lists and single key equality filters are checked, anything else is assumed to
+        if not self._ids:
+            return False
+        if other_filters.get("where_document"):
+            return True
+        if ids is not None:
+            ids = [ids] if isinstance(ids, str) else ids
+            return any(chunk_id in self._pending_ids for chunk_id in ids)
+        if where and len(where) == 1:
+            (key, value), = where.items()
+            if not key.startswith("$") and not isinstance(value, dict):
+                return any(metadata and metadata.get(key) == value for metadata in self._metadatas)
+        return True
+
+    def count(self):
+        self.flush()
+        return self.collection.count()
+
+    def flush(self):
+        #Writes everything pending, split to respect Chroma's maximum batch size
+        if not self._ids:
+            return 0
+        total = len(self._ids)
+        for start in range(0, total, self.max_batch_size):
+            end = start + self.max_batch_size
+            documents = self._documents[start:end]
+            size = sum(map(len, documents))
+            embeddings = None
+            if self.embedder:
+                with metrics.stage("embed", size, len(documents)):
+                    embeddings = self.embedder(documents)
+            # Without an embedder Chroma embeds inside add(), so that time shows up as chroma_write
+            with metrics.stage("chroma_write", size, len(documents)):
+                self.collection.add(
+                    documents=documents,
+                    ids=self._ids[start:end],
+                    metadatas=self._metadatas[start:end],
+                    embeddings=embeddings,
+                )
+            self.batches_written += 1
+        self.chunks_written += total
+        self._ids, self._documents, self._metadatas = [], [], []
+        self._pending_ids.clear()
+        self._pending_bytes = 0
+        self.on_write()
+        return total
+
+    def report(self):
+        print(f"{INFO}Write buffer: {SUCCESS}{self.chunks_written}{INFO} chunks written in {self.batches_written} batches{RESET}")